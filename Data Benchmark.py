@@ -0,0 +1,445 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import contextlib
+import subprocess
+import tracemalloc
+import importlib.util
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RETRIEVAL = 'Data Retrieval.py'
+QUERYING = 'Data Querying.py'
+GENERATION = 'Data generation.py'
+
+# Define file names and column headers
+FILES = {
+    'departments': 'Department.csv',
+    'students': 'Student.csv',
+    'courses': 'Course.csv',
+    'instructors': 'Instructor.csv',
+    'enrollments': 'Enrollment.csv'
+}
+
+# Students per dataset; courses and instructors match it and enrollments are twice that
+SIZES = [10000, 100000, 1000000]
+BATCH_ROWS = 100
+PERCENTILES = [50, 90, 95, 99]
+
+# A result is a regression when it is this much slower or larger than the baseline, and above the noise floor
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 1.0
+
+# ------ Fixture Records ------
+def _student(student_id):
+    return {'StudentID': student_id, 'FirstName': 'محمد', 'LastName': 'علي', 'DateOfBirth': '2003-05-15',
+            'Major': 'كلية الهندسة', 'Address': 'طرابلس', 'Phone': '0912345678'}
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'رياضيات هندسية', 'Credits': 3, 'Department': 'كلية الهندسة'}
+
+def _instructor(instructor_id, n):
+    return {'InstructorID': instructor_id, 'FirstName': 'أحمد', 'LastName': 'محمود', 'Department': 'كلية الهندسة',
+            'Rank': 'أستاذ', 'Email': f"bench{n}@univ.edu"}
+
+def _enrollment(key, grade=70):
+    return {'StudentID': key[0], 'CourseID': key[1], 'Semester': key[2], 'Year': key[3], 'Grade': grade}
+
+# ------ Operations ------
+# name -> (script, sample pool, samples per call, arguments of call number n from its samples)
+# Writes run in this order after the reads, so a delete never removes rows a later operation needs
+OPERATIONS = {
+    'retrieve_student': (RETRIEVAL, 'students', 1, lambda v, n: (v[0],)),
+    'retrieve_courses_by_department': (RETRIEVAL, 'departments', 1, lambda v, n: (v[0],)),
+    'retrieve_students_in_course': (RETRIEVAL, 'courses', 1, lambda v, n: (v[0],)),
+    'retrieve_instructor': (RETRIEVAL, 'instructors', 1, lambda v, n: (v[0],)),
+    'retrieve_enrollments_for_student': (RETRIEVAL, 'students', 1, lambda v, n: (v[0],)),
+    'retrieve_average_grade': (RETRIEVAL, 'enrollments', 1, lambda v, n: (v[0][1], v[0][2])),
+    'retrieve_grade_stats': (RETRIEVAL, 'enrollments', 1, lambda v, n: (v[0][1], v[0][2], v[0][3])),
+    'retrieve_course_roster': (RETRIEVAL, 'courses', 1, lambda v, n: (v[0],)),
+    'retrieve_department_course_counts': (RETRIEVAL, 'departments', 1, lambda v, n: (v[0],)),
+    'retrieve_weighted_grades': (RETRIEVAL, 'students', 1, lambda v, n: (v[0],)),
+    'retrieve_students_born_between': (RETRIEVAL, None, 1, lambda v, n: (f"{2000 + n % 5}-03-01", f"{2000 + n % 5}-03-31")),
+    'retrieve_enrollments_by_grade': (RETRIEVAL, 'enrollments', 1, lambda v, n: (99, 100, v[0][3])),
+    'retrieve_top_students': (RETRIEVAL, 'courses', 1, lambda v, n: (v[0],)),
+    'retrieve_students_by_name': (RETRIEVAL, 'student_names', 1, lambda v, n: (v[0],)),
+    'retrieve_instructors_by_name': (RETRIEVAL, 'instructor_names', 1, lambda v, n: (v[0],)),
+    'add_student': (QUERYING, None, 1, lambda v, n: (_student(f"BS{n}"),)),
+    'add_course': (QUERYING, None, 1, lambda v, n: (_course(f"BC{n}"),)),
+    'add_instructor': (QUERYING, None, 1, lambda v, n: (_instructor(f"BI{n}", n),)),
+    'add_enrollment': (QUERYING, 'enrollments', 1, lambda v, n: (_enrollment(v[0][:2] + ['الفصل الأول', 2030]),)),
+    'add_students': (QUERYING, None, 1, lambda v, n: ([_student(f"BS{n}-{i}") for i in range(BATCH_ROWS)],)),
+    'add_courses': (QUERYING, None, 1, lambda v, n: ([_course(f"BC{n}-{i}") for i in range(BATCH_ROWS)],)),
+    'add_instructors': (QUERYING, None, 1, lambda v, n: ([_instructor(f"BI{n}-{i}", f"{n}-{i}") for i in range(BATCH_ROWS)],)),
+    'add_enrollments': (QUERYING, 'enrollments', BATCH_ROWS,
+                        lambda v, n: ([_enrollment(key[:2] + ['الفصل الثاني', 2030]) for key in v],)),
+    'update_student': (QUERYING, 'students', 1, lambda v, n: (v[0], _student(v[0]))),
+    'update_course': (QUERYING, 'courses', 1, lambda v, n: (v[0], _course(v[0]))),
+    'update_instructor': (QUERYING, 'instructors', 1, lambda v, n: (v[0], _instructor(v[0], f"u{n}"))),
+    'update_enrollment': (QUERYING, 'enrollments', 1, lambda v, n: (*v[0], _enrollment(v[0], 75))),
+    'update_students': (QUERYING, 'students', BATCH_ROWS, lambda v, n: ({key: _student(key) for key in v},)),
+    'update_courses': (QUERYING, 'courses', BATCH_ROWS, lambda v, n: ({key: _course(key) for key in v},)),
+    'update_instructors': (QUERYING, 'instructors', BATCH_ROWS,
+                           lambda v, n: ({key: _instructor(key, f"u{n}-{i}") for i, key in enumerate(v)},)),
+    'update_enrollments': (QUERYING, 'enrollments', BATCH_ROWS,
+                           lambda v, n: ({tuple(key): _enrollment(key, 80) for key in v},)),
+    'delete_enrollment': (QUERYING, 'enrollments', 1, lambda v, n: tuple(v[0])),
+    'delete_enrollments': (QUERYING, 'enrollments', BATCH_ROWS, lambda v, n: ([tuple(key) for key in v],)),
+    'delete_student': (QUERYING, 'students', 1, lambda v, n: (v[0],)),
+    'delete_students': (QUERYING, 'students', BATCH_ROWS, lambda v, n: (v,)),
+    'delete_course': (QUERYING, 'courses', 1, lambda v, n: (v[0],)),
+    'delete_courses': (QUERYING, 'courses', BATCH_ROWS, lambda v, n: (v,)),
+    'delete_instructor': (QUERYING, 'instructors', 1, lambda v, n: (v[0],)),
+    'delete_instructors': (QUERYING, 'instructors', BATCH_ROWS, lambda v, n: (v,)),
+}
+
+def _load_script(name):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(name)[0].lower().replace(' ', '_'),
+                                                  os.path.join(SCRIPT_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    # Registered by name, so worker pools can pickle its functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def _public_functions(script, prefixes=('retrieve_', 'add_', 'update_', 'delete_')):
+    module = _load_script(script)
+    return [name for name, value in vars(module).items() if callable(value) and name.startswith(prefixes)]
+
+# ------ Measurements ------
+def _io_counters():
+    # Bytes the process asked the OS to read and write, page cache hits included (Linux only)
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':') for line in f)
+    except OSError:
+        return None
+    return int(fields['rchar']), int(fields['wchar'])
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measure(func, args):
+    before = _io_counters()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    elapsed = time.perf_counter() - started
+    after = _io_counters()
+    sample = {'ms': elapsed * 1000}
+    if before is not None and after is not None:
+        sample['read'] = after[0] - before[0]
+        sample['written'] = after[1] - before[1]
+    return sample
+
+def run_child(spec):
+    # One fresh process: the first call is cold, the rest are warm, the last one is traced for memory
+    os.chdir(spec['directory'])
+    sys.path.insert(0, SCRIPT_DIR)
+    script, _, _, build = OPERATIONS[spec['op']] if spec['op'] in OPERATIONS else (GENERATION, None, 1, None)
+    module = _load_script(script)
+    func = getattr(module, spec.get('function', spec['op']))
+    calls = [tuple(args) for args in spec['calls']] if build is None else \
+        [build(values, n) for n, values in zip(spec['numbers'], spec['samples'])]
+
+    result = {'samples': [], 'error': None}
+    try:
+        for position, args in enumerate(calls):
+            traced = len(calls) > 2 and position == len(calls) - 1
+            if traced:
+                tracemalloc.start()
+                _measure(func, args)
+                result['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            else:
+                result['samples'].append(_measure(func, args))
+            if position == 0:
+                result['cold_rss_mb'] = _peak_rss_mb()
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+def _spawn(spec, storage):
+    env = dict(os.environ, UNIVERSITY_STORAGE=storage)
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], input=json.dumps(spec),
+                               capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        return {'samples': [], 'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# ------ Summaries ------
+def _latency(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=float)
+    summary = {f"p{q}": float(np.percentile(values, q)) for q in PERCENTILES}
+    summary.update({'mean': float(values.mean()), 'min': float(values.min()), 'max': float(values.max())})
+    return summary
+
+def _mean(samples, field):
+    values = [sample[field] for sample in samples if field in sample]
+    return int(np.mean(values)) if values else None
+
+def _summarize(op, size, mode, samples, rss, traced=None, errors=()):
+    return {
+        'op': op,
+        'size': size,
+        'mode': mode,
+        'runs': len(samples),
+        'latency_ms': _latency([sample['ms'] for sample in samples]),
+        'peak_rss_mb': max(rss) if rss else None,
+        'peak_traced_mb': max(traced) if traced else None,
+        'bytes_read': _mean(samples, 'read'),
+        'bytes_written': _mean(samples, 'written'),
+        'errors': sorted(set(errors)),
+    }
+
+# ------ Fixtures ------
+class Samples:
+    # Shuffled keys from a fixture; writes take keys nobody used before, reads may reuse them
+    def __init__(self, directory, seed):
+        rng = np.random.default_rng(seed)
+        read = lambda name, columns: pd.read_csv(os.path.join(directory, FILES[name]), usecols=columns, dtype=str)
+        self.pools = {
+            'students': read('students', ['StudentID'])['StudentID'].tolist(),
+            'courses': read('courses', ['CourseID'])['CourseID'].tolist(),
+            'instructors': read('instructors', ['InstructorID'])['InstructorID'].tolist(),
+            'departments': read('courses', ['Department'])['Department'].dropna().unique().tolist(),
+            'student_names': read('students', ['LastName'])['LastName'].dropna().unique().tolist(),
+            'instructor_names': read('instructors', ['LastName'])['LastName'].dropna().unique().tolist(),
+        }
+        enrollments = read('enrollments', ['StudentID', 'CourseID', 'Semester', 'Year']).dropna()
+        enrollments = enrollments.drop_duplicates()
+        enrollments = enrollments.sample(min(len(enrollments), 200000), random_state=seed)
+        self.pools['enrollments'] = [[s, c, sem, int(year)] for s, c, sem, year in enrollments.itertuples(index=False)]
+        for name in ('students', 'courses', 'instructors'):
+            rng.shuffle(self.pools[name])
+        self.used = dict.fromkeys(self.pools, 0)
+        self.read_position = dict.fromkeys(self.pools, 0)
+
+    def take(self, pool, count):
+        start = self.used[pool]
+        values = self.pools[pool][start:start + count]
+        if len(values) < count:
+            raise ValueError(f"The fixture has too few {pool} for this many runs")
+        self.used[pool] += count
+        return values
+
+    def peek(self, pool, count):
+        values = self.pools[pool]
+        start = self.read_position[pool]
+        self.read_position[pool] += count
+        return [values[(start + i) % len(values)] for i in range(count)]
+
+def _fixture_dir(root, size):
+    return os.path.join(root, str(size))
+
+def build_fixture(root, size, seed, workers, storage, rebuild=False):
+    # The generator is timed while it builds the fixture, a kept fixture keeps its first timing
+    directory = _fixture_dir(root, size)
+    record_path = os.path.join(directory, 'generation.json')
+    if not rebuild and os.path.exists(record_path):
+        with open(record_path, encoding='utf-8') as f:
+            record = json.load(f)
+        record['cached'] = True
+        return record
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    result = _spawn({'op': 'generate', 'function': 'generate_sharded', 'directory': directory,
+                     'calls': [[size, size, size, seed, workers]]}, 'csv')
+    record = _summarize('generate', size, 'cold', result['samples'], [result.get('peak_rss_mb')] if result.get('peak_rss_mb') else [],
+                        errors=[result['error']] if result['error'] else [])
+    if not result['error']:
+        # A failed run is not kept, the next run generates the fixture again
+        with open(record_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2)
+    record['cached'] = False
+    return record
+
+def _working_copy(root, size, storage):
+    # Writes run against a copy, so the fixture itself is never changed
+    source = _fixture_dir(root, size)
+    target = source + '.work'
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    if storage == 'csv':
+        os.makedirs(target)
+        for filename in FILES.values():
+            shutil.copy(os.path.join(source, filename), target)
+    else:
+        from storage_backends import convert_dataset
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_dataset(source, target, 'csv', storage)
+    return target
+
+# ------ Benchmark Run ------
+def run_operation(op, size, directory, samples, storage, repeat, cold_runs, number):
+    # cold_runs fresh processes, each making one cold call and `repeat` warm calls
+    _, pool, per_call, _ = OPERATIONS[op]
+    calls = repeat + 2 if repeat else 1
+    cold, warm, cold_rss, warm_rss, traced, errors = [], [], [], [], [], []
+    for run in range(cold_runs):
+        values = [[] for _ in range(calls)]
+        if pool is not None:
+            # Reads and inserts may reuse keys, updates and deletes each get keys of their own
+            pick = samples.peek if op.startswith(('retrieve_', 'add_')) else samples.take
+            try:
+                flat = pick(pool, calls * per_call)
+            except ValueError as e:
+                errors.append(str(e))
+                break
+            values = [flat[i * per_call:(i + 1) * per_call] for i in range(calls)]
+        numbers = list(range(number + run * calls, number + (run + 1) * calls))
+        result = _spawn({'op': op, 'directory': directory, 'samples': values, 'numbers': numbers}, storage)
+        if result['error']:
+            errors.append(result['error'])
+        cold.extend(result['samples'][:1])
+        warm.extend(result['samples'][1:])
+        if result.get('cold_rss_mb') is not None:
+            cold_rss.append(result['cold_rss_mb'])
+            warm_rss.append(result['peak_rss_mb'])
+        if result.get('peak_traced_mb') is not None:
+            traced.append(result['peak_traced_mb'])
+    records = [_summarize(op, size, 'cold', cold, cold_rss, errors=errors)]
+    if warm:
+        records.append(_summarize(op, size, 'warm', warm, warm_rss, traced, errors))
+    return records
+
+def run_benchmarks(sizes=SIZES, ops=None, repeat=5, cold_runs=3, fixtures='benchmark_data', seed=1234, workers=1,
+                   storage=None, rebuild=False):
+    storage = storage or os.environ.get('UNIVERSITY_STORAGE', 'csv')
+    known = set(_public_functions(RETRIEVAL)) | set(_public_functions(QUERYING))
+    for name in sorted(known - set(OPERATIONS)):
+        print(f"Skipped {name}, no benchmark arguments are defined for it")
+    selected = [op for op in OPERATIONS if not ops or any(op.startswith(prefix) for prefix in ops)]
+
+    results = []
+    for size in sizes:
+        generation = build_fixture(fixtures, size, seed, workers, storage, rebuild)
+        results.append(generation)
+        if generation['errors']:
+            print(f"Dataset of {size} students failed: {', '.join(generation['errors'])} :(")
+            continue
+        print(f"Dataset of {size} students ready ({'kept' if generation['cached'] else 'generated'}) :)")
+        samples = Samples(_fixture_dir(fixtures, size), seed)
+        directory = _working_copy(fixtures, size, storage)
+        for position, op in enumerate(selected):
+            records = run_operation(op, size, directory, samples, storage, repeat, cold_runs, position * cold_runs * (repeat + 2))
+            results.extend(records)
+            latency = records[-1]['latency_ms']
+            if latency:
+                print(f"{op} on {size}: {latency['p50']:.2f} ms p50{' (errors)' if records[-1]['errors'] else ''}")
+            else:
+                print(f"{op} on {size}: {', '.join(records[-1]['errors'])} :(")
+        shutil.rmtree(directory)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'storage': storage,
+            'repeat': repeat,
+            'cold_runs': cold_runs,
+            'batch_rows': BATCH_ROWS,
+        },
+        'results': results,
+    }
+
+# ------ Baseline Comparison ------
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD, floor_ms=NOISE_FLOOR_MS):
+    # Median and p95 latency and peak memory of every operation both runs measured
+    before = {(r['op'], r['size'], r['mode']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get((result['op'], result['size'], result['mode']))
+        if old is None or not old['latency_ms'] or not result['latency_ms']:
+            continue
+        for metric in ('p50', 'p95'):
+            was, now = old['latency_ms'][metric], result['latency_ms'][metric]
+            rows.append((result['op'], result['size'], result['mode'], f"{metric} ms", was, now,
+                         now > was * (1 + threshold) and now - was > floor_ms))
+        for metric in ('peak_rss_mb', 'peak_traced_mb'):
+            was, now = old.get(metric), result.get(metric)
+            if was and now:
+                rows.append((result['op'], result['size'], result['mode'], metric, was, now, now > was * (1 + threshold)))
+    table = pd.DataFrame(rows, columns=['op', 'size', 'mode', 'metric', 'baseline', 'current', 'regression'])
+    table['change %'] = ((table['current'] / table['baseline'] - 1) * 100).round(1)
+    return table
+
+def report_comparison(table):
+    regressions = table[table['regression']]
+    if regressions.empty:
+        print("No regressions found :)")
+        return False
+    print(f"{len(regressions)} regressions found :(")
+    print(regressions.drop(columns=['regression']).to_string(index=False))
+    return True
+
+# ------ Main Implementation ------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time every retrieve/add/update/delete function and the generator on growing datasets")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="students per dataset")
+    parser.add_argument('--ops', nargs='+', default=None, help="only operations starting with these names")
+    parser.add_argument('--repeat', type=int, default=5, help="warm calls per process")
+    parser.add_argument('--cold-runs', type=int, default=3, help="fresh processes per operation")
+    parser.add_argument('--fixtures', default='benchmark_data', help="directory keeping the generated datasets")
+    parser.add_argument('--rebuild', action='store_true', help="generate the datasets again")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--workers', type=int, default=1, help="generator processes")
+    parser.add_argument('--storage', default=None, help="csv, parquet, feather or npz (default: UNIVERSITY_STORAGE)")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare', default=None, help="baseline JSON to check the results against")
+    parser.add_argument('--results', default=None, help="compare this saved JSON instead of running the benchmarks")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_child(json.load(sys.stdin))))
+        return 0
+
+    if args.results:
+        with open(args.results, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_benchmarks(args.sizes, args.ops, args.repeat, args.cold_runs, os.path.abspath(args.fixtures),
+                                 args.seed, args.workers, args.storage, args.rebuild)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"Created {args.output} Successfully :)")
+
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print("Error : The file does not exist!")
+            return 1
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        return 1 if report_comparison(compare(baseline, current, args.threshold)) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import sys
+import json
+import time
+import socket
+import argparse
+
+SOCKET_PATH = 'university.sock'
+
+# ------ Client ------
+class QueryClient:
+    # One connection, reused for every request
+    def __init__(self, socket_path=SOCKET_PATH):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.reader = self.sock.makefile('rb')
+
+    def request(self, op, *args, **kwargs):
+        message = {'op': op, 'args': list(args), 'kwargs': kwargs}
+        self.sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        response = json.loads(self.reader.readline())
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _argument(text):
+    # 20250001 -> int, [1, 2] -> list, anything that is not JSON stays text
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+# ------ Main Implementation ------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send one request to the university query server")
+    parser.add_argument('op', help="e.g. retrieve_student, add_student, delete_course")
+    parser.add_argument('args', nargs='*', help="arguments, given as JSON where needed")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--repeat', type=int, default=1, help="send the request N times and report the latency")
+    args = parser.parse_args(argv)
+
+    try:
+        client = QueryClient(args.socket)
+    except OSError as e:
+        print(f"Error : cannot reach the server on {args.socket} ({e})")
+        return 1
+    with client:
+        values = [_argument(value) for value in args.args]
+        try:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                result = client.request(args.op, *values)
+            elapsed = (time.perf_counter() - started) / args.repeat
+        except RuntimeError as e:
+            print(f"An error occurred : {e}")
+            return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"{elapsed * 1000:.3f} ms per request", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,8 @@ import pandas as pd
 from faker import Faker
 from datetime import datetime, timedelta
 import os
+from data_store import get_store
+import metrics
 
 # Define file names and column headers
 FILES = {
@@ -12,309 +14,596 @@ FILES = {
     'enrollments': 'Enrollment.csv'
 }
 
+# ------ Shared Table Store ------
+def _store():
+    return get_store(FILES)
+
+def transaction():
+    # Group several add/update/delete calls into one atomic commit
+    return _store().transaction()
+
 # ------ Validation Functions ------
+@metrics.timed('validate')
 def _validate_not_null(data, required_fields):
     for field in required_fields:
         if not data.get(field):
             raise ValueError(f"{field} Its empty!")
 
-def _validate_unique(field, value, file_path):
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        if value in df[field].values:
+@metrics.timed('validate')
+def _validate_unique(field, value, table_name):
+    if _store().exists(table_name):
+        if _store().has_key(table_name, field, value):
             raise ValueError(f" {value} Already exists {field}")
 
+@metrics.timed('validate')
+def _validate_exists(field, value, table_name):
+    # A foreign key must point at an existing row
+    if not _store().exists(table_name) or not _store().has_key(table_name, field, value):
+        raise ValueError(f" {value} does not exist {field}")
+
+@metrics.timed('validate')
 def _validate_credits(credits):
     if not 1 <= credits <= 4:
         raise ValueError("The hours must be between 1 and 4 ")
 
+@metrics.timed('validate')
 def _validate_dob(dob_str):
     dob = datetime.strptime(dob_str, '%Y-%m-%d')
     if dob > datetime.now() - timedelta(days=365*17):
         raise ValueError("The age must be greater than 17")
     
+@metrics.timed('validate')
 def _validate_grade(grade):
     if not 0 <= grade <= 100:
         raise ValueError("The grade must be between 0 and 100 ")
 
 # ------ Referential Integrity Functions ------
-def _delete_related_records(main_file, related_file, key_field, key_value):
-    if os.path.exists(related_file):
-        df = pd.read_csv(related_file)
-        df = df[df[key_field] != key_value]
-        df.to_csv(related_file, index=False, encoding='utf-8-sig')
-
-def _update_related_ids(file_path, id_field, old_id, new_id):
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        df.loc[df[id_field] == old_id, id_field] = new_id
-        df.to_csv(file_path, index=False, encoding='utf-8-sig')
+@metrics.timed('cascade')
+def _delete_related_records(main_table, related_table, key_field, key_value):
+    if _store().exists(related_table):
+        labels = _store().labels(related_table, key_field, key_value)
+        if labels:
+            _store().delete(related_table, labels)
+
+@metrics.timed('cascade')
+def _update_related_ids(table_name, id_field, old_id, new_id):
+    if _store().exists(table_name):
+        labels = _store().labels(table_name, id_field, old_id)
+        if labels:
+            _store().update(table_name, labels, {id_field: new_id})
+
+@metrics.timed('filter')
+def _enrollment_labels(student_id, course_id, semester, year):
+    # Narrow down to the term's partition and the CourseID index, then match the rest of the key
+    table = _store().table('enrollments')
+    schema = table.schema
+    candidates = table.select({'Semester': semester, 'Year': year}).lookup('CourseID', course_id)
+    mask = (
+        (candidates['StudentID'] == schema.key('StudentID', student_id)) &
+        (candidates['Semester'] == semester) &
+        (candidates['Year'] == schema.key('Year', year))
+    )
+    return candidates[mask].index.tolist()
 
 # ------ Data Querying ------
 
 # ------ Add New Records ------
+@metrics.instrument
 def add_student(student_data):
     try:
-        _validate_unique('StudentID', student_data['StudentID'], FILES['students'])
-        _validate_not_null(student_data, ['StudentID', 'FirstName', 'LastName', 'DateOfBirth', 'Major'])
-        _validate_dob(student_data['DateOfBirth'])
-        students = pd.read_csv(FILES['students'])
-        students = pd.concat([students, pd.DataFrame([student_data])], ignore_index=True)
-        students.to_csv(FILES['students'], index=False, encoding='utf-8-sig')
+        with _store().transaction():
+            _validate_unique('StudentID', student_data['StudentID'], 'students')
+            _validate_not_null(student_data, ['StudentID', 'FirstName', 'LastName', 'DateOfBirth', 'Major'])
+            _validate_dob(student_data['DateOfBirth'])
+            _store().insert('students', [student_data])
         print(f"The record has been added :)")
             
     except Exception as e:
         print(f"An error occurred while adding the record{e}")
 
+@metrics.instrument
 def add_course(course_data):
     try:
-        _validate_unique('CourseID', course_data['CourseID'], FILES['courses'])
-        _validate_not_null(course_data, ['CourseID','CourseName','Credits','Department'])
-        _validate_credits(course_data['Credits'])
-        courses = pd.read_csv(FILES['courses'])
-        courses = pd.concat([courses, pd.DataFrame([course_data])], ignore_index=True)
-        courses.to_csv(FILES['courses'], index=False, encoding='utf-8-sig')
+        with _store().transaction():
+            _validate_unique('CourseID', course_data['CourseID'], 'courses')
+            _validate_not_null(course_data, ['CourseID','CourseName','Credits','Department'])
+            _validate_credits(course_data['Credits'])
+            _store().insert('courses', [course_data])
         print(f"The record has been added :)")
     except Exception as e:
         print(f"An error occurred while adding the record{e}")
 
+@metrics.instrument
 def add_instructor(instructor_data):
     try:
-        _validate_unique('InstructorID', instructor_data['InstructorID'], FILES['instructors'])
-        _validate_not_null(instructor_data, ['InstructorID','FirstName','LastName','Department'])
-        _validate_unique('Email', instructor_data['Email'], FILES['instructors'])
-        instructors = pd.read_csv(FILES['instructors'])
-        instructors = pd.concat([instructors, pd.DataFrame([instructor_data])], ignore_index=True)
-        instructors.to_csv(FILES['instructors'], index=False, encoding='utf-8-sig')
+        with _store().transaction():
+            _validate_unique('InstructorID', instructor_data['InstructorID'], 'instructors')
+            _validate_not_null(instructor_data, ['InstructorID','FirstName','LastName','Department'])
+            _validate_unique('Email', instructor_data['Email'], 'instructors')
+            _store().insert('instructors', [instructor_data])
         print(f"The record has been added :)")
     except Exception as e:
         print(f"An error occurred while adding the record{e}")
 
+@metrics.instrument
 def add_enrollment(enrollment_data):
     try:
-        _validate_not_null(enrollment_data, ['StudentID','CourseID','Semester', 'Year'])
-        _validate_grade(enrollment_data['Grade'])
-        enrollments = pd.read_csv(FILES['enrollments'])
-        enrollments = pd.concat([enrollments, pd.DataFrame([enrollment_data])], ignore_index=True)
-        enrollments.to_csv(FILES['enrollments'], index=False, encoding='utf-8-sig')
+        with _store().transaction():
+            _validate_not_null(enrollment_data, ['StudentID','CourseID','Semester', 'Year'])
+            _validate_grade(enrollment_data['Grade'])
+            _validate_exists('StudentID', enrollment_data['StudentID'], 'students')
+            _validate_exists('CourseID', enrollment_data['CourseID'], 'courses')
+            _store().insert('enrollments', [enrollment_data])
         print(f"The record has been added :)")
     except Exception as e:
         print(f"An error occurred while adding the record{e}")
 
 # ------ Update Records ------
+@metrics.instrument
 def update_student(id, updated_data):
     try:
         _validate_not_null(updated_data, ['StudentID', 'FirstName', 'LastName', 'DateOfBirth', 'Major'])
         _validate_dob(updated_data['DateOfBirth'])
-        if not os.path.exists(FILES['students']):
+        if not _store().exists('students'):
             raise FileNotFoundError("No found file :(")
         
-        updated = pd.read_csv(FILES['students'], dtype = {'Phone' : str})
-        mask = updated['StudentID'] == id
-        
-        if updated[mask].empty:
-            print("No matching data found :(")
-            return
-        
-        if 'StudentID' in updated_data:
-            new_id = updated_data['StudentID']
+        # The row is looked up under the writer lock, so no other process can move it
+        with _store().transaction():
+            labels = _store().labels('students', 'StudentID', id)
+            if not labels:
+                print("No matching data found :(")
+                return
+
+            if 'StudentID' in updated_data:
+                new_id = updated_data['StudentID']
             
-            # Verify that the ID is not duplicate
-            if (new_id != id) and (new_id in updated['StudentID'].values):
-                raise ValueError("The entered recording ID already exists!")
+                # Verify that the ID is not duplicate
+                if (new_id != id) and _store().has_key('students', 'StudentID', new_id):
+                    raise ValueError("The entered recording ID already exists!")
             
-            # Update ID in associated record
-            _update_related_ids(FILES['enrollments'], 'StudentID', id, new_id)
+                # Update ID in associated record
+                _update_related_ids('enrollments', 'StudentID', id, new_id)
         
-        # Update date 
-        for key, value in updated_data.items():
-            if key == 'Phone':
-                value == str(value)
-            updated.loc[mask,key] = value
-        
-        updated.to_csv(FILES['students'], index=False, encoding='utf-8-sig')
+            # Update date 
+            _store().update('students', labels, updated_data)
         print("Data updated :)")
         
     except Exception as e:
         print(f"An error occurred : {e}")
 
+@metrics.instrument
 def update_course(id, updated_data):
     try:
         _validate_not_null(updated_data, ['CourseID','CourseName','Credits', 'Department'])
         _validate_credits(updated_data['Credits'])
-        if not os.path.exists(FILES['courses']):
+        if not _store().exists('courses'):
             raise FileNotFoundError("No found file :(")
         
-        updated = pd.read_csv(FILES['courses'])
-        mask = updated['CourseID'] == id
-
-        if updated[mask].empty:
-            print("No matching data found :(")
-            return
-        
-        if 'CourseID' in updated_data:
-            new_id = updated_data['CourseID']
+        # The row is looked up under the writer lock, so no other process can move it
+        with _store().transaction():
+            labels = _store().labels('courses', 'CourseID', id)
+            if not labels:
+                print("No matching data found :(")
+                return
+
+            if 'CourseID' in updated_data:
+                new_id = updated_data['CourseID']
             
-            # Verify that the ID is not duplicate
-            if (new_id != id) and (new_id in updated['CourseID'].values):
-                raise ValueError("The entered recording ID already exists!")
+                # Verify that the ID is not duplicate
+                if (new_id != id) and _store().has_key('courses', 'CourseID', new_id):
+                    raise ValueError("The entered recording ID already exists!")
             
-            # Update ID in associated record
-            _update_related_ids(FILES['enrollments'], 'CourseID', id, new_id)
-        
-        # Update date 
-        for key, value in updated_data.items():
-            updated.loc[mask,key] = value           
+                # Update ID in associated record
+                _update_related_ids('enrollments', 'CourseID', id, new_id)
         
-        updated.to_csv(FILES['courses'], index=False, encoding='utf-8-sig')
+            # Update date 
+            _store().update('courses', labels, updated_data)
         print("Data updated :)")
         
     except Exception as e:
         print(f"An error occurred : {e}")
 
 
+@metrics.instrument
 def update_instructor(id, updated_data):
     try:
         _validate_not_null(updated_data, ['InstructorID','FirstName','LastName', 'Department'])
-        _validate_unique('Email', updated_data['Email'], FILES['instructors'])
-        if not os.path.exists(FILES['instructors']):
+        _validate_unique('Email', updated_data['Email'], 'instructors')
+        if not _store().exists('instructors'):
             raise FileNotFoundError("No found file :(")
         
-        updated = pd.read_csv(FILES['instructors'])
-        mask = updated['InstructorID'] == id
+        with _store().transaction():
+            labels = _store().labels('instructors', 'InstructorID', id)
 
-        if updated[mask].empty:
-            print("No matching data found :(")
-            return
-        
-        if 'InstructorID' in updated_data:
-            new_id = updated_data['InstructorID']
-            
-            # Verify that the ID is not duplicate
-            if (new_id != id) and (new_id in updated['InstructorID'].values):
-                raise ValueError("The entered recording ID already exists!")
-            
-        # Update date 
-        for key, value in updated_data.items():
-            updated.loc[mask,key] = value           
-        
-        updated.to_csv(FILES['instructors'], index=False, encoding='utf-8-sig')
+            if not labels:
+                print("No matching data found :(")
+                return
+
+            if 'InstructorID' in updated_data:
+                new_id = updated_data['InstructorID']
+
+                # Verify that the ID is not duplicate
+                if (new_id != id) and _store().has_key('instructors', 'InstructorID', new_id):
+                    raise ValueError("The entered recording ID already exists!")
+
+            # Update date 
+            _store().update('instructors', labels, updated_data)
         print("Data updated :)")
         
     except Exception as e:
         print(f"An error occurred : {e}")
 
+@metrics.instrument
 def update_enrollment(student_id, course_id, semester, year, updated_data):
     try:
-        student_id = str(student_id)
-        course_id = str(course_id)
-        year = str(year)
-        
         _validate_not_null(updated_data, ['StudentID','CourseID','Semester', 'Year'])
         if 'Grade' in updated_data:
             _validate_grade(updated_data['Grade'])
         
-        if not os.path.exists(FILES['enrollments']):
+        if not _store().exists('enrollments'):
             raise FileNotFoundError("No found file :(")
         
-        enrollments = pd.read_csv(FILES['enrollments'], dtype={
-            'StudentID': str,
-            'CourseID': str,
-            'Year': str
-        })
-        
-        mask = (
-            (enrollments['StudentID'] == student_id) &
-            (enrollments['CourseID'] == course_id) &
-            (enrollments['Semester'] == semester) &
-            (enrollments['Year'] == year)
-        )
-                
-        if enrollments[mask].empty:
-            print("No matching data found :(")
-            return
-        
-        for key, value in updated_data.items():
-            enrollments.loc[mask, key] = value
-        
-        enrollments.to_csv(FILES['enrollments'], index=False, encoding='utf-8-sig')
+        with _store().transaction():
+            labels = _enrollment_labels(student_id, course_id, semester, year)
+
+            if not labels:
+                print("No matching data found :(")
+                return
+
+            _validate_exists('StudentID', updated_data['StudentID'], 'students')
+            _validate_exists('CourseID', updated_data['CourseID'], 'courses')
+            _store().update('enrollments', labels, updated_data)
         print("Data updated :)")
         
     except Exception as e:
         print(f"An error occurred : {e}")
 
 # ------ Delete Records ------
+@metrics.instrument
 def delete_student(student_id):
-    _delete_related_records(FILES['students'], FILES['enrollments'], 'StudentID', student_id)
-    if os.path.exists(FILES['students']):
-        df = pd.read_csv(FILES['students'])
-        data = df[df['StudentID'] == student_id]
-        df = df[df['StudentID'] != student_id]
-        df.to_csv(FILES['students'], index=False, encoding='utf-8-sig')
-        if not data.empty:
+    if _store().exists('students'):
+        # The enrollments and the student row are committed together
+        try:
+            with _store().transaction():
+                _delete_related_records('students', 'enrollments', 'StudentID', student_id)
+                labels = _store().labels('students', 'StudentID', student_id)
+                if labels:
+                    _store().delete('students', labels)
+        except ValueError as e:
+            # e.g. some of the enrollments are in an archived partition, nothing is deleted
+            print(f"Error : {e}")
+            return
+        if labels:
             print("The record has been deleted :)")
         else:
             print(f"No Data Found :(")
     else:
         print("Error : The file does not exist!")
 
+@metrics.instrument
 def delete_course(course_id):
-    _delete_related_records(FILES['courses'], FILES['enrollments'], 'CourseID', course_id)
-    if os.path.exists(FILES['courses']):
-        df = pd.read_csv(FILES['courses'])
-        data = df[df['CourseID'] == course_id]
-        df = df[df['CourseID'] != course_id]
-        df.to_csv(FILES['courses'], index=False, encoding='utf-8-sig')
-        if not data.empty:
+    if _store().exists('courses'):
+        # The enrollments and the course row are committed together
+        try:
+            with _store().transaction():
+                _delete_related_records('courses', 'enrollments', 'CourseID', course_id)
+                labels = _store().labels('courses', 'CourseID', course_id)
+                if labels:
+                    _store().delete('courses', labels)
+        except ValueError as e:
+            # e.g. some of the enrollments are in an archived partition, nothing is deleted
+            print(f"Error : {e}")
+            return
+        if labels:
             print("The record has been deleted :)")
         else:
             print(f"No Data Found :(")
     else:
         print("Error : The file does not exist!")
 
+@metrics.instrument
 def delete_instructor(instructor_id):
-    if os.path.exists(FILES['instructors']):
-        df = pd.read_csv(FILES['instructors'])
-        data = df[df['InstructorID'] == instructor_id]
-        df = df[df['InstructorID'] != instructor_id]
-        df.to_csv(FILES['instructors'], index=False, encoding='utf-8-sig')
-        if not data.empty:
+    if _store().exists('instructors'):
+        with _store().transaction():
+            labels = _store().labels('instructors', 'InstructorID', instructor_id)
+            if labels:
+                _store().delete('instructors', labels)
+        if labels:
             print("The record has been deleted :)")
         else:
             print(f"No Data Found :(")
     else:
         print("Error : The file does not exist!")
 
+@metrics.instrument
 def delete_enrollment(student_id, course_id, sem, year):
     try:
-        if not os.path.exists(FILES['enrollments']):
+        if not _store().exists('enrollments'):
             print("Error : The file does not exist!")
             return
 
-        enrollments = pd.read_csv(FILES['enrollments'])
+        with _store().transaction():
+            labels = _enrollment_labels(student_id, course_id, sem, year)
 
-        student_id = str(student_id)
-        course_id = str(course_id)
-        year = str(year)
-        
-        mask = (
-            (enrollments['StudentID'].astype(str) == student_id) & 
-            (enrollments['CourseID'].astype(str) == course_id) & 
-            (enrollments['Semester'] == sem) & 
-            (enrollments['Year'].astype(str) == year)
-        )
-        
-        if enrollments[mask].empty:
-            print("No Data Found :(")
-            return
-        
-        enrollments = enrollments[~mask]
-        enrollments.to_csv(FILES['enrollments'], index=False, encoding='utf-8-sig')
+            if not labels:
+                print("No Data Found :(")
+                return
+
+            _store().delete('enrollments', labels)
         print("The record has been deleted :)")
         
     except Exception as e:
         print(f"An error occurred: {e}")
 
+# ------ Batch Operations ------
+def _batch_frame(table_name, rows):
+    # Values that do not fit the schema become missing and are reported by the checks
+    df = pd.DataFrame(list(rows)).reset_index(drop=True)
+    return _store().table(table_name).schema.apply(df, errors='coerce')
+
+def _batch_errors(df):
+    return pd.Series(None, index=df.index, dtype=object)
+
+def _flag(errors, mask, message):
+    # Keep the first error found for each row
+    mask = pd.Series(mask, index=errors.index).fillna(False).astype(bool)
+    errors[mask & errors.isna()] = message
+
+@metrics.timed('validate')
+def _check_not_null(df, errors, required_fields):
+    for field in required_fields:
+        if field not in df:
+            _flag(errors, True, f"{field} Its empty!")
+        else:
+            _flag(errors, df[field].isna() | (df[field].astype(str).str.strip() == ''), f"{field} Its empty!")
+
+@metrics.timed('validate')
+def _check_unique(df, errors, field, table_name, ignore=()):
+    # ignore: per row, the value that row holds now, keeping it is no clash
+    if field not in df:
+        return
+    keys = df[field].tolist()
+    own = list(ignore) or [None] * len(keys)
+    if _store().exists(table_name):
+        existing = _store().table(table_name).key_set(field)
+        _flag(errors, [pd.notna(key) and key in existing and key != mine for key, mine in zip(keys, own)], f"Already exists {field}")
+    _flag(errors, df[field].duplicated() & df[field].notna(), f"Repeated {field} in the batch")
+
+def _current_values(table_name, key_field, field, ids):
+    # The value of field each row holds now, None for an ID that does not exist
+    table = _store().table(table_name)
+    values = []
+    for key in ids:
+        rows = table.lookup(key_field, key, [field]) if table.exists() else None
+        values.append(rows[field].iloc[0] if rows is not None and len(rows) else None)
+    return values
+
+@metrics.timed('validate')
+def _check_exists(df, errors, field, table_name):
+    if field not in df:
+        return
+    existing = _store().table(table_name).key_set(field) if _store().exists(table_name) else ()
+    _flag(errors, [pd.notna(key) and key not in existing for key in df[field].tolist()], f"{field} does not exist")
+
+@metrics.timed('validate')
+def _check_range(df, errors, field, low, high, message):
+    if field in df:
+        values = pd.to_numeric(df[field], errors='coerce')
+        _flag(errors, ~values.between(low, high).fillna(False), message)
+
+@metrics.timed('validate')
+def _check_dob(df, errors):
+    if 'DateOfBirth' in df:
+        dob = pd.to_datetime(df['DateOfBirth'], format='%Y-%m-%d', errors='coerce')
+        _flag(errors, dob.isna(), "DateOfBirth must be YYYY-MM-DD")
+        _flag(errors, dob > datetime.now() - timedelta(days=365*17), "The age must be greater than 17")
+
+def _report(keys, errors):
+    failed = errors.notna()
+    return {
+        'done': int((~failed).sum()),
+        'errors': [{'key': key, 'error': error} for key, error in zip(keys, errors) if pd.notna(error)],
+    }
+
+def _add_batch(table_name, rows, key_field, required_fields, checks=()):
+    with _store().transaction():
+        df = _batch_frame(table_name, rows)
+        errors = _batch_errors(df)
+        _check_not_null(df, errors, required_fields)
+        if key_field:
+            _check_unique(df, errors, key_field, table_name)
+        for check in checks:
+            check(df, errors)
+        valid = df[errors.isna()]
+        if not valid.empty:
+            _store().insert(table_name, valid.to_dict('records'))
+        keys = df[key_field].tolist() if key_field in df else list(df.index)
+        return _report(keys, errors)
+
+@metrics.instrument
+def add_students(rows):
+    return _add_batch('students', rows, 'StudentID',
+                      ['StudentID', 'FirstName', 'LastName', 'DateOfBirth', 'Major'],
+                      [_check_dob])
+
+@metrics.instrument
+def add_courses(rows):
+    return _add_batch('courses', rows, 'CourseID',
+                      ['CourseID', 'CourseName', 'Credits', 'Department'],
+                      [lambda df, errors: _check_range(df, errors, 'Credits', 1, 4, "The hours must be between 1 and 4 ")])
+
+@metrics.instrument
+def add_instructors(rows):
+    return _add_batch('instructors', rows, 'InstructorID',
+                      ['InstructorID', 'FirstName', 'LastName', 'Department'],
+                      [lambda df, errors: _check_unique(df, errors, 'Email', 'instructors')])
+
+@metrics.instrument
+def add_enrollments(rows):
+    return _add_batch('enrollments', rows, None,
+                      ['StudentID', 'CourseID', 'Semester', 'Year'],
+                      [lambda df, errors: _check_range(df, errors, 'Grade', 0, 100, "The grade must be between 0 and 100 "),
+                       lambda df, errors: _check_exists(df, errors, 'StudentID', 'students'),
+                       lambda df, errors: _check_exists(df, errors, 'CourseID', 'courses')])
+
+def _update_batch(table_name, key_field, updates, required_fields, checks=(), cascade=True):
+    with _store().transaction():
+        schema = _store().table(table_name).schema
+        requested = list(updates)
+        old_ids = schema.keys(key_field, requested)
+        df = _batch_frame(table_name, updates.values())
+        errors = _batch_errors(df)
+        _check_not_null(df, errors, required_fields)
+        for check in checks:
+            check(df, errors)
+
+        table = _store().table(table_name)
+        index = table.index(key_field)
+        _flag(errors, [old_id not in index for old_id in old_ids], "No matching data found :(")
+        if key_field in df:
+            new_ids = df[key_field]
+            while True:
+                # A new ID may reuse an ID that is renamed away in the same batch, but only by a row
+                # that is written; every rejected row may free an ID less, so check until nothing changes
+                valid = errors.isna()
+                renamed = {old_id for old_id, new_id, ok in zip(old_ids, new_ids, valid) if ok and new_id != old_id}
+                _flag(errors, [ok and new_id != old_id and new_id in index and new_id not in renamed
+                               for old_id, new_id, ok in zip(old_ids, new_ids, valid)],
+                      "The entered recording ID already exists!")
+                _flag(errors, new_ids[errors.isna()].duplicated().reindex(df.index, fill_value=False),
+                      f"Repeated {key_field} in the batch")
+                if errors.isna().sum() == valid.sum():
+                    break
+
+        valid = errors.isna()
+        if not valid.any():
+            return _report(requested, errors)
+
+        # Row label of every valid parent row, then one Series per updated column
+        labels = [index.lookup(old_id)[0] for old_id, ok in zip(old_ids, valid) if ok]
+        rows = df[valid].set_axis(labels)
+        changes = {}
+        for column in rows.columns:
+            values = rows[column]
+            present = [column in updates[old_id] for old_id, ok in zip(requested, valid) if ok]
+            if any(present):
+                changes[column] = values[present]
+
+        if cascade and key_field in changes and _store().exists('enrollments'):
+            mapping = {old_id: new_id for old_id, new_id, ok in zip(old_ids, df[key_field], valid) if ok and new_id != old_id}
+            _cascade_ids('enrollments', key_field, mapping)
+        _store().update_rows(table_name, changes)
+        return _report(requested, errors)
+
+@metrics.timed('cascade')
+def _cascade_ids(table_name, id_field, mapping):
+    if not mapping:
+        return
+    df = _store().frame(table_name)
+    column = df[id_field]
+    matched = column[column.isin(list(mapping))]
+    if not matched.empty:
+        _store().update_rows(table_name, {id_field: matched.map(mapping)})
+
+@metrics.instrument
+def update_students(updates):
+    return _update_batch('students', 'StudentID', updates,
+                         ['StudentID', 'FirstName', 'LastName', 'DateOfBirth', 'Major'],
+                         [_check_dob])
+
+@metrics.instrument
+def update_courses(updates):
+    return _update_batch('courses', 'CourseID', updates,
+                         ['CourseID', 'CourseName', 'Credits', 'Department'],
+                         [lambda df, errors: _check_range(df, errors, 'Credits', 1, 4, "The hours must be between 1 and 4 ")])
+
+@metrics.instrument
+def update_instructors(updates):
+    # An instructor may keep their own email, any other one in use is taken
+    return _update_batch('instructors', 'InstructorID', updates,
+                         ['InstructorID', 'FirstName', 'LastName', 'Department'],
+                         [lambda df, errors: _check_unique(df, errors, 'Email', 'instructors',
+                                                           _current_values('instructors', 'InstructorID', 'Email', list(updates)))],
+                         cascade=False)
+
+@metrics.instrument
+def update_enrollments(updates):
+    # updates: {(StudentID, CourseID, Semester, Year): data}
+    with _store().transaction():
+        keys = list(updates)
+        df = _batch_frame('enrollments', updates.values())
+        errors = _batch_errors(df)
+        _check_not_null(df, errors, ['StudentID', 'CourseID', 'Semester', 'Year'])
+        _check_range(df, errors, 'Grade', 0, 100, "The grade must be between 0 and 100 ")
+        _check_exists(df, errors, 'StudentID', 'students')
+        _check_exists(df, errors, 'CourseID', 'courses')
+        matches = [_enrollment_labels(*key) for key in keys]
+        _flag(errors, [not labels for labels in matches], "No matching data found :(")
+
+        changes = {}
+        for position, (key, labels) in enumerate(zip(keys, matches)):
+            if pd.notna(errors[position]):
+                continue
+            for column, value in updates[key].items():
+                changes.setdefault(column, {}).update({label: value for label in labels})
+        if changes:
+            _store().update_rows('enrollments', {column: pd.Series(values, dtype=object) for column, values in changes.items()})
+        return _report(keys, errors)
+
+def _delete_batch(table_name, key_field, ids, cascade_field=None):
+    with _store().transaction():
+        ids = list(ids)
+        errors = pd.Series(None, index=range(len(ids)), dtype=object)
+        table = _store().table(table_name)
+        index = table.index(key_field)
+        keys = table.schema.keys(key_field, ids)
+        _flag(errors, [key not in index for key in keys], "No Data Found :(")
+        found = [key for key, error in zip(keys, errors) if pd.isna(error)]
+
+        if cascade_field and found and _store().exists('enrollments'):
+            with metrics.phase('cascade'):
+                enrollments = _store().frame('enrollments')
+                related = enrollments.index[enrollments[cascade_field].isin(found)]
+                if len(related):
+                    _store().delete('enrollments', related.tolist())
+        if found:
+            _store().delete(table_name, [label for key in found for label in index.lookup(key)])
+        return _report(ids, errors)
+
+@metrics.instrument
+def delete_students(ids):
+    return _delete_batch('students', 'StudentID', ids, 'StudentID')
+
+@metrics.instrument
+def delete_courses(ids):
+    return _delete_batch('courses', 'CourseID', ids, 'CourseID')
+
+@metrics.instrument
+def delete_instructors(ids):
+    return _delete_batch('instructors', 'InstructorID', ids)
+
+@metrics.instrument
+def delete_enrollments(keys):
+    # keys: (StudentID, CourseID, Semester, Year) tuples
+    with _store().transaction():
+        keys = list(keys)
+        errors = pd.Series(None, index=range(len(keys)), dtype=object)
+        matches = [_enrollment_labels(*key) for key in keys]
+        _flag(errors, [not labels for labels in matches], "No Data Found :(")
+        labels = sorted({label for found in matches for label in found})
+        if labels:
+            _store().delete('enrollments', labels)
+        return _report(keys, errors)
+
+# ------ Bulk Checks ------
+@metrics.instrument
+def find_underage_students():
+    # The age rule of _validate_dob for every stored student at once, one probe of the sorted DateOfBirth index
+    if not _store().exists('students'):
+        return []
+    cutoff = (datetime.now() - timedelta(days=365*17)).strftime('%Y-%m-%d')
+    return _store().range('students', 'DateOfBirth', cutoff, None, ['StudentID'], 'neither')['StudentID'].tolist()
+
 # ------ Main Implementation ------
 
 def main():
@@ -344,10 +633,11 @@ def main():
         'Email': 'ahmed@univ.5du'
     })
 
+    # The student and the course added above
     add_enrollment({
-        'StudentID': 'S4',
-        'CourseID': 'C4',
-        'Semester': 'الفصل الأول',
+        'StudentID': 33,
+        'CourseID': 'C41',
+        'Semester': 'الفصل الثاني',
         'Year': 2023,
         'Grade': 85
     }) 
@@ -385,9 +675,10 @@ def main():
         'Email': 'ahmed@univ.520du'
     })
 
+    # The new keys must exist, here the student and the course added above
     update_enrollment(20258170,'C9564','الفصل الثاني',2021,{
-        'StudentID': 25,
-        'CourseID': 'CCC',
+        'StudentID': 33,
+        'CourseID': 'C41',
         'Semester': 'الفصل الأول',
         'Year': 2023,
         'Grade': 85
@@ -2,6 +2,10 @@ import pandas as pd
 from faker import Faker
 from datetime import datetime, timedelta
 import os
+from data_store import get_store
+import metrics
+from queries import students_in_course, course_counts_by_department, weighted_grades, iter_rows, iter_frame, page_frame
+from queries import students_born_between, enrollments_by_grade, top_students
 
 # Define file names and column headers
 FILES = {
@@ -12,16 +16,19 @@ FILES = {
     'enrollments': 'Enrollment.csv'
 }
 
+# ------ Shared Table Store ------
+def _store():
+    return get_store(FILES)
+
 # ------ Validation Functions ------
 def _validate_not_null(data, required_fields):
     for field in required_fields:
         if not data.get(field):
             raise ValueError(f"{field} Its empty!")
 
-def _validate_unique(field, value, file_path):
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        if value in df[field].values:
+def _validate_unique(field, value, table_name):
+    if _store().exists(table_name):
+        if _store().has_key(table_name, field, value):
             raise ValueError(f" {value} Already exists{field}")
 
 def _validate_credits(credits):
@@ -38,23 +45,70 @@ def _validate_grade(grade):
         raise ValueError("The grade must be between 0 and 100 ")
 
 # ------ Referential Integrity Functions ------
-def _delete_related_records(main_file, related_file, key_field, key_value):
-    if os.path.exists(related_file):
-        df = pd.read_csv(related_file)
-        df = df[df[key_field] != key_value]
-        df.to_csv(related_file, index=False, encoding='utf-8-sig')
-
-def _update_related_ids(file_path, id_field, old_id, new_id):
-    if os.path.exists(file_path):
-        df = pd.read_csv(file_path)
-        df.loc[df[id_field] == old_id, id_field] = new_id
-        df.to_csv(file_path, index=False, encoding='utf-8-sig')
+def _delete_related_records(main_table, related_table, key_field, key_value):
+    if _store().exists(related_table):
+        labels = _store().labels(related_table, key_field, key_value)
+        if labels:
+            _store().delete(related_table, labels)
+
+def _update_related_ids(table_name, id_field, old_id, new_id):
+    if _store().exists(table_name):
+        labels = _store().labels(table_name, id_field, old_id)
+        if labels:
+            _store().update(table_name, labels, {id_field: new_id})
+
+# ------ Returning API ------
+# Rows are yielded as dicts, only as far as the caller reads them.
+# after is the order_by value (or values) of the last row already seen
+def iter_student(student_id):
+    yield from iter_rows('students', 'StudentID', student_id, store=_store())
+
+def iter_courses_by_department(department_name, limit=None, offset=0, after=None, order_by='CourseID'):
+    yield from iter_rows('courses', 'Department', department_name, None, order_by, after, limit, offset, _store())
+
+def iter_students_in_course(course_id, limit=None, offset=0, after=None, order_by=('StudentID', 'Year', 'Semester')):
+    yield from iter_rows('enrollments', 'CourseID', course_id, ['StudentID', 'Semester', 'Year'], order_by, after, limit, offset, _store())
+
+def iter_instructor(instructor_id):
+    yield from iter_rows('instructors', 'InstructorID', instructor_id, store=_store())
+
+def iter_enrollments_for_student(student_id, limit=None, offset=0, after=None, order_by=('CourseID', 'Year', 'Semester')):
+    yield from iter_rows('enrollments', 'StudentID', student_id, None, order_by, after, limit, offset, _store())
+
+def iter_course_roster(course_id, limit=None, offset=0, after=None, order_by=('StudentID', 'Year', 'Semester')):
+    yield from iter_frame(students_in_course(course_id, store=_store()), None, order_by, after, limit, offset)
+
+def iter_department_course_counts(department=None, limit=None, offset=0, after=None, order_by='Department'):
+    yield from iter_frame(course_counts_by_department(department, store=_store()), None, order_by, after, limit, offset)
+
+def iter_weighted_grades(student_id=None, limit=None, offset=0, after=None, order_by='StudentID'):
+    yield from iter_frame(weighted_grades(student_id, store=_store()), None, order_by, after, limit, offset)
+
+def iter_students_born_between(start=None, end=None, limit=None, offset=0):
+    yield from iter_frame(students_born_between(start, end, store=_store()), limit=limit, offset=offset)
+
+def iter_enrollments_by_grade(low=None, high=None, year=None, limit=None, offset=0):
+    yield from iter_frame(enrollments_by_grade(low, high, year, store=_store()), limit=limit, offset=offset)
+
+def iter_top_students(course_id=None, n=10, semester=None, year=None):
+    yield from iter_frame(top_students(course_id, n, semester, year, store=_store()))
+
+def iter_students_by_name(name, limit=10):
+    yield from iter_frame(_store().search('students', name, limit))
+
+def iter_instructors_by_name(name, limit=10):
+    yield from iter_frame(_store().search('instructors', name, limit))
 
 # ------ Data Retrieval ------
+# Printing on top of the same lookups, limit/offset print one page in file order
+def _page(df, limit=None, offset=0):
+    return df if limit is None and not offset else df.iloc[offset:None if limit is None else offset + limit]
+
+@metrics.instrument
 def retrieve_student(student_id):
-    if os.path.exists(FILES['students']):
-        df = pd.read_csv(FILES['students'])
-        student_data = df[df['StudentID'] == student_id]
+    if _store().exists('students'):
+        student_data = _store().lookup('students', 'StudentID', student_id)
+        metrics.rows_returned(len(student_data))
         if not student_data.empty:
             print("Student Data :")
             print(student_data.to_string(index = False))
@@ -63,10 +117,11 @@ def retrieve_student(student_id):
     else:
         print("Error : The file does not exist!")
 
-def retrieve_courses_by_department(department_name):
-    if os.path.exists(FILES['courses']):
-        df = pd.read_csv(FILES['courses'])
-        department_data = df[df['Department'] == department_name]
+@metrics.instrument
+def retrieve_courses_by_department(department_name, limit=None, offset=0):
+    if _store().exists('courses'):
+        department_data = page_frame('courses', 'Department', department_name, limit=limit, offset=offset, store=_store())
+        metrics.rows_returned(len(department_data))
         if not department_data.empty:
                 print("Department Data :")
                 print(department_data.to_string(index = False))
@@ -75,10 +130,11 @@ def retrieve_courses_by_department(department_name):
     else:
         print("Error : The file does not exist!")
 
-def retrieve_students_in_course(course_id):
-    if os.path.exists(FILES['enrollments']):
-        df = pd.read_csv(FILES['enrollments'])
-        student_ids = df[df['CourseID'] == course_id]['StudentID']
+@metrics.instrument
+def retrieve_students_in_course(course_id, limit=None, offset=0):
+    if _store().exists('enrollments'):
+        student_ids = page_frame('enrollments', 'CourseID', course_id, ['StudentID'], limit=limit, offset=offset, store=_store())['StudentID']
+        metrics.rows_returned(len(student_ids))
         if not student_ids.empty:
             print("Student Data :")
             print(student_ids.to_string(index = False))
@@ -87,10 +143,11 @@ def retrieve_students_in_course(course_id):
     else:
         print("Error : The file does not exist!")
 
+@metrics.instrument
 def retrieve_instructor(instructor_id):
-    if os.path.exists(FILES['instructors']):
-        df = pd.read_csv(FILES['instructors'])
-        instructor_data = df[df['InstructorID'] == instructor_id]
+    if _store().exists('instructors'):
+        instructor_data = _store().lookup('instructors', 'InstructorID', instructor_id)
+        metrics.rows_returned(len(instructor_data))
         if not instructor_data.empty:
             print("Instructor Data :")
             print(instructor_data.to_string(index = False))
@@ -99,10 +156,11 @@ def retrieve_instructor(instructor_id):
     else:
         print("Error : The file does not exist!")
 
-def retrieve_enrollments_for_student(student_id):
-    if os.path.exists(FILES['enrollments']):
-        df = pd.read_csv(FILES['enrollments'])
-        student_data = df[df['StudentID'] == student_id]
+@metrics.instrument
+def retrieve_enrollments_for_student(student_id, limit=None, offset=0):
+    if _store().exists('enrollments'):
+        student_data = page_frame('enrollments', 'StudentID', student_id, limit=limit, offset=offset, store=_store())
+        metrics.rows_returned(len(student_data))
         if not student_data.empty:
             print("Student Data :")
             print(student_data.to_string(index = False))
@@ -111,12 +169,137 @@ def retrieve_enrollments_for_student(student_id):
     else:
         print("Error : The file does not exist!")
 
-def retrieve_average_grade(course_id, semester):
-    if os.path.exists(FILES['enrollments']):
-        df = pd.read_csv(FILES['enrollments'])
-        grades = df[(df['CourseID'] == course_id) & (df['Semester'] == semester)]['Grade']        
+@metrics.instrument
+def retrieve_average_grade(course_id, semester, year=None):
+    if _store().exists('enrollments'):
+        # Served from the grade aggregates, leaving out the year combines all years
+        key = (course_id, semester) if year is None else (course_id, semester, year)
+        stats = _store().stats('enrollments', 'grades', *key)
+        metrics.rows_returned(stats is not None)
+        if stats is not None:
+            print(stats['mean'])
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_grade_stats(course_id, semester, year=None):
+    if _store().exists('enrollments'):
+        key = (course_id, semester) if year is None else (course_id, semester, year)
+        stats = _store().stats('enrollments', 'grades', *key)
+        metrics.rows_returned(stats is not None)
+        if stats is not None:
+            print("Grade Statistics :")
+            print(pd.Series(stats, dtype=object).to_string())
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+# ------ Joined Queries ------
+@metrics.instrument
+def retrieve_course_roster(course_id, limit=None, offset=0):
+    if _store().exists('enrollments') and _store().exists('students'):
+        roster = _page(students_in_course(course_id, store=_store()), limit, offset)
+        metrics.rows_returned(len(roster))
+        if not roster.empty:
+            print("Student Data :")
+            print(roster.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_department_course_counts(department=None, limit=None, offset=0):
+    if _store().exists('courses') and _store().exists('enrollments'):
+        counts = _page(course_counts_by_department(department, store=_store()), limit, offset)
+        metrics.rows_returned(len(counts))
+        if not counts.empty:
+            print("Department Data :")
+            print(counts.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_weighted_grades(student_id=None, limit=None, offset=0):
+    if _store().exists('enrollments') and _store().exists('courses') and _store().exists('students'):
+        grades = _page(weighted_grades(student_id, store=_store()), limit, offset)
+        metrics.rows_returned(len(grades))
         if not grades.empty:
-            print(grades.mean())
+            print("Weighted Grades :")
+            print(grades.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+# ------ Range Queries ------
+@metrics.instrument
+def retrieve_students_born_between(start=None, end=None, limit=None, offset=0):
+    if _store().exists('students'):
+        students = _page(students_born_between(start, end, store=_store()), limit, offset)
+        metrics.rows_returned(len(students))
+        if not students.empty:
+            print("Student Data :")
+            print(students.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_enrollments_by_grade(low=None, high=None, year=None, limit=None, offset=0):
+    if _store().exists('enrollments'):
+        enrollments = _page(enrollments_by_grade(low, high, year, store=_store()), limit, offset)
+        metrics.rows_returned(len(enrollments))
+        if not enrollments.empty:
+            print("Enrollment Data :")
+            print(enrollments.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_top_students(course_id=None, n=10, semester=None, year=None):
+    if _store().exists('enrollments') and _store().exists('students'):
+        students = top_students(course_id, n, semester, year, store=_store())
+        metrics.rows_returned(len(students))
+        if not students.empty:
+            print("Top Students :")
+            print(students.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+# ------ Name Search ------
+# Spelling variants match too (hamza forms, taa marbuta, the آل/ال prefixes), best matches first
+@metrics.instrument
+def retrieve_students_by_name(name, limit=10):
+    if _store().exists('students'):
+        students = _store().search('students', name, limit)
+        metrics.rows_returned(len(students))
+        if not students.empty:
+            print("Student Data :")
+            print(students.to_string(index = False))
+        else:
+            print(f"No Data Found :(")
+    else:
+        print("Error : The file does not exist!")
+
+@metrics.instrument
+def retrieve_instructors_by_name(name, limit=10):
+    if _store().exists('instructors'):
+        instructors = _store().search('instructors', name, limit)
+        metrics.rows_returned(len(instructors))
+        if not instructors.empty:
+            print("Instructor Data :")
+            print(instructors.to_string(index = False))
         else:
             print(f"No Data Found :(")
     else:
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import signal
+import argparse
+import threading
+import importlib.util
+import socketserver
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import metrics
+from data_store import get_store
+from queries import students_in_course, course_counts_by_department, weighted_grades, iter_rows
+from queries import students_born_between, enrollments_by_grade, top_students
+
+# Define file names and column headers
+FILES = {
+    'departments': 'Department.csv',
+    'students': 'Student.csv',
+    'courses': 'Course.csv',
+    'instructors': 'Instructor.csv',
+    'enrollments': 'Enrollment.csv'
+}
+
+SOCKET_PATH = 'university.sock'
+
+# ------ Shared Table Store ------
+def _store():
+    return get_store(FILES)
+
+def _load_querying():
+    # The add/update/delete rules live in the Data Querying script
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Data Querying.py')
+    spec = importlib.util.spec_from_file_location('data_querying', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# ------ Reader/Writer Lock ------
+class ReadWriteLock:
+    # Many readers or one writer; a waiting writer holds back new readers
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+# ------ Operations ------
+def _value(value):
+    if value is None or value != value or value is pd.NA:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def _records(df):
+    # Row by row is far cheaper than frame-wide conversions for the few rows a lookup returns
+    columns = list(df.columns)
+    return [dict(zip(columns, map(_value, row))) for row in df.itertuples(index=False, name=None)]
+
+def _lookup(table_name, column):
+    # Point lookups read the matching positions straight out of the column arrays,
+    # a page (limit, offset, after, order_by) is read through the row iterator
+    def lookup(key, **paging):
+        if paging:
+            return list(iter_rows(table_name, column, key, store=_store(), **paging))
+        table = _store().table(table_name)
+        frame = table.frame()
+        positions = frame.index.get_indexer(sorted(table.labels(column, key)))
+        arrays = [(name, frame[name].array) for name in frame.columns]
+        return [{name: _value(values[position]) for name, values in arrays} for position in positions]
+    return lookup
+
+def _grade_stats(course_id, semester, year=None):
+    key = (course_id, semester) if year is None else (course_id, semester, year)
+    return _store().stats('enrollments', 'grades', *key)
+
+READ_OPERATIONS = {
+    'retrieve_student': _lookup('students', 'StudentID'),
+    'retrieve_courses_by_department': _lookup('courses', 'Department'),
+    'retrieve_students_in_course': lambda course_id: _store().lookup('enrollments', 'CourseID', course_id, columns=['StudentID'])['StudentID'].tolist(),
+    'retrieve_instructor': _lookup('instructors', 'InstructorID'),
+    'retrieve_enrollments_for_student': _lookup('enrollments', 'StudentID'),
+    'retrieve_average_grade': lambda *key: (_grade_stats(*key) or {}).get('mean'),
+    'retrieve_grade_stats': _grade_stats,
+    'retrieve_course_roster': lambda course_id: _records(students_in_course(course_id, store=_store())),
+    'retrieve_department_course_counts': lambda department=None: _records(course_counts_by_department(department, store=_store())),
+    'retrieve_weighted_grades': lambda student_id=None: _records(weighted_grades(student_id, store=_store())),
+    'retrieve_students_born_between': lambda start=None, end=None: _records(students_born_between(start, end, store=_store())),
+    'retrieve_enrollments_by_grade': lambda low=None, high=None, year=None: _records(enrollments_by_grade(low, high, year, store=_store())),
+    'retrieve_top_students': lambda course_id=None, n=10, semester=None, year=None: _records(top_students(course_id, n, semester, year, store=_store())),
+    'retrieve_students_by_name': lambda name, limit=10: _records(_store().search('students', name, limit)),
+    'retrieve_instructors_by_name': lambda name, limit=10: _records(_store().search('instructors', name, limit)),
+    # Change events after a sequence number, for consumers syncing over the socket
+    'read_changes': lambda after=0, limit=1000, tables=None: list(_store().read_changes(after, limit, tables)),
+}
+
+def _write_operations(querying):
+    # Single-record calls go through the batch functions, which report errors instead of printing them
+    return {
+        'add_student': lambda data: querying.add_students([data]),
+        'add_course': lambda data: querying.add_courses([data]),
+        'add_instructor': lambda data: querying.add_instructors([data]),
+        'add_enrollment': lambda data: querying.add_enrollments([data]),
+        'update_student': lambda old_id, data: querying.update_students({old_id: data}),
+        'update_course': lambda old_id, data: querying.update_courses({old_id: data}),
+        'update_instructor': lambda old_id, data: querying.update_instructors({old_id: data}),
+        'update_enrollment': lambda student_id, course_id, semester, year, data:
+            querying.update_enrollments({(student_id, course_id, semester, year): data}),
+        'delete_student': lambda student_id: querying.delete_students([student_id]),
+        'delete_course': lambda course_id: querying.delete_courses([course_id]),
+        'delete_instructor': lambda instructor_id: querying.delete_instructors([instructor_id]),
+        'delete_enrollment': lambda student_id, course_id, semester, year:
+            querying.delete_enrollments([(student_id, course_id, semester, year)]),
+        'add_students': querying.add_students,
+        'add_courses': querying.add_courses,
+        'add_instructors': querying.add_instructors,
+        'add_enrollments': querying.add_enrollments,
+        'update_students': lambda updates: querying.update_students(dict(updates)),
+        'update_courses': lambda updates: querying.update_courses(dict(updates)),
+        'update_instructors': lambda updates: querying.update_instructors(dict(updates)),
+        # JSON has no tuple keys: [[StudentID, CourseID, Semester, Year], data] pairs
+        'update_enrollments': lambda updates: querying.update_enrollments({tuple(key): data for key, data in updates}),
+        'delete_students': querying.delete_students,
+        'delete_courses': querying.delete_courses,
+        'delete_instructors': querying.delete_instructors,
+        'delete_enrollments': lambda keys: querying.delete_enrollments([tuple(key) for key in keys]),
+    }
+
+def _json_default(value):
+    return value.item() if hasattr(value, 'item') else str(value)
+
+# ------ Server ------
+class QueryServer(socketserver.UnixStreamServer):
+    def __init__(self, socket_path, workers):
+        self.lock = ReadWriteLock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.writes = _write_operations(_load_querying())
+        self.warm()
+        super().__init__(socket_path, RequestHandler)
+
+    def process_request(self, request, client_address):
+        # Each connection is served on the pool, requests on one connection run in order
+        self.executor.submit(self._serve, request, client_address)
+
+    def _serve(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+    def warm(self):
+        # Frames and every index, aggregate, key set, sorted index and name index are built once here, never by concurrent readers
+        for table in _store().tables.values():
+            if table.exists():
+                table.warm()
+
+    def stale(self):
+        return any(table.exists() and table.is_stale() for table in _store().tables.values())
+
+    @contextmanager
+    def writing(self):
+        self.lock.acquire_write()
+        try:
+            yield
+        finally:
+            try:
+                self.warm()
+            finally:
+                self.lock.release_write()
+
+    @contextmanager
+    def reading(self):
+        if self.stale():
+            # Another process changed a file, reload it before readers share it
+            with self.writing():
+                pass
+        self.lock.acquire_read()
+        try:
+            yield
+        finally:
+            self.lock.release_read()
+
+    def execute(self, request):
+        op = request.get('op')
+        args = request.get('args', [])
+        kwargs = request.get('kwargs', {})
+        if op == 'metrics':
+            # Counters collected so far, when the server runs with metrics enabled
+            return metrics.snapshot() if metrics.enabled() else None
+        if op in READ_OPERATIONS:
+            with self.reading(), metrics.operation(op):
+                return READ_OPERATIONS[op](*args, **kwargs)
+        if op in self.writes:
+            # Writes are serialized and wait for the readers in flight
+            with self.writing(), metrics.operation(op):
+                return self.writes[op](*args, **kwargs)
+        raise ValueError(f"Unknown operation {op}")
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    # One JSON object per line in each direction
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = {'ok': True, 'result': self.server.execute(json.loads(line))}
+            except Exception as e:
+                response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False, default=_json_default).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+def serve(socket_path=SOCKET_PATH, workers=8):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = QueryServer(socket_path, workers)
+    # A plain kill shuts down like Ctrl+C, so the socket file is removed and the sidecars are saved
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on {socket_path} :)", flush=True)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        _store().flush()
+
+# ------ Main Implementation ------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep the university tables in memory and answer queries on a Unix socket")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    parser.add_argument('--workers', type=int, default=8, help="threads serving connections")
+    parser.add_argument('--metrics', action='store_true', help="collect operation metrics, served by the 'metrics' request")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+    serve(args.socket, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import argparse
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from data_store import get_store
+from queries import hash_join
+from parallel import ordered_results
+
+# Define file names and column headers
+FILES = {
+    'departments': 'Department.csv',
+    'students': 'Student.csv',
+    'courses': 'Course.csv',
+    'instructors': 'Instructor.csv',
+    'enrollments': 'Enrollment.csv'
+}
+
+TRANSCRIPT_COLUMNS = ['StudentID', 'Year', 'Semester', 'CourseID', 'Credits', 'Grade']
+AVERAGE_COLUMNS = ['StudentID', 'Year', 'Semester', 'Credits', 'WeightedAverage']
+
+# Students per partition handed to one worker
+PARTITION_STUDENTS = 5000
+
+# ------ Partitioning ------
+def _partitions(enrollments, size):
+    # Contiguous StudentID ranges, so the output comes out sorted by student
+    codes, students = pd.factorize(enrollments['StudentID'], sort=True)
+    if not len(students):
+        return
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(0, len(students), size).tolist() + [len(students)])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield enrollments.iloc[order[start:end]]
+
+# ------ Transcript Of One Partition ------
+def _weighted(graded, keys):
+    totals = graded.groupby(keys, sort=True, observed=True)[['Credits', 'Points']].sum()
+    totals['WeightedAverage'] = (totals['Points'] / totals['Credits']).round(2)
+    return totals.drop(columns=['Points']).reset_index()
+
+def build_transcripts(task):
+    enrollments, credits = task
+    joined = hash_join(enrollments, credits, 'CourseID').dropna(subset=['Credits'])
+    transcript = joined.sort_values(['StudentID', 'Year', 'Semester', 'CourseID'], kind='stable')[TRANSCRIPT_COLUMNS]
+
+    graded = transcript.dropna(subset=['Grade']).copy()
+    graded['Points'] = graded['Grade'].astype(float) * graded['Credits'].astype(float)
+    semesters = _weighted(graded, ['StudentID', 'Year', 'Semester'])
+    overall = _weighted(graded, ['StudentID'])
+    # The overall line of each student follows its semester lines
+    semesters['_order'] = 0
+    overall['_order'] = 1
+    averages = pd.concat([semesters, overall], ignore_index=True)
+    averages = averages.sort_values(['StudentID', '_order'], kind='stable')[AVERAGE_COLUMNS]
+    # The CSV text is formatted in the worker, the parent only writes it out
+    return (transcript.to_csv(header=False, index=False, lineterminator='\n'),
+            averages.to_csv(header=False, index=False, lineterminator='\n'))
+
+# ------ Batch Job ------
+def run_transcripts(transcript_file, averages_file, workers=1, partition_students=PARTITION_STUDENTS, store=None):
+    store = store or get_store(FILES)
+    if not store.exists('enrollments') or not store.exists('courses'):
+        print("Error : The file does not exist!")
+        return
+    enrollments = store.frame('enrollments', ['StudentID', 'CourseID', 'Semester', 'Year', 'Grade'])
+    credits = store.frame('courses', ['CourseID', 'Credits'])
+    tasks = ((part, credits) for part in _partitions(enrollments, partition_students))
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        with open(transcript_file, 'w', encoding='utf-8-sig', newline='') as transcript_out, \
+                open(averages_file, 'w', encoding='utf-8-sig', newline='') as averages_out:
+            # BOM and header are written once, then each partition as soon as it is ready
+            pd.DataFrame(columns=TRANSCRIPT_COLUMNS).to_csv(transcript_out, index=False, lineterminator='\n')
+            pd.DataFrame(columns=AVERAGE_COLUMNS).to_csv(averages_out, index=False, lineterminator='\n')
+            for transcript, averages in ordered_results(build_transcripts, tasks, pool, 2 * workers):
+                transcript_out.write(transcript)
+                averages_out.write(averages)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    print(f"Created {transcript_file} Successfully :)")
+    print(f"Created {averages_file} Successfully :)")
+
+# ------ Main Implementation ------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write every student's transcript and credit-weighted averages")
+    parser.add_argument('--transcripts', default='Transcript.csv', help="one line per graded course")
+    parser.add_argument('--averages', default='WeightedAverage.csv', help="per-semester and overall averages")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--partition-students', type=int, default=PARTITION_STUDENTS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_transcripts(args.transcripts, args.averages, args.workers, args.partition_students)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import random
+import argparse
+from multiprocessing import Pool
+import numpy as np
 import pandas as pd
 from faker import Faker
 from datetime import datetime, timedelta
 import os
+from parallel import ordered_results
 
 # Initialize Faker for Arabic data generation
 fake = Faker('ar_SA')
@@ -22,6 +26,15 @@ course_columns = ['CourseID', 'CourseName', 'Credits', 'Department']
 instructor_columns = ['InstructorID', 'FirstName', 'LastName', 'Department', 'Rank', 'Email']
 enrollment_columns = ['StudentID', 'CourseID', 'Semester', 'Year', 'Grade']
 
+# Value lists shared by the loop and vectorized generators
+DEPARTMENT_NAMES = ['كلية الصيدلة', 'كلية التربية', 'كلية العلوم', 'كلية الهندسة', 'كلية الزراعة', 'كلية الطب']
+COURSE_NAMES = ['كتابة تقارير', 'مهارات تواصل', 'عربي', 'انجليزي', 'رياضة', 'فيزياء', 'كيمياء']
+ADDRESSES = ['القبة', 'المرج', 'البيضاء', 'بنغازي', 'طرابلس']
+RANKS = ['أستاذ', 'أستاذ مساعد', 'محاضر']
+SEMESTERS = ['الفصل الأول', 'الفصل الثاني']
+# Ages of the sharded generator are counted from this date, so a seed gives the same files on any day
+REFERENCE_DATE = '2025-09-01'
+
 # ------ Validation Functions ------
 def _validate_not_null(data, required_fields):
     for field in required_fields:
@@ -52,10 +65,7 @@ def generate_departments(num):
     departments = []
     for i in range(num):
         dept_id = f"D{str(i+1).zfill(4)}"
-        dept_name = fake.random_element([
-            'كلية الصيدلة', 'كلية التربية', 'كلية العلوم',
-            'كلية الهندسة', 'كلية الزراعة', 'كلية الطب'
-        ])
+        dept_name = fake.random_element(DEPARTMENT_NAMES)
         departments.append([dept_id, dept_name])
     return departments
 
@@ -70,7 +80,7 @@ def generate_students(num, departments):
             'LastName': fake.last_name(),
             'DateOfBirth': fake.date_of_birth(minimum_age=17, maximum_age=25).strftime('%Y-%m-%d'),
             'Major': random.choice(dept_names),
-            'Address': fake.random_element(elements=('القبة', 'المرج', 'البيضاء', 'بنغازي', 'طرابلس')),
+            'Address': fake.random_element(elements=ADDRESSES),
             'Phone': fake.random_element(elements=([f"091{random.randint(1000000,9999999)}", f"092{random.randint(1000000,9999999)}"]))
         }
         
@@ -89,10 +99,7 @@ def generate_courses(num, departments):
     for i in range(num):
         course_data = {
             'CourseID': f"C{str(i+1).zfill(4)}",
-            'CourseName': fake.random_element([
-                'كتابة تقارير', 'مهارات تواصل', 'عربي',
-                'انجليزي', 'رياضة', 'فيزياء', 'كيمياء'
-            ]),
+            'CourseName': fake.random_element(COURSE_NAMES),
             'Credits': random.randint(1, 4),
             'Department': random.choice(dept_names)
         }
@@ -107,6 +114,7 @@ def generate_courses(num, departments):
 def generate_instructors(num, departments):
     instructors = []
     dept_names = [d[1] for d in departments]
+    emails = set()
     
     for i in range(num):
         instructor_data = {
@@ -114,12 +122,14 @@ def generate_instructors(num, departments):
             'FirstName': fake.first_name(),
             'LastName': fake.last_name(),
             'Department': random.choice(dept_names),
-            'Rank': fake.random_element(elements=('أستاذ', 'أستاذ مساعد', 'محاضر')),
+            'Rank': fake.random_element(elements=RANKS),
             'Email': fake.unique.email()
         }
         
         try:
-            _validate_unique('Email', instructor_data['Email'], FILES['instructors'])
+            if instructor_data['Email'] in emails:
+                raise ValueError(f" {instructor_data['Email']} Already exists Email")
+            emails.add(instructor_data['Email'])
             instructors.append(list(instructor_data.values()))
         except Exception as e:
             print(f"Invalid data skipped {e}")    
@@ -134,7 +144,7 @@ def generate_enrollments(students, courses):
         enroll_data = {
             'StudentID': random.choice(student_ids),
             'CourseID': random.choice(course_ids),
-            'Semester': random.choice(['الفصل الأول', 'الفصل الثاني']),
+            'Semester': random.choice(SEMESTERS),
             'Year': random.randint(2020, 2023),
             'Grade': random.randint(50, 100)
         }
@@ -148,13 +158,231 @@ def save_to_csv(data, columns, filename):
     print(f"Created {filename} Successfully :)")
 
 
+# ------ Vectorized Data Generation ------
+def build_name_pools(size=1000):
+    # Faker is only called here, the vectorized generators sample from these pools
+    return {
+        'first_names': np.array(sorted({fake.first_name() for _ in range(size)})),
+        'last_names': np.array(sorted({fake.last_name() for _ in range(size)})),
+        'user_names': np.array(sorted({fake.user_name() for _ in range(size)})),
+        'domains': np.array(sorted({fake.safe_domain_name() for _ in range(size // 10)})),
+    }
+
+def _format_ids(prefix, ordinals):
+    return np.char.add(prefix, np.char.zfill(np.asarray(ordinals).astype(str), 4))
+
+def _valid_ordinals(positions, dropped):
+    # Maps positions 0..n-1 onto the 1-based ordinals that were not dropped
+    dropped = np.sort(np.asarray(dropped, dtype=np.int64))
+    if not len(dropped):
+        return positions + 1
+    shifted = dropped - np.arange(len(dropped)) - 1
+    return positions + 1 + np.searchsorted(shifted, positions, side='right')
+
+def _dob_range(reference_date):
+    # Same bounds as fake.date_of_birth(minimum_age=17, maximum_age=25), counted from reference_date
+    today = pd.Timestamp(reference_date).normalize()
+    latest = today - pd.DateOffset(years=17)
+    earliest = today - pd.DateOffset(years=26) + pd.Timedelta(days=1)
+    return np.datetime64(earliest.date(), 'D'), np.datetime64(latest.date(), 'D')
+
+def _unique_emails(ordinals, pools, rng):
+    # The user name ends in '.' and the instructor ordinal, which holds no '.',
+    # so two instructors never share an address, whatever shard they are in
+    return np.char.add(
+        np.char.add(rng.choice(pools['user_names'], len(ordinals)), np.char.add('.', np.asarray(ordinals).astype(str))),
+        np.char.add('@', rng.choice(pools['domains'], len(ordinals)))
+    )
+
+def generate_students_vectorized(num, dept_names, pools, rng, start=0, reference_date=REFERENCE_DATE):
+    earliest, latest = _dob_range(reference_date)
+    dob = earliest + rng.integers(0, (latest - earliest).astype(int) + 1, num)
+    students = pd.DataFrame({
+        'StudentID': _format_ids('2025', np.arange(start + 1, start + num + 1)),
+        'FirstName': rng.choice(pools['first_names'], num),
+        'LastName': rng.choice(pools['last_names'], num),
+        'DateOfBirth': np.datetime_as_string(dob, unit='D'),
+        'Major': rng.choice(dept_names, num),
+        'Address': rng.choice(ADDRESSES, num),
+        'Phone': np.char.add(rng.choice(['091', '092'], num), rng.integers(1000000, 10000000, num).astype(str)),
+    }, columns=student_columns)
+
+    # Same rule as _validate_dob, checked for the whole batch at once
+    too_young = dob > np.datetime64(pd.Timestamp(reference_date) - timedelta(days=365*17), 'D')
+    if too_young.any():
+        print(f"Invalid data skipped {int(too_young.sum())} rows: The age must be greater than 17")
+    return students[~too_young]
+
+def generate_courses_vectorized(num, dept_names, rng, start=0):
+    return pd.DataFrame({
+        'CourseID': _format_ids('C', np.arange(start + 1, start + num + 1)),
+        'CourseName': rng.choice(COURSE_NAMES, num),
+        'Credits': rng.integers(1, 5, num),
+        'Department': rng.choice(dept_names, num),
+    }, columns=course_columns)
+
+def generate_instructors_vectorized(num, dept_names, pools, rng, start=0):
+    ordinals = np.arange(start + 1, start + num + 1)
+    return pd.DataFrame({
+        'InstructorID': _format_ids('I', ordinals),
+        'FirstName': rng.choice(pools['first_names'], num),
+        'LastName': rng.choice(pools['last_names'], num),
+        'Department': rng.choice(dept_names, num),
+        'Rank': rng.choice(RANKS, num),
+        'Email': _unique_emails(ordinals, pools, rng),
+    }, columns=instructor_columns)
+
+def generate_enrollments_vectorized(num, num_students, num_courses, rng, dropped_students=()):
+    # Only the ID ordinals are sampled, IDs are formatted for the sampled rows
+    positions = rng.integers(0, num_students - len(dropped_students), num)
+    return pd.DataFrame({
+        'StudentID': _format_ids('2025', _valid_ordinals(positions, dropped_students)),
+        'CourseID': _format_ids('C', rng.integers(1, num_courses + 1, num)),
+        'Semester': rng.choice(SEMESTERS, num),
+        'Year': rng.integers(2020, 2024, num),
+        'Grade': rng.integers(50, 101, num),
+    }, columns=enrollment_columns)
+
+def save_frame_to_csv(df, filename):
+    df.to_csv(filename, index=False, encoding='utf-8-sig')
+    print(f"Created {filename} Successfully :)")
+
+# ------ Sharded Data Generation ------
+# Shard boundaries and seeds never depend on the worker count, so output is reproducible
+SHARD_ROWS = 100000
+TABLE_CODES = {'students': 1, 'courses': 2, 'instructors': 3, 'enrollments': 4}
+
+def _shard_rng(seed, table, shard):
+    return np.random.default_rng(np.random.SeedSequence([seed, TABLE_CODES[table], shard]))
+
+def _shards(table, total, seed, context):
+    return [
+        (table, shard, start, min(SHARD_ROWS, total - start), seed, context)
+        for shard, start in enumerate(range(0, total, SHARD_ROWS))
+    ]
+
+def _parts_dir(filename):
+    return os.path.splitext(filename)[0] + '.parts'
+
+def _part_path(filename, shard):
+    return os.path.join(_parts_dir(filename), f"part-{shard:05d}.csv")
+
+def _generate_shard(task):
+    table, shard, start, num, seed, context = task
+    rng = _shard_rng(seed, table, shard)
+    dropped = []
+    if table == 'students':
+        df = generate_students_vectorized(num, context['dept_names'], context['pools'], rng, start,
+                                          context['reference_date'])
+        dropped = np.setdiff1d(np.arange(start + 1, start + num + 1), start + 1 + df.index.to_numpy()).tolist()
+    elif table == 'courses':
+        df = generate_courses_vectorized(num, context['dept_names'], rng, start)
+    elif table == 'instructors':
+        df = generate_instructors_vectorized(num, context['dept_names'], context['pools'], rng, start)
+    else:
+        df = generate_enrollments_vectorized(num, context['num_students'], context['num_courses'], rng,
+                                             context['dropped_students'])
+    return df, dropped
+
+def _write_part(task):
+    table, shard = task[0], task[1]
+    df, dropped = _generate_shard(task)
+    df.to_csv(_part_path(FILES[table], shard), index=False, encoding='utf-8-sig')
+    return None, dropped
+
+def stream_to_csv(chunks, columns, filename):
+    # BOM and header are written once, then each chunk as soon as it is ready
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        pd.DataFrame(columns=columns).to_csv(f, index=False)
+        for chunk in chunks:
+            chunk.to_csv(f, header=False, index=False)
+    print(f"Created {filename} Successfully :)")
+
+def _generate_table(table, columns, total, seed, context, pool, window, keep_parts, dropped_students=None):
+    tasks = _shards(table, total, seed, context)
+    func = _write_part if keep_parts else _generate_shard
+    if keep_parts:
+        os.makedirs(_parts_dir(FILES[table]), exist_ok=True)
+
+    def chunks():
+        for df, dropped in ordered_results(func, tasks, pool, window):
+            if dropped_students is not None:
+                dropped_students.extend(dropped)
+            if df is not None:
+                yield df
+
+    if keep_parts:
+        for _ in chunks():
+            pass
+        print(f"Created {_parts_dir(FILES[table])} with {len(tasks)} parts :)")
+    else:
+        stream_to_csv(chunks(), columns, FILES[table])
+
+def generate_sharded(num_students, num_courses, num_instructors, seed=None, workers=1, keep_parts=False,
+                     reference_date=REFERENCE_DATE):
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**32)
+        print(f"Using seed {seed}")
+    Faker.seed(seed)
+    random.seed(seed)
+    departments = generate_departments(6)
+    context = {
+        'pools': build_name_pools(),
+        'dept_names': np.array([d[1] for d in departments]),
+        'reference_date': reference_date,
+    }
+    save_to_csv(departments, department_columns, FILES['departments'])
+
+    pool = Pool(workers) if workers > 1 else None
+    window = workers * 2
+    try:
+        dropped_students = []
+        _generate_table('students', student_columns, num_students, seed, context, pool, window, keep_parts,
+                        dropped_students)
+        _generate_table('courses', course_columns, num_courses, seed, context, pool, window, keep_parts)
+        _generate_table('instructors', instructor_columns, num_instructors, seed, context, pool, window, keep_parts)
+
+        # Enrollments only reference the students and courses generated above
+        enrollment_context = {
+            'num_students': num_students,
+            'num_courses': num_courses,
+            'dropped_students': np.array(dropped_students, dtype=np.int64),
+        }
+        _generate_table('enrollments', enrollment_columns, (num_students - len(dropped_students)) * 2,
+                        seed, enrollment_context, pool, window, keep_parts)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
 # ------ Main Implementation ------
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the university CSV files")
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--courses', type=int, default=10000)
+    parser.add_argument('--instructors', type=int, default=10000)
+    parser.add_argument('--vectorized', action='store_true', help="generate each table in NumPy batches")
+    parser.add_argument('--workers', type=int, default=None, help="generate shards on N processes (implies --vectorized)")
+    parser.add_argument('--keep-parts', action='store_true', help="leave each table as a directory of part files")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--reference-date', default=REFERENCE_DATE,
+                        help="YYYY-MM-DD the students' ages are counted from (sharded generator)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.vectorized or args.workers or args.keep_parts:
+        generate_sharded(args.students, args.courses, args.instructors, args.seed,
+                         args.workers or 1, args.keep_parts, args.reference_date)
+        print("Files created successfully :)")
+        return
+
     # Data generation and save to CSV files
     departments = generate_departments(6)
-    students = generate_students(10000, departments)
-    courses = generate_courses(10000, departments)    
-    instructors = generate_instructors(10000, departments)
+    students = generate_students(args.students, departments)
+    courses = generate_courses(args.courses, departments)    
+    instructors = generate_instructors(args.instructors, departments)
     enrollments = generate_enrollments(students, courses)
 
     save_to_csv(departments, department_columns, FILES['departments'])
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import argparse
+import numpy as np
+import metrics
+from data_store import FILES, PartitionedTable, get_store, _signature, tombstone_record
+from data_store import INDEX_SUFFIX, AGGREGATE_SUFFIX, BLOOM_SUFFIX, NAME_INDEX_SUFFIX, TOMBSTONE_SUFFIX
+
+# Snapshots list the chunks of every table file, each chunk is stored once under its SHA-256
+BACKUP_DIR = 'Backups'
+CHUNKS_DIR = 'chunks'
+SNAPSHOTS_DIR = 'snapshots'
+COMPRESSED_SUFFIX = '.z'
+
+# Content-defined chunks: a cut follows every window of WINDOW bytes whose gear sum has its low
+# CHUNK_BITS bits clear, so an edit only changes the chunks around it (about 64 KiB past the minimum)
+WINDOW = 32
+CHUNK_BITS = 16
+CHUNK_MIN = 16 * 1024
+CHUNK_MAX = 256 * 1024
+READ_BLOCK = 4 * 1024 * 1024
+
+# A fixed random value per byte, derived from SHA-256 so every run cuts at the same places
+_GEAR = np.frombuffer(b''.join(hashlib.sha256(bytes([value])).digest()[:4] for value in range(256)), dtype='<u4').astype(np.uint32)
+_MASK = np.uint32((1 << CHUNK_BITS) - 1)
+_SIDECARS = (INDEX_SUFFIX, AGGREGATE_SUFFIX, BLOOM_SUFFIX, NAME_INDEX_SUFFIX)
+
+# ------ Chunking ------
+def _cuts(data):
+    # End offsets of every window that can close a chunk, data starts at a chunk boundary
+    if len(data) < WINDOW:
+        return np.empty(0, dtype=np.int64)
+    sums = np.cumsum(_GEAR[data], dtype=np.uint32)
+    windows = sums[WINDOW - 1:] - np.concatenate(([np.uint32(0)], sums[:-WINDOW]))
+    return np.flatnonzero((windows & _MASK) == 0) + WINDOW
+
+def _chunks(f):
+    # Every cut only depends on the bytes of its own chunk, so the read block size never moves a cut
+    pending = b''
+    while True:
+        block = f.read(READ_BLOCK)
+        data = pending + block
+        if not data:
+            return
+        cuts = _cuts(np.frombuffer(data, dtype=np.uint8))
+        start = 0
+        while start < len(data):
+            position = np.searchsorted(cuts, start + CHUNK_MIN)
+            end = int(cuts[position]) if position < len(cuts) else start + CHUNK_MAX
+            end = min(end, start + CHUNK_MAX)
+            if end > len(data):
+                if block:
+                    break
+                end = len(data)
+            yield data[start:end]
+            start = end
+        pending = data[start:]
+        if not block:
+            return
+
+# ------ Chunk Store ------
+def _chunk_path(directory, digest):
+    return os.path.join(directory, CHUNKS_DIR, digest[:2], digest)
+
+def _write_chunk(directory, digest, data, compress):
+    # Returns the bytes written, nothing when the chunk is already stored
+    path = _chunk_path(directory, digest)
+    if os.path.exists(path) or os.path.exists(path + COMPRESSED_SUFFIX):
+        return 0
+    if compress:
+        data, path = zlib.compress(data, 6), path + COMPRESSED_SUFFIX
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(data)
+
+def _read_chunk(directory, digest):
+    path = _chunk_path(directory, digest)
+    if os.path.exists(path + COMPRESSED_SUFFIX):
+        with open(path + COMPRESSED_SUFFIX, 'rb') as f:
+            data = zlib.decompress(f.read())
+    elif os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read()
+    else:
+        raise ValueError(f"The chunk {digest} is missing from {directory}")
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ValueError(f"The chunk {digest} is damaged")
+    return data
+
+# ------ Snapshots ------
+def snapshots(directory=BACKUP_DIR):
+    # Snapshot ids, oldest first
+    path = os.path.join(directory, SNAPSHOTS_DIR)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(path) if name.endswith('.json'))
+
+def load_snapshot(snapshot=None, directory=BACKUP_DIR):
+    # The latest snapshot when none is named
+    ids = snapshots(directory)
+    if snapshot is None:
+        if not ids:
+            raise ValueError(f"There are no snapshots in {directory}")
+        snapshot = ids[-1]
+    if snapshot not in ids:
+        raise ValueError(f"The snapshot {snapshot} does not exist")
+    with open(os.path.join(directory, SNAPSHOTS_DIR, snapshot + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+def _new_id(directory):
+    snapshot = time.strftime('%Y%m%d-%H%M%S')
+    ids = set(snapshots(directory))
+    number = 1
+    candidate = snapshot
+    while candidate in ids:
+        candidate = f"{snapshot}-{number:03d}"
+        number += 1
+    return candidate
+
+def _table_files(table):
+    # Data files of a table as it is laid out now: one file, or a manifest and its partitions
+    if isinstance(table, PartitionedTable):
+        if not table.exists():
+            return []
+        return [(table.manifest_path, None)] + [(part.path, part) for _, part in table.partitions()]
+    return [(table.path, table)] if table.exists() else []
+
+def _backup_file(path, previous, directory, compress, totals):
+    # A file with the same signature as in the previous snapshot is not read at all
+    signature = list(_signature(path))
+    if previous is not None and previous['signature'] == signature:
+        return dict(previous)
+    chunks = []
+    with open(path, 'rb') as f:
+        for data in _chunks(f):
+            digest = hashlib.sha256(data).hexdigest()
+            written = _write_chunk(directory, digest, data, compress)
+            totals['bytes_read'] += len(data)
+            totals['bytes_written'] += written
+            totals['new_chunks'] += written > 0
+            chunks.append([digest, len(data)])
+    metrics.file_read(path)
+    totals['files_read'] += 1
+    return {'signature': signature, 'size': sum(size for _, size in chunks), 'chunks': chunks}
+
+@metrics.instrument
+def backup(directory=BACKUP_DIR, compress=False, store=None):
+    store = store or get_store(FILES)
+    data_dir = os.path.dirname(os.path.abspath(store.table(next(iter(store.tables))).path))
+    ids = snapshots(directory)
+    previous = load_snapshot(ids[-1], directory) if ids else {'tables': {}}
+    snapshot = {'id': _new_id(directory), 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'storage': store.backend.name, 'tables': {}}
+    totals = {'files_read': 0, 'bytes_read': 0, 'new_chunks': 0, 'bytes_written': 0}
+    # No writer can publish while the files are read, the snapshot is one consistent version
+    with store.read_lock():
+        for name, table in store.tables.items():
+            earlier = previous['tables'].get(name, {}).get('files', {})
+            files, deleted = {}, {}
+            for path, part in _table_files(table):
+                relative = os.path.relpath(os.path.abspath(path), data_dir)
+                files[relative] = _backup_file(path, earlier.get(relative), directory, compress, totals)
+                rows = part.tombstones() if part is not None else None
+                if rows:
+                    deleted[relative] = sorted(rows)
+            if files:
+                snapshot['tables'][name] = {'partitioned': isinstance(table, PartitionedTable), 'files': files, 'deleted': deleted}
+    os.makedirs(os.path.join(directory, SNAPSHOTS_DIR), exist_ok=True)
+    path = os.path.join(directory, SNAPSHOTS_DIR, snapshot['id'] + '.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+    return dict(totals, id=snapshot['id'])
+
+# ------ Restore ------
+def _assembler(directory, entry):
+    def write(temp_path):
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            for digest, _ in entry['chunks']:
+                f.write(_read_chunk(directory, digest))
+    return write
+
+def _tombstone_writer(data_temp_path, rows):
+    # Tombstones name the exact data file they belong to, that is the restored file
+    def write(temp_path):
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(tombstone_record(data_temp_path, rows), f)
+    return write
+
+@metrics.instrument
+def restore(snapshot=None, tables=None, directory=BACKUP_DIR, store=None):
+    # Restores every table of the snapshot, or only the named ones, in one transaction
+    store = store or get_store(FILES)
+    saved = load_snapshot(snapshot, directory)
+    if saved['storage'] != store.backend.name:
+        raise ValueError(f"The snapshot was taken with {saved['storage']} storage, not {store.backend.name}")
+    names = list(tables) if tables else list(saved['tables'])
+    for name in names:
+        if name not in saved['tables']:
+            raise ValueError(f"The table {name} is not in the snapshot {saved['id']}")
+    data_dir = os.path.dirname(os.path.abspath(store.table(next(iter(store.tables))).path))
+    current = {name: store.table(name) for name in names}
+    with store.transaction() as transaction:
+        for name in names:
+            entry = saved['tables'][name]
+            restored = {os.path.join(data_dir, relative) for relative in entry['files']}
+            tombstones = {os.path.join(data_dir, relative) + TOMBSTONE_SUFFIX for relative in entry['deleted']}
+            for relative, file_entry in entry['files'].items():
+                path = os.path.join(data_dir, relative)
+                transaction.stage_file(path, _assembler(directory, file_entry))
+                if relative in entry['deleted']:
+                    data_temp_path = transaction.log.temp_path(path, transaction.id)
+                    transaction.stage_file(path + TOMBSTONE_SUFFIX, _tombstone_writer(data_temp_path, entry['deleted'][relative]))
+            # Files of the layout in place now that the snapshot does not have, and sidecars of older versions
+            for path, _ in _table_files(current[name]):
+                stale = [path + suffix for suffix in _SIDECARS]
+                if path not in restored:
+                    stale.append(path)
+                if path + TOMBSTONE_SUFFIX not in tombstones:
+                    stale.append(path + TOMBSTONE_SUFFIX)
+                for stale_path in stale:
+                    if os.path.exists(stale_path):
+                        transaction.stage_remove(stale_path)
+            # Consumers of the change log read the restored table again
+            store.log_changes(name, 'reset')
+    for name in names:
+        # The layout may have changed between flat and partitioned
+        table = current[name]
+        if isinstance(table, PartitionedTable) and os.path.isdir(table.directory) and not os.listdir(table.directory):
+            os.rmdir(table.directory)
+        store.tables[name] = store._table(name, table.path)
+    return {'id': saved['id'], 'tables': names}
+
+# ------ Main Implementation ------
+def _megabytes(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental backups of the tables: only chunks that changed are stored")
+    parser.add_argument('command', choices=['backup', 'restore', 'list'])
+    parser.add_argument('snapshot', nargs='?', help="snapshot to restore (default: the latest)")
+    parser.add_argument('--table', action='append', choices=list(FILES), help="restore only this table (repeatable)")
+    parser.add_argument('--compress', action='store_true', help="store new chunks zlib-compressed")
+    parser.add_argument('--directory', default=BACKUP_DIR, help=f"backup directory (default: {BACKUP_DIR})")
+    parser.add_argument('--storage', default=None, help="csv, parquet, feather or npz (default: UNIVERSITY_STORAGE)")
+    args = parser.parse_args(argv)
+    if args.command == 'list':
+        for snapshot in snapshots(args.directory):
+            saved = load_snapshot(snapshot, args.directory)
+            size = sum(entry['size'] for table in saved['tables'].values() for entry in table['files'].values())
+            print(f"{snapshot}  {saved['created']}  {len(saved['tables'])} tables  {_megabytes(size)}")
+        return
+    store = get_store(FILES, args.storage)
+    try:
+        if args.command == 'backup':
+            result = backup(args.directory, args.compress, store)
+            print(f"Backup {result['id']} Successfully :) read {result['files_read']} files ({_megabytes(result['bytes_read'])}), "
+                  f"stored {result['new_chunks']} new chunks ({_megabytes(result['bytes_written'])})")
+        else:
+            result = restore(args.snapshot, args.table, args.directory, store)
+            print(f"Restored {', '.join(result['tables'])} from {result['id']} Successfully :)")
+    except ValueError as e:
+        print(f"Error : {e}")
+
+if __name__ == "__main__":
+    main()
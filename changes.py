@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import math
+import time
+import argparse
+import pandas as pd
+
+CHANGES_NAME = 'university.changes'
+CHECKPOINTS_DIR = 'university.checkpoints'
+# The last sequence number is found by reading this much of the log's tail at a time
+TAIL_BLOCK = 64 * 1024
+
+# ------ Change Events ------
+def _value(value):
+    value = value.item() if hasattr(value, 'item') else value
+    if value is pd.NA or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+def _records(df):
+    columns = list(df.columns)
+    return [dict(zip(columns, map(_value, row))) for row in df.itertuples(index=False, name=None)]
+
+def row_events(table, op, keys, before=None, after=None):
+    # One event per row, before and after hold the same rows in the same order;
+    # key is the row's primary key before the change (after it, for an insert)
+    old = _records(before) if before is not None else None
+    new = _records(after) if after is not None else None
+    events = []
+    for position in range(len(old if old is not None else new)):
+        row_before = old[position] if old is not None else None
+        row_after = new[position] if new is not None else None
+        row = row_before if row_before is not None else row_after
+        events.append({'table': table, 'op': op, 'key': {column: row.get(column) for column in keys},
+                       'before': row_before, 'after': row_after})
+    return events
+
+def reset_event(table):
+    # The whole table was replaced (a save or a restore), consumers read it again
+    return {'table': table, 'op': 'reset', 'key': None, 'before': None, 'after': None}
+
+# ------ Change Log ------
+class ChangeLog:
+    # Append-only JSON lines, one event per line with increasing sequence numbers.
+    # Events are appended by the transaction that made the change, in its commit record
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, CHANGES_NAME)
+        # (log size, last sequence number) as of the last read or append
+        self._tail = None
+
+    def last_sequence(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self._tail is not None and self._tail[0] == size:
+            return self._tail[1]
+        last = 0
+        if size:
+            with open(self.path, 'rb') as f:
+                block = TAIL_BLOCK
+                while True:
+                    start = max(0, size - block)
+                    f.seek(start)
+                    data = f.read(size - start)
+                    # The log always ends with a newline, the last line starts after the one before it
+                    cut = data.rfind(b'\n', 0, len(data) - 1)
+                    if cut >= 0 or start == 0:
+                        last = json.loads(data[cut + 1:])['seq']
+                        break
+                    block *= 2
+        self._tail = (size, last)
+        return last
+
+    def append_op(self, txn_id, events):
+        # Called under the writer lock: the events get the next sequence numbers, the commit record appends them
+        last = self.last_sequence()
+        size = self._tail[0]
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+        lines = [json.dumps({'seq': seq, 'txn': txn_id, 'time': stamp, **event}, ensure_ascii=False)
+                 for seq, event in enumerate(events, start=last + 1)]
+        data = '\n'.join(lines) + '\n'
+        if not os.path.exists(self.path):
+            open(self.path, 'a').close()
+        self._tail = (size + len(data.encode('utf-8')), last + len(events))
+        return {'kind': 'append', 'path': self.path, 'offset': size, 'data': data}
+
+    def _line_at(self, f, position):
+        # Sequence number and start of the first complete line starting at or after position
+        if position > 0:
+            f.seek(position - 1)
+            f.readline()
+        else:
+            f.seek(0)
+        start = f.tell()
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            return None, start
+        return json.loads(line)['seq'], start
+
+    def _offset(self, f, size, after):
+        # Sequence numbers grow along the file, so the first event after a checkpoint is found by bisection
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            seq, _ = self._line_at(f, middle)
+            if seq is None or seq > after:
+                high = middle
+            else:
+                low = middle + 1
+        return self._line_at(f, low)[1]
+
+    def read(self, after=0, limit=None, tables=None):
+        # Events with a sequence number above after, oldest first
+        if not os.path.exists(self.path):
+            return
+        count = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset(f, os.fstat(f.fileno()).st_size, after))
+            for line in f:
+                if limit is not None and count >= limit:
+                    return
+                if not line.endswith(b'\n'):
+                    # Still being appended
+                    return
+                event = json.loads(line)
+                if tables and event['table'] not in tables:
+                    continue
+                count += 1
+                yield event
+
+# ------ Consumers ------
+class ChangeConsumer:
+    # Reads the log from its checkpoint; commit() moves the checkpoint past what was handled,
+    # so a consumer that stops before committing sees the same events again
+    def __init__(self, name, directory='.', tables=None):
+        if not re.fullmatch(r'[\w.-]+', name):
+            raise ValueError(f"The consumer name {name} may only hold letters, digits, '.', '-' and '_'")
+        self.name = name
+        self.log = ChangeLog(directory)
+        self.tables = set(tables) if tables else None
+        self.path = os.path.join(directory, CHECKPOINTS_DIR, name + '.json')
+        self.position = self._load()
+        # Last sequence number read by poll(), skipped events of other tables included
+        self.seen = self.position
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)['seq']
+
+    def poll(self, limit=None):
+        events = []
+        for event in self.log.read(self.seen):
+            if limit is not None and len(events) >= limit:
+                break
+            self.seen = event['seq']
+            if self.tables is None or event['table'] in self.tables:
+                events.append(event)
+        return events
+
+    def commit(self, seq=None):
+        seq = self.seen if seq is None else seq
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'consumer': self.name, 'seq': seq, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.position = self.seen = seq
+
+    def rewind(self):
+        # Forget what was read since the last commit
+        self.seen = self.position
+
+# ------ Main Implementation ------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the change events of the tables as JSON lines")
+    parser.add_argument('--after', type=int, default=0, help="only events after this sequence number")
+    parser.add_argument('--consumer', help="read from this consumer's checkpoint instead of --after")
+    parser.add_argument('--commit', action='store_true', help="move the consumer's checkpoint past the printed events")
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--table', action='append', help="only events of this table (repeatable)")
+    parser.add_argument('--directory', default='.', help="directory of the data files")
+    args = parser.parse_args(argv)
+    try:
+        if args.consumer:
+            consumer = ChangeConsumer(args.consumer, args.directory, args.table)
+            events = consumer.poll(args.limit)
+        else:
+            events = list(ChangeLog(args.directory).read(args.after, args.limit, args.table))
+    except ValueError as e:
+        print(f"Error : {e}")
+        return
+    for event in events:
+        print(json.dumps(event, ensure_ascii=False))
+    if not events:
+        print("No Changes Found :(")
+    if args.consumer and args.commit:
+        consumer.commit()
+        print(f"Checkpoint of {args.consumer} is at {consumer.position} :)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1855 @@
+import os
+import json
+import math
+import atexit
+import pickle
+import hashlib
+import argparse
+from contextlib import contextmanager, nullcontext
+import numpy as np
+import pandas as pd
+import metrics
+from transactions import Transaction, WriteAheadLog, FileLock, PARTITIONS_SUFFIX
+from storage_backends import get_backend
+from schemas import get_schema, INTEGER
+from names import NameIndex
+from changes import ChangeLog, row_events, reset_event
+
+# Define file names and column headers
+FILES = {
+    'departments': 'Department.csv',
+    'students': 'Student.csv',
+    'courses': 'Course.csv',
+    'instructors': 'Instructor.csv',
+    'enrollments': 'Enrollment.csv'
+}
+
+# File format of the tables: csv, parquet, feather or npz
+STORAGE_FORMAT = os.environ.get('UNIVERSITY_STORAGE', 'csv')
+
+# Every insert, update and delete is written to the change log (university.changes), UNIVERSITY_CHANGES=0 turns it off
+CHANGE_LOG = os.environ.get('UNIVERSITY_CHANGES', '1') != '0'
+
+# Columns identifying a row in the change events
+PRIMARY_KEYS = {
+    'departments': ['DepartmentID'],
+    'students': ['StudentID'],
+    'courses': ['CourseID'],
+    'instructors': ['InstructorID'],
+    'enrollments': ['StudentID', 'CourseID', 'Semester', 'Year'],
+}
+
+# Hash indexes kept per table (primary keys and foreign keys)
+INDEXES = {
+    'students': ['StudentID'],
+    'courses': ['CourseID', 'Department'],
+    'instructors': ['InstructorID', 'Email'],
+    'enrollments': ['StudentID', 'CourseID'],
+}
+
+# Sorted indexes kept per table, for range and top-N queries
+SORTED_INDEXES = {
+    'students': ['DateOfBirth'],
+    'enrollments': ['Year', 'Grade'],
+}
+
+# Name columns searched together through an Arabic-normalized name index
+NAME_INDEXES = {
+    'students': ['FirstName', 'LastName'],
+    'instructors': ['FirstName', 'LastName'],
+}
+
+# Grouped count/sum/sum of squares/min/max kept per table: name -> (group columns, value column)
+AGGREGATES = {
+    'enrollments': {'grades': (['CourseID', 'Semester', 'Year'], 'Grade')},
+}
+
+# Columns answered from in-memory key sets when checking for an existing key (unique keys and foreign-key targets)
+KEY_SETS = {
+    'students': ['StudentID'],
+    'courses': ['CourseID'],
+    'instructors': ['InstructorID', 'Email'],
+}
+
+# Tables stored as one file per combination of these columns, once partitioned (see --partition)
+PARTITIONS = {
+    'enrollments': ['Year', 'Semester'],
+}
+
+# Tables of this many rows also keep a Bloom filter sidecar, so a new key is ruled out without reading the column
+BLOOM_MIN_ROWS = 100_000
+BLOOM_ERROR_RATE = 0.01
+
+INDEX_SUFFIX = '.idx'
+AGGREGATE_SUFFIX = '.agg'
+BLOOM_SUFFIX = '.bloom'
+TOMBSTONE_SUFFIX = '.del'
+NAME_INDEX_SUFFIX = '.names'
+MANIFEST_NAME = 'manifest.json'
+# Row labels of a partitioned table: partition number * PARTITION_LABELS + row position in its file
+PARTITION_LABELS = 1 << 40
+
+# Deletes only record tombstones until this share of a file's rows is deleted, then the file is rewritten once
+COMPACT_RATIO = 0.25
+# Files with fewer rows are rewritten on every delete, so programs reading them directly never see deleted rows
+TOMBSTONE_MIN_ROWS = 100_000
+HASH_BLOCK = 4 * 1024 * 1024
+
+# ------ File Signature ------
+def _signature(path):
+    # The inode changes on rename, mtime/size change on in-place writes
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def _content_hash(path, length=None):
+    # SHA-256 of the whole file, or of its first length bytes
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(path) if length is None else length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    metrics.file_read(path)
+    return digest.hexdigest()
+
+def _tombstone_key(signature):
+    # Size and mtime name one version of a data file, copies that keep the mtime (copy2, restores) match too
+    return [signature[1], signature[2]]
+
+def tombstone_record(data_path, rows, signature=None, saved=None):
+    # The content hash covers the file as it was when its first tombstone was written. Appends only add
+    # bytes after it and deletes leave the file alone, so saved (the record in place) hands it on
+    # until the file is rewritten, which drops the tombstones
+    signature = signature or _signature(data_path)
+    if saved and saved.get('sha256'):
+        hashed, digest = saved.get('hashed', saved['size']), saved['sha256']
+    else:
+        hashed, digest = os.path.getsize(data_path), _content_hash(data_path)
+    return {'key': _tombstone_key(signature), 'size': signature[2], 'hashed': hashed, 'sha256': digest, 'rows': sorted(rows)}
+
+def _plain(value):
+    # numpy scalars -> python values, so keys hash and pickle the same way
+    return value.item() if hasattr(value, 'item') else value
+
+# ------ Hash Index ------
+class HashIndex:
+    def __init__(self, column, entries=None):
+        self.column = column
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def build(cls, column, frame):
+        labels = frame.index
+        groups = frame.groupby(column, sort=False).indices
+        return cls(column, {_plain(key): labels[positions].tolist() for key, positions in groups.items()})
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def lookup(self, key):
+        return self.entries.get(key, [])
+
+    def add(self, key, label):
+        if pd.isna(key):
+            return
+        self.entries.setdefault(_plain(key), []).append(label)
+
+    def remove(self, key, label):
+        labels = self.entries.get(_plain(key)) if not pd.isna(key) else None
+        if labels is None:
+            return
+        labels.remove(label)
+        if not labels:
+            del self.entries[_plain(key)]
+
+    def add_rows(self, frame):
+        if self.column not in frame:
+            return
+        for key, label in zip(frame[self.column].tolist(), frame.index.tolist()):
+            self.add(key, label)
+
+    def remove_rows(self, frame):
+        if self.column not in frame:
+            return
+        for key, label in zip(frame[self.column].tolist(), frame.index.tolist()):
+            self.remove(key, label)
+
+# ------ Sorted Index ------
+def _within(value, low=None, high=None, inclusive='both'):
+    if low is not None and (value < low or (value == low and inclusive not in ('both', 'left'))):
+        return False
+    if high is not None and (value > high or (value == high and inclusive not in ('both', 'right'))):
+        return False
+    return True
+
+class SortedIndex:
+    # Values of one column in order next to their row labels, a range is two binary searches
+    def __init__(self, column, values, labels, numeric):
+        self.column = column
+        self.values = values
+        self.labels = labels
+        self.numeric = numeric
+
+    @classmethod
+    def build(cls, column, series, numeric):
+        values, labels = cls._arrays(series, numeric)
+        order = np.lexsort((labels, values))
+        return cls(column, values[order], labels[order], numeric)
+
+    @staticmethod
+    def _arrays(series, numeric):
+        # Missing values are left out, like in the hash indexes
+        if numeric:
+            series = pd.to_numeric(series, errors='coerce').dropna()
+            return series.to_numpy(dtype=np.float64), series.index.to_numpy(dtype=np.int64)
+        series = series.dropna()
+        return series.astype(str).to_numpy(dtype=object), series.index.to_numpy(dtype=np.int64)
+
+    def probe(self, value):
+        if value is None or pd.isna(value):
+            return None
+        return float(value) if self.numeric else str(value)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def range(self, low=None, high=None, inclusive='both'):
+        # Labels of the rows between low and high, in value order
+        if inclusive not in ('both', 'left', 'right', 'neither'):
+            raise ValueError(f"Unknown inclusive {inclusive}")
+        low, high = self.probe(low), self.probe(high)
+        start = 0 if low is None else np.searchsorted(self.values, low, 'left' if inclusive in ('both', 'left') else 'right')
+        stop = len(self.values) if high is None else np.searchsorted(self.values, high, 'right' if inclusive in ('both', 'right') else 'left')
+        return self.labels[start:max(start, stop)]
+
+    def top(self, n, largest=True):
+        n = max(int(n), 0)
+        return self.labels[::-1][:n] if largest else self.labels[:n]
+
+    def add_rows(self, frame):
+        if self.column not in frame or frame.empty:
+            return
+        values, labels = self._arrays(frame[self.column], self.numeric)
+        order = np.lexsort((labels, values))
+        positions = np.searchsorted(self.values, values[order], 'right')
+        self.values = np.insert(self.values, positions, values[order])
+        self.labels = np.insert(self.labels, positions, labels[order])
+
+    def remove_rows(self, frame):
+        if self.column not in frame or frame.empty:
+            return
+        keep = ~np.isin(self.labels, frame.index.to_numpy(dtype=np.int64))
+        self.values, self.labels = self.values[keep], self.labels[keep]
+
+# ------ Key Sets ------
+class KeySet:
+    # Distinct values of one column; the few values held by several rows keep their row count
+    def __init__(self, column, keys=None, repeated=None):
+        self.column = column
+        self.keys = keys if keys is not None else set()
+        self.repeated = repeated if repeated is not None else {}
+
+    @classmethod
+    def build(cls, column, values):
+        values = values.dropna()
+        keys = set(values.tolist())
+        repeated = {}
+        if len(keys) < len(values):
+            counts = values[values.duplicated(keep=False)].value_counts(sort=False)
+            repeated = {key: count for key, count in zip(counts.index.tolist(), counts.tolist()) if count > 1}
+        return cls(column, keys, repeated)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add_rows(self, frame):
+        if self.column not in frame:
+            return
+        for key in frame[self.column].dropna().tolist():
+            if key in self.keys:
+                self.repeated[key] = self.repeated.get(key, 1) + 1
+            else:
+                self.keys.add(key)
+
+    def remove_rows(self, frame):
+        if self.column not in frame:
+            return
+        for key in frame[self.column].dropna().tolist():
+            count = self.repeated.pop(key, 1) - 1
+            if count > 1:
+                self.repeated[key] = count
+            elif not count:
+                self.keys.discard(key)
+
+class BloomFilter:
+    # A miss means the key is certainly absent, a hit still has to be confirmed
+    def __init__(self, size, hashes, capacity, count=0, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.capacity = capacity
+        self.count = count
+        self.bits = bits if bits is not None else np.zeros((size + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def build(cls, keys, error_rate=BLOOM_ERROR_RATE):
+        # Sized for twice the current keys, so inserts do not wear the error rate down
+        keys = list(keys)
+        capacity = max(2 * len(keys), 1024)
+        size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        bloom = cls(size, max(1, round(size / capacity * math.log(2))), capacity)
+        bloom.add(keys)
+        return bloom
+
+    def _positions(self, keys):
+        # Double hashing: position i of a key is h1 + i * h2
+        values = np.asarray(keys, dtype=object)
+        first = pd.util.hash_array(values, hash_key='university-keys1', categorize=False)
+        second = pd.util.hash_array(values, hash_key='university-keys2', categorize=False) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (first[:, None] + steps * second[:, None]) % np.uint64(self.size)
+
+    def add(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, positions // 8, (np.uint64(1) << (positions % 8)).astype(np.uint8))
+        self.count += len(keys)
+
+    def __contains__(self, key):
+        positions = self._positions([key])[0]
+        return bool(np.all(self.bits[positions // 8] & (np.uint64(1) << (positions % 8)).astype(np.uint8)))
+
+    def full(self):
+        return self.count > self.capacity
+
+# ------ Grouped Statistics ------
+class GroupStats:
+    # groups: leading key parts -> last key part -> [count, sum, sum of squares, min, max]
+    def __init__(self, keys, column, groups=None, stale=None):
+        self.keys = list(keys)
+        self.column = column
+        self.groups = groups if groups is not None else {}
+        self.stale = stale if stale is not None else set()
+
+    @classmethod
+    def build(cls, keys, column, frame):
+        stats = cls(keys, column)
+        values = frame[keys + [column]].dropna()
+        grouped = values.groupby(keys, sort=False, observed=True)[column]
+        table = grouped.agg(['count', 'sum', 'min', 'max'])
+        table['sumsq'] = (values[column].astype(float) ** 2).groupby([values[key] for key in keys], sort=False, observed=True).sum()
+        for key, row in zip(table.index.tolist(), table.itertuples(index=False)):
+            key = tuple(_plain(part) for part in (key if isinstance(key, tuple) else (key,)))
+            stats._slot(key)[:] = [int(row.count), _plain(row.sum), float(row.sumsq), _plain(row.min), _plain(row.max)]
+        return stats
+
+    def _slot(self, key):
+        return self.groups.setdefault(key[:-1], {}).setdefault(key[-1], [0, 0, 0.0, None, None])
+
+    def _rows(self, frame):
+        if any(column not in frame for column in self.keys + [self.column]):
+            return []
+        values = frame[self.keys + [self.column]].dropna()
+        return [(tuple(_plain(part) for part in row[:-1]), _plain(row[-1])) for row in values.itertuples(index=False)]
+
+    def add_rows(self, frame):
+        for key, value in self._rows(frame):
+            slot = self._slot(key)
+            slot[0] += 1
+            slot[1] += value
+            slot[2] += float(value) ** 2
+            slot[3] = value if slot[3] is None else min(slot[3], value)
+            slot[4] = value if slot[4] is None else max(slot[4], value)
+
+    def remove_rows(self, frame):
+        for key, value in self._rows(frame):
+            slot = self.groups.get(key[:-1], {}).get(key[-1])
+            if slot is None:
+                continue
+            slot[0] -= 1
+            slot[1] -= value
+            slot[2] -= float(value) ** 2
+            if slot[0] == 0:
+                del self.groups[key[:-1]][key[-1]]
+                if not self.groups[key[:-1]]:
+                    del self.groups[key[:-1]]
+                self.stale.discard(key)
+            elif value in (slot[3], slot[4]):
+                # The old extreme is gone, the next read recomputes it for this group
+                self.stale.add(key)
+
+    def refresh(self, table):
+        for key in list(self.stale):
+            rows = table.lookup(self.keys[0], key[0], columns=self.keys + [self.column])
+            for column, part in zip(self.keys[1:], key[1:]):
+                rows = rows[rows[column] == part]
+            values = rows[self.column].dropna()
+            slot = self.groups.get(key[:-1], {}).get(key[-1])
+            if slot is not None and len(values):
+                slot[3], slot[4] = _plain(values.min()), _plain(values.max())
+            self.stale.discard(key)
+
+    def slots(self, *key):
+        # A full key gives one group, leaving out the last part combines its groups
+        if len(key) == len(self.keys):
+            slot = self.groups.get(key[:-1], {}).get(key[-1])
+            return [slot] if slot is not None else []
+        return list(self.groups.get(key, {}).values())
+
+    def merge(self, other):
+        for key, groups in other.groups.items():
+            for last, slot in groups.items():
+                mine = self._slot(key + (last,))
+                mine[0] += slot[0]
+                mine[1] += slot[1]
+                mine[2] += slot[2]
+                mine[3] = slot[3] if mine[3] is None else min(mine[3], slot[3])
+                mine[4] = slot[4] if mine[4] is None else max(mine[4], slot[4])
+
+    def stats(self, *key):
+        return self.summary(self.slots(*key))
+
+    @staticmethod
+    def summary(slots):
+        count = sum(slot[0] for slot in slots)
+        if not count:
+            return None
+        total = sum(slot[1] for slot in slots)
+        squares = sum(slot[2] for slot in slots)
+        mean = total / count
+        return {
+            'count': count,
+            'mean': mean,
+            'variance': (squares - total * mean) / (count - 1) if count > 1 else None,
+            'min': min(slot[3] for slot in slots),
+            'max': max(slot[4] for slot in slots),
+        }
+
+# ------ Cached Table ------
+class Table:
+    def __init__(self, name, path, store, backend, schema, index_columns=(), aggregates=None, key_columns=(), sorted_columns=(),
+                 name_columns=()):
+        self.name = name
+        self.path = path
+        self.store = store
+        self.backend = backend
+        self.schema = schema
+        self.index_columns = list(index_columns)
+        self.aggregate_specs = dict(aggregates or {})
+        self.key_columns = list(key_columns)
+        self.sorted_columns = list(sorted_columns)
+        self.name_columns = list(name_columns)
+        self.index_path = path + INDEX_SUFFIX
+        self.aggregate_path = path + AGGREGATE_SUFFIX
+        self.bloom_path = path + BLOOM_SUFFIX
+        self.tombstone_path = path + TOMBSTONE_SUFFIX
+        self.names_path = path + NAME_INDEX_SUFFIX
+        # (signature, length, content hash) of the last data file hashed
+        self._hashed = None
+        self.invalidate()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def select(self, where):
+        # Only partitioned tables narrow down, see PartitionedTable.select
+        return self
+
+    def _state(self):
+        # The data file and its tombstones together make one version of the table
+        return (_signature(self.path), _signature(self.tombstone_path))
+
+    def is_stale(self):
+        return self._frame is None or self._state() != self._signature
+
+    def frame(self, columns=None):
+        if columns is not None and self.is_stale():
+            return self._projection(columns)
+        if self.is_stale():
+            self.load()
+        if self._pending:
+            # Rows appended since the last read are merged in one concat
+            self._frame = self.schema.concat([self._frame, *self._pending])
+            self._pending = []
+        return self._frame if columns is None else self._frame[list(columns)]
+
+    def _projection(self, columns):
+        # Only the requested columns are read while the full table is not cached
+        state = self._state()
+        if state[0] is None:
+            raise FileNotFoundError(f"{self.path} does not exist!")
+        key = tuple(columns)
+        cached = self._projections.get(key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        state, projection, deleted = self._snapshot(lambda size: self.backend.read(self.path, list(columns), self.schema, size)[list(columns)])
+        if deleted:
+            projection = projection.drop(index=sorted(deleted))
+        self._projections[key] = (state, projection)
+        return projection
+
+    def _snapshot(self, read):
+        # Writers publish by rename or append in place, so a read is a clean snapshot once the signatures
+        # hold still; only the bytes the data file held at the start are read
+        while True:
+            state = self._state()
+            if state[0] is None:
+                self.invalidate()
+                raise FileNotFoundError(f"{self.path} does not exist!")
+            if self.backend.appendable and not self.store.locked() and not self.backend.ends_line(self.path, state[0][2]):
+                # A writer is halfway through an append (or the file has no final newline), wait for it
+                with self.store.read_lock():
+                    return self._snapshot(read)
+            with metrics.phase('read'):
+                frame = read(state[0][2])
+                deleted = self._read_tombstones(state[0])
+            metrics.file_read(self.path)
+            if self._state() != state:
+                continue
+            if deleted is not None:
+                return state, frame, deleted
+            if self.store.locked():
+                # No writer can be halfway, the tombstones were written for some other file
+                raise ValueError(f"{self.tombstone_path} does not belong to {self.path}, "
+                                 f"copy and restore the two files together (removing it brings the deleted rows back)")
+            # The data file and its tombstones are published one after the other, wait for that writer
+            with self.store.read_lock():
+                return self._snapshot(read)
+
+    def load(self):
+        # Row labels are positions in the file, deleted rows leave gaps
+        self._signature, frame, self._deleted = self._snapshot(lambda size: self.backend.read(self.path, schema=self.schema, size=size))
+        self._next_label = len(frame)
+        self._frame = frame.drop(index=sorted(self._deleted)) if self._deleted else frame
+        self._projections = {}
+        self._pending = []
+        self._indexes = None
+        self._indexes_dirty = False
+
+    def invalidate(self):
+        self._frame = None
+        self._signature = None
+        self._deleted = set()
+        self._pending = []
+        self._next_label = 0
+        self._indexes = None
+        self._indexes_dirty = False
+        self._projections = {}
+        self._aggregates = None
+        self._aggregates_signature = None
+        self._aggregates_dirty = False
+        self._names = None
+        self._names_signature = None
+        self._names_dirty = False
+        self._key_sets = {}
+        self._sorted = {}
+        self._blooms = None
+        self._key_sets_signature = None
+        self._blooms_dirty = False
+
+    def columns(self):
+        if self._frame is not None:
+            return list(self._frame.columns)
+        return self.backend.columns(self.path) if self.exists() else []
+
+    # ------ Indexes ------
+    def indexes(self):
+        frame = self.frame()
+        if self._indexes is None:
+            self._indexes = self._load_indexes()
+            if self._indexes is None:
+                self._indexes = {column: HashIndex.build(column, frame) for column in self.index_columns}
+                self._indexes_dirty = True
+        return self._indexes
+
+    def index(self, column):
+        return self.indexes()[column]
+
+    def labels(self, column, key):
+        return list(self.index(column).lookup(self.schema.key(column, key)))
+
+    def lookup(self, column, key, columns=None):
+        key = self.schema.key(column, key)
+        if columns is not None and self.is_stale():
+            frame = self.frame([column] + [name for name in columns if name != column])
+            with metrics.phase('filter'):
+                rows = frame.loc[frame[column] == key, list(columns)]
+            metrics.rows_scanned(len(frame))
+            return rows
+        frame = self.frame()
+        with metrics.phase('filter'):
+            rows = frame.loc[sorted(self.labels(column, key))]
+        metrics.rows_scanned(len(rows))
+        return rows if columns is None else rows[list(columns)]
+
+    def contains(self, column, key):
+        key = self.schema.key(column, key)
+        if pd.isna(key):
+            return False
+        if column in self.key_columns:
+            bloom = self.bloom_filter(column)
+            if bloom is not None and key not in bloom:
+                return False
+            return key in self.key_set(column)
+        if column in self.index_columns:
+            return key in self.index(column)
+        return key in self.frame()[column].values
+
+    def _load_indexes(self):
+        # Sidecar indexes are only trusted for the exact file they were built from
+        try:
+            with open(self.index_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        metrics.file_read(self.index_path)
+        if saved.get('signature') != self._signature or saved.get('dtypes') != self._index_dtypes():
+            return None
+        return {column: HashIndex(column, entries) for column, entries in saved['entries'].items()}
+
+    def _index_dtypes(self):
+        return {column: str(self._frame[column].dtype) for column in self.index_columns if column in self._frame}
+
+    def _parses_back(self, index):
+        # Mixed-type object columns (e.g. an int column that got a text ID) re-parse as text
+        if self._frame[index.column].dtype != object:
+            return True
+        return all(isinstance(key, str) for key in index.keys())
+
+    def flush_indexes(self):
+        if not self._indexes_dirty or self._indexes is None or self.is_stale():
+            return
+        self.frame()
+        if not all(self._parses_back(index) for index in self._indexes.values()):
+            return
+        # Labels are row positions in the file, so they are stored as they are
+        entries = {column: index.entries for column, index in self._indexes.items()}
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'signature': self._signature, 'dtypes': self._index_dtypes(), 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        metrics.file_written(temp_path, self.index_path)
+        os.replace(temp_path, self.index_path)
+        self._indexes_dirty = False
+
+    # ------ Aggregates ------
+    def aggregates(self):
+        signature = self._state()
+        if self._aggregates is None or self._aggregates_signature != signature:
+            self._aggregates = self._load_aggregates(signature)
+            if self._aggregates is None:
+                frame = self.frame()
+                self._aggregates = {name: GroupStats.build(keys, column, frame)
+                                    for name, (keys, column) in self.aggregate_specs.items()}
+                self._aggregates_dirty = True
+            self._aggregates_signature = signature
+        return self._aggregates
+
+    def aggregate(self, name):
+        stats = self.aggregates()[name]
+        if stats.stale:
+            stats.refresh(self)
+            self._aggregates_dirty = True
+        return stats
+
+    def stats(self, name, *key):
+        stats = self.aggregate(name)
+        return stats.stats(*(self.schema.key(column, part) for column, part in zip(stats.keys, key)))
+
+    def _tracked_aggregates(self):
+        # Deltas only apply to aggregates that match the file being changed
+        if not self.aggregate_specs:
+            return None
+        signature = self._state()
+        if self._aggregates is None or self._aggregates_signature != signature:
+            self._aggregates = self._load_aggregates(signature)
+            self._aggregates_signature = signature
+        if self._aggregates is not None:
+            self._aggregates_dirty = True
+        return self._aggregates
+
+    def _load_aggregates(self, signature):
+        try:
+            with open(self.aggregate_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        metrics.file_read(self.aggregate_path)
+        if saved.get('signature') != signature or saved.get('specs') != self.aggregate_specs:
+            return None
+        return {name: GroupStats(*self.aggregate_specs[name], groups, stale)
+                for name, (groups, stale) in saved['aggregates'].items()}
+
+    def flush_aggregates(self):
+        if not self._aggregates_dirty or self._aggregates is None:
+            return
+        if self._aggregates_signature != self._state():
+            return
+        aggregates = {name: (stats.groups, stats.stale) for name, stats in self._aggregates.items()}
+        temp_path = f"{self.aggregate_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'signature': self._aggregates_signature, 'specs': self.aggregate_specs, 'aggregates': aggregates},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        metrics.file_written(temp_path, self.aggregate_path)
+        os.replace(temp_path, self.aggregate_path)
+        self._aggregates_dirty = False
+
+    # ------ Name Index ------
+    def name_index(self):
+        # Loaded from the sidecar, built once from the name columns when there is none for this file
+        signature = self._state()
+        if self._names is None or self._names_signature != signature:
+            self._names = self._load_names(signature)
+            if self._names is None:
+                if self.is_stale():
+                    frame = self._projection(self.name_columns)
+                    next_label = len(frame) + len(self.tombstones())
+                else:
+                    frame, next_label = self.frame(), self._next_label
+                self._names = NameIndex.build(self.name_columns, frame, next_label)
+                self._names_dirty = True
+            self._names_signature = signature
+        return self._names
+
+    def search(self, text, limit=10, columns=None):
+        # Rows ranked by how well their names match, best first, with the match score
+        matches = self.name_index().search(text, limit)
+        rows = self._rows_at([label for label, _ in matches], columns)
+        return rows.assign(Score=[round(score, 3) for _, score in matches])
+
+    def _tracked_names(self):
+        # Like the aggregates, deltas only apply to a name index of the file being changed
+        if not self.name_columns:
+            return None
+        signature = self._state()
+        if self._names is None or self._names_signature != signature:
+            self._names = self._load_names(signature)
+            self._names_signature = signature
+        if self._names is not None:
+            self._names_dirty = True
+        return self._names
+
+    def _load_names(self, signature):
+        try:
+            with open(self.names_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        metrics.file_read(self.names_path)
+        if saved.get('signature') != signature or saved.get('columns') != self.name_columns:
+            return None
+        return NameIndex(self.name_columns, saved['postings'], saved['next_label'])
+
+    def flush_names(self):
+        if not self._names_dirty or self._names is None:
+            return
+        if self._names_signature != self._state():
+            return
+        temp_path = f"{self.names_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'signature': self._names_signature, 'columns': self.name_columns,
+                         'postings': self._names.postings, 'next_label': self._names.next_label},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        metrics.file_written(temp_path, self.names_path)
+        os.replace(temp_path, self.names_path)
+        self._names_dirty = False
+
+    # ------ Key Sets ------
+    def _key_state(self):
+        # Key sets and Bloom filters belong to one version of the file, like the aggregates
+        state = self._state()
+        if self._key_sets_signature != state:
+            self._key_sets = {}
+            self._sorted = {}
+            self._blooms = None
+            self._key_sets_signature = state
+        return state
+
+    def key_set(self, column):
+        # Built from the cached frame, or from that one column when the table is not loaded
+        self._key_state()
+        if column not in self._key_sets:
+            values = self.frame()[column] if not self.is_stale() else self._projection([column])[column]
+            self._key_sets[column] = KeySet.build(column, values)
+            if column in self.key_columns and len(values) >= BLOOM_MIN_ROWS and column not in self._bloom_filters():
+                self._blooms[column] = BloomFilter.build(self._key_sets[column].keys)
+                self._blooms_dirty = True
+        return self._key_sets[column]
+
+    def bloom_filter(self, column):
+        self._key_state()
+        return self._bloom_filters().get(column)
+
+    def _bloom_filters(self):
+        if self._blooms is None:
+            self._blooms = self._load_blooms(self._key_sets_signature) or {}
+        return self._blooms
+
+    def _track_keys(self, removed=None, added=None):
+        # This process's own changes are applied to the key sets and sorted indexes instead of reading the column again
+        self._key_state()
+        for keys in [*self._key_sets.values(), *self._sorted.values()]:
+            if removed is not None:
+                keys.remove_rows(removed)
+            if added is not None:
+                keys.add_rows(added)
+        if added is not None and self._blooms:
+            for column, bloom in list(self._blooms.items()):
+                if column in added:
+                    bloom.add(added[column].dropna().tolist())
+                if bloom.full():
+                    del self._blooms[column]
+            self._blooms_dirty = True
+
+    def _load_blooms(self, signature):
+        try:
+            with open(self.bloom_path, 'rb') as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        metrics.file_read(self.bloom_path)
+        if saved.get('signature') != signature:
+            return None
+        return {column: BloomFilter(*fields) for column, fields in saved['filters'].items()}
+
+    def flush_blooms(self):
+        if not self._blooms_dirty or self._blooms is None:
+            return
+        if self._key_sets_signature != self._state():
+            return
+        filters = {column: (bloom.size, bloom.hashes, bloom.capacity, bloom.count, bloom.bits)
+                   for column, bloom in self._blooms.items()}
+        temp_path = f"{self.bloom_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'signature': self._key_sets_signature, 'filters': filters}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        metrics.file_written(temp_path, self.bloom_path)
+        os.replace(temp_path, self.bloom_path)
+        self._blooms_dirty = False
+
+    # ------ Sorted Indexes ------
+    def sorted_index(self, column):
+        # Built from the cached frame, so its labels are the row labels of that frame
+        self._key_state()
+        if column not in self._sorted:
+            frame = self.frame()
+            self._key_state()
+            self._sorted[column] = SortedIndex.build(column, frame[column], self.schema.dtypes.get(column) == INTEGER)
+        return self._sorted[column]
+
+    def _ordered(self, column):
+        if column in self.sorted_columns:
+            return self.sorted_index(column)
+        # Other columns are sorted for this one query
+        frame = self.frame()
+        metrics.rows_scanned(len(frame))
+        return SortedIndex.build(column, frame[column], self.schema.dtypes.get(column) == INTEGER)
+
+    def rows(self, labels):
+        return self.frame().loc[labels]
+
+    def _rows_at(self, labels, columns=None):
+        frame = self.frame()
+        with metrics.phase('filter'):
+            rows = frame.loc[labels] if columns is None else frame.loc[labels, list(columns)]
+        metrics.rows_scanned(len(labels))
+        return rows
+
+    def range(self, column, low=None, high=None, columns=None, inclusive='both'):
+        return self._rows_at(self._ordered(column).range(low, high, inclusive), columns)
+
+    def top(self, column, n, largest=True, columns=None):
+        return self._rows_at(self._ordered(column).top(n, largest), columns)
+
+    def warm(self):
+        # Everything a read may build, built up front for processes whose threads share the table
+        self.frame()
+        self.indexes()
+        for name in self.aggregate_specs:
+            self.aggregate(name)
+        for column in self.key_columns:
+            self.key_set(column)
+        for column in self.sorted_columns:
+            self.sorted_index(column)
+        if self.name_columns:
+            self.name_index()
+
+    def rebuild(self):
+        # Drop the sidecars and build indexes, aggregates, Bloom filters and name indexes again from the data file
+        for path in (self.index_path, self.aggregate_path, self.bloom_path, self.names_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.invalidate()
+        if not self.exists():
+            return
+        self.indexes()
+        if self.aggregate_specs:
+            self.aggregates()
+        for column in self.key_columns:
+            self.key_set(column)
+        if self.name_columns:
+            self.name_index()
+        self.flush_indexes()
+        self.flush_aggregates()
+        self.flush_blooms()
+        self.flush_names()
+
+    # ------ Tombstones ------
+    def tombstones(self):
+        # Positions of deleted rows still present in the file
+        if not self.is_stale():
+            return self._deleted
+        deleted = self._read_tombstones(_signature(self.path))
+        if deleted is None:
+            # Either a writer is publishing the pair right now or they do not match, a locked read tells which
+            deleted = self._snapshot(lambda size: None)[2]
+        return deleted
+
+    def _saved_tombstones(self):
+        try:
+            with open(self.tombstone_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            return None
+        metrics.file_read(self.tombstone_path)
+        return saved
+
+    def _read_tombstones(self, signature):
+        # Only trusted for the data file they were written against, None otherwise
+        saved = self._saved_tombstones()
+        if saved is None or not saved:
+            return None if saved is None else set()
+        if signature is None:
+            return None
+        if saved.get('key') == _tombstone_key(signature):
+            return set(saved['rows'])
+        # A plain copy has a new mtime, its size and content still match
+        if saved.get('size') == signature[2] and saved.get('sha256') == self._content(saved.get('hashed', saved['size'])):
+            return set(saved['rows'])
+        return None
+
+    def _content(self, length):
+        # Hash of the data file's first length bytes, computed once per version of the file
+        signature = _signature(self.path)
+        if self._hashed is None or self._hashed[:2] != (signature, length):
+            self._hashed = (signature, length, _content_hash(self.path, length))
+        return self._hashed[2]
+
+    def write_tombstones(self, path, data_path, signature=None):
+        # signature: the data file's as it will be once the commit is applied (rows appended in place).
+        # Only a new data file is hashed, the file in place keeps the hash its tombstones hold
+        saved = self._saved_tombstones() if data_path == self.path else None
+        if saved and self._read_tombstones(_signature(data_path)) is None:
+            saved = None
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(tombstone_record(data_path, self.tombstones(), signature, saved), f)
+
+    def compact(self):
+        # The file is rewritten once without its deleted rows
+        with self.store.transaction():
+            if not self.exists() or not self.tombstones():
+                return False
+            # The aggregates and the name index do not change, they only follow the file to its new signature
+            self._tracked_aggregates()
+            self._tracked_names()
+            self._write(self.frame())
+        return True
+
+    # ------ Changes ------
+    # Every change runs inside a transaction, so the writer lock is held before the file is read
+    def save(self, df):
+        with self.store.transaction():
+            self._write(df)
+            self._pending = []
+            self._next_label = int(df.index.max()) + 1 if len(df) else 0
+            self._indexes = None
+            self._aggregates = None
+            self._names = None
+            self._key_sets_signature = None
+
+    def insert(self, rows, joined=None):
+        # joined: whether the caller's transaction was already open before this call
+        joined = self.store.in_transaction() if joined is None else joined
+        with self.store.transaction():
+            self._insert(list(rows), joined)
+
+    def update(self, labels, values):
+        self.update_rows({column: pd.Series([value] * len(labels), index=labels, dtype=object)
+                          for column, value in values.items()})
+
+    def update_rows(self, changes):
+        with self.store.transaction():
+            self._update_rows(changes)
+
+    def delete(self, labels):
+        with self.store.transaction():
+            self._delete(labels)
+
+    def _insert(self, rows, joined):
+        if self._frame is not None and self.is_stale():
+            self.invalidate()
+        if self._frame is None and self.exists() and (joined or not self.backend.appendable):
+            # Later reads in the same transaction must see the staged rows,
+            # and columnar files are rewritten whole from the cached frame
+            self.frame()
+        columns = self.columns()
+        new_rows = self.schema.apply(pd.DataFrame(rows))
+        if columns and not set(new_rows.columns) <= set(columns):
+            # New columns change the header, so the whole file is rewritten
+            frame = self.frame()
+            new_rows.index = pd.RangeIndex(self._next_label, self._next_label + len(rows))
+            self.save(self.schema.concat([frame, new_rows]))
+            return
+
+        new_rows = new_rows.reindex(columns=columns or new_rows.columns)
+        names = self._tracked_names()
+        if self._frame is None and names is not None:
+            # Nothing cached, the name index knows how many rows the file holds
+            self._next_label = names.next_label
+        new_rows.index = pd.RangeIndex(self._next_label, self._next_label + len(rows))
+        for stats in (self._tracked_aggregates() or {}).values():
+            stats.add_rows(new_rows)
+        if names is not None:
+            names.add_rows(new_rows)
+        self._track_keys(added=new_rows)
+        if self._frame is None:
+            if not self.backend.appendable:
+                self.save(new_rows)
+                return
+            # Nothing cached yet, the next read picks the rows up from disk
+            self.store.stage_append(self, new_rows)
+            return
+        self._pending.append(new_rows)
+        self._next_label += len(rows)
+        if self.backend.appendable:
+            self.store.stage_append(self, new_rows)
+        else:
+            self.store.stage_replace(self)
+        if self._indexes is not None:
+            for index in self._indexes.values():
+                index.add_rows(new_rows)
+            self._indexes_dirty = True
+
+    def _update_rows(self, changes):
+        # changes: column -> Series of new values indexed by row label
+        frame = self.frame().copy()
+        indexes = self.indexes()
+        tracked = [stats for stats in (self._tracked_aggregates() or {}).values()
+                   if set(changes) & set(stats.keys + [stats.column])]
+        if set(changes) & set(self.name_columns):
+            tracked.append(self._tracked_names())
+        tracked = [structure for structure in tracked if structure is not None]
+        changed = pd.Index(list({label for values in changes.values() for label in values.index}))
+        try:
+            for stats in tracked:
+                stats.remove_rows(frame.loc[changed])
+            old_keys = frame.loc[changed, [column for column in changes if column in frame]]
+            for column, values in changes.items():
+                values = self.schema.coerce(column, values)
+                labels = values.index
+                self.schema.extend(frame, column, values)
+                if column in indexes:
+                    indexes[column].remove_rows(frame.loc[labels, [column]])
+                frame.loc[labels, column] = values.tolist()
+                if column in indexes:
+                    indexes[column].add_rows(frame.loc[labels, [column]])
+            for stats in tracked:
+                stats.add_rows(frame.loc[changed])
+            self._track_keys(removed=old_keys, added=frame.loc[changed, list(changes)])
+            self._write(frame)
+        except Exception:
+            self.invalidate()
+            raise
+        self._indexes_dirty = True
+
+    def _delete(self, labels):
+        frame = self.frame()
+        indexes = self.indexes()
+        try:
+            for index in indexes.values():
+                index.remove_rows(frame.loc[labels])
+            for stats in (self._tracked_aggregates() or {}).values():
+                stats.remove_rows(frame.loc[labels])
+            names = self._tracked_names()
+            if names is not None:
+                names.remove_rows(frame.loc[labels])
+            self._track_keys(removed=frame.loc[labels])
+            deleted = self._deleted.union(int(label) for label in labels)
+            if self._next_label >= TOMBSTONE_MIN_ROWS and len(deleted) <= COMPACT_RATIO * self._next_label:
+                # Only the tombstones are written, the data file stays as it is
+                self._frame = frame.drop(index=labels)
+                self._deleted = deleted
+                self.store.stage_tombstones(self)
+            else:
+                self._write(frame.drop(index=labels))
+        except Exception:
+            self.invalidate()
+            raise
+        self._indexes_dirty = True
+
+    def _write(self, df):
+        if self._signature is None:
+            # Nothing was read, the staged frame replaces whatever is on disk
+            self._signature = self._state()
+        self._frame = df
+        self.store.stage_replace(self)
+
+    def committed(self, rewritten=False):
+        if self._frame is not None:
+            if rewritten:
+                self._renumber()
+            self._signature = self._state()
+        if self._aggregates is not None:
+            # The deltas were applied as the changes were staged
+            self._aggregates_signature = self._state()
+        if self._names is not None:
+            self._names_signature = self._state()
+        if self._key_sets_signature is not None:
+            self._key_sets_signature = self._state()
+
+    def _renumber(self):
+        # A rewritten file has no deleted rows left, labels become positions again
+        labels = self._frame.index
+        if not labels.equals(pd.RangeIndex(len(labels))):
+            positions = np.zeros(int(labels.max()) + 1, dtype=np.int64)
+            positions[labels.to_numpy()] = np.arange(len(labels))
+            for index in (self._indexes or {}).values():
+                index.entries = {key: positions[rows].tolist() for key, rows in index.entries.items()}
+            for index in self._sorted.values():
+                index.labels = positions[index.labels]
+            if self._names is not None:
+                self._names.relabel(positions, len(labels))
+            self._frame = self._frame.set_axis(pd.RangeIndex(len(labels)))
+        self._deleted = set()
+        self._next_label = len(labels)
+
+# ------ Partitioned Table ------
+class PartitionedTable:
+    # One file per value combination of the partition columns, listed in <table>.partitions/manifest.json;
+    # every partition is a Table of its own, with its own tombstones and sidecars
+    def __init__(self, name, path, store, backend, schema, partition_columns, index_columns=(), aggregates=None, key_columns=(),
+                 sorted_columns=()):
+        self.name = name
+        self.path = path
+        self.store = store
+        self.backend = backend
+        self.schema = schema
+        self.partition_columns = list(partition_columns)
+        self.index_columns = list(index_columns)
+        self.aggregate_specs = dict(aggregates or {})
+        self.key_columns = list(key_columns)
+        self.sorted_columns = list(sorted_columns)
+        self.directory = os.path.splitext(path)[0] + PARTITIONS_SUFFIX
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        # Partition numbers only live in this process, they keep row labels apart
+        self._numbers = {}
+        self._keys = {}
+        self.invalidate()
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def invalidate(self):
+        self._manifest = None
+        self._manifest_signature = None
+        self._partitions = {}
+        self._entries = {}
+        self._cached = None
+
+    # ------ Manifest ------
+    def _value(self, column, value):
+        return None if pd.isna(value) else _plain(self.schema.key(column, value))
+
+    def _key(self, values):
+        return tuple(self._value(column, value) for column, value in zip(self.partition_columns, values))
+
+    def _number(self, key):
+        if key not in self._numbers:
+            self._numbers[key] = len(self._numbers)
+            self._keys[self._numbers[key]] = key
+        return self._numbers[key]
+
+    def _partition_table(self, entry):
+        backend = self.backend.archive_backend() if entry['archived'] else self.backend
+        return Table(self.name, os.path.join(self.directory, entry['file'] + backend.extension), self.store, backend,
+                     self.schema, self.index_columns, self.aggregate_specs, self.key_columns, self.sorted_columns)
+
+    def _sync(self):
+        # Re-read the manifest when another process changed it, partitions already open are kept
+        signature = _signature(self.manifest_path)
+        if self._manifest is not None and signature == self._manifest_signature:
+            return
+        manifest = {'columns': self.partition_columns, 'partitions': []}
+        if signature is not None:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            metrics.file_read(self.manifest_path)
+        opened = {table.path: table for table in self._partitions.values()}
+        partitions, entries = {}, {}
+        for entry in manifest['partitions']:
+            key = self._key(entry['values'])
+            table = self._partition_table(entry)
+            partitions[key] = opened.get(table.path, table)
+            entries[key] = entry
+        self._manifest, self._manifest_signature = manifest, signature
+        self._partitions, self._entries = partitions, entries
+        self._cached = None
+
+    def _stage_manifest(self):
+        manifest = dict(self._manifest, partitions=list(self._entries.values()))
+        self.store.stage_file(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+
+    def _create(self, key):
+        # A new partition is listed in the manifest committed with its first rows
+        os.makedirs(self.directory, exist_ok=True)
+        number = max([int(entry['file'].split('-')[-1]) for entry in self._entries.values()], default=-1) + 1
+        entry = {'file': f"part-{number:05d}", 'values': list(key), 'archived': False}
+        self._entries[key] = entry
+        self._partitions[key] = self._partition_table(entry)
+        self._stage_manifest()
+        return self._partitions[key]
+
+    def _writable(self, key):
+        self._sync()
+        if key not in self._partitions:
+            return self._create(key)
+        if self._entries[key]['archived']:
+            raise ValueError(f"The partition {key} is archived, restore it first")
+        if not self._partitions[key].exists() and key not in self._manifest_keys():
+            # Listed only by a transaction that was rolled back
+            self._stage_manifest()
+        return self._partitions[key]
+
+    def _manifest_keys(self):
+        return {self._key(entry['values']) for entry in self._manifest['partitions']}
+
+    # ------ Partition Pruning ------
+    def _matches(self, key, where):
+        for position, column in enumerate(self.partition_columns):
+            if column not in where:
+                continue
+            value = where[column]
+            values = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            if key[position] not in {self._value(column, part) for part in values}:
+                return False
+        return True
+
+    def partitions(self, where=None):
+        # Partitions whose values match the filters on partition columns, other filters are ignored
+        self._sync()
+        return [(key, table) for key, table in self._partitions.items()
+                if table.exists() and (not where or self._matches(key, where))]
+
+    def select(self, where):
+        if not where or not set(where) & set(self.partition_columns):
+            return self
+        return PartitionSelection(self, {column: value for column, value in where.items() if column in self.partition_columns})
+
+    def _labelled(self, key, frame):
+        offset = self._number(key) * PARTITION_LABELS
+        return frame.set_axis(frame.index + offset) if offset else frame
+
+    def _split(self, labels):
+        # Global labels -> {partition key: local labels}
+        split = {}
+        for label in labels:
+            number, local = divmod(int(label), PARTITION_LABELS)
+            split.setdefault(self._keys[number], []).append(local)
+        return split
+
+    def rows(self, labels):
+        return self._combine([self._labelled(key, self._partitions[key].rows(local)) for key, local in self._split(labels).items()])
+
+    # ------ Reads ------
+    def is_stale(self):
+        if _signature(self.manifest_path) != self._manifest_signature:
+            return True
+        return any(table.is_stale() for table in self._partitions.values() if table.exists())
+
+    def _combine(self, frames, columns=None):
+        if not frames:
+            return self.schema.apply(pd.DataFrame(columns=list(columns) if columns is not None else self.columns()))
+        return frames[0] if len(frames) == 1 else self.schema.concat(frames)
+
+    def frame(self, columns=None, where=None):
+        if not self.exists():
+            raise FileNotFoundError(f"{self.manifest_path} does not exist!")
+        # Partitions are renamed one by one, reloading under the read lock never mixes two commits
+        with self.store.read_lock() if self.is_stale() else nullcontext():
+            parts = [(key, table.frame(columns)) for key, table in self.partitions(where)]
+        if columns is not None or where:
+            return self._combine([self._labelled(key, frame) for key, frame in parts], columns)
+        sources = tuple(frame for _, frame in parts)
+        if self._cached is None or len(self._cached[0]) != len(sources) or any(a is not b for a, b in zip(self._cached[0], sources)):
+            self._cached = (sources, self._combine([self._labelled(key, frame) for key, frame in parts]))
+        return self._cached[1]
+
+    def columns(self):
+        for _, table in self.partitions():
+            return table.columns()
+        return []
+
+    def labels(self, column, key, where=None):
+        return [label + self._number(part) * PARTITION_LABELS
+                for part, table in self.partitions(where) for label in table.labels(column, key)]
+
+    def lookup(self, column, key, columns=None, where=None):
+        if column in self.partition_columns:
+            where = dict(where or {}, **{column: key})
+            frame = self.frame(None if columns is None else list(dict.fromkeys([column, *columns])), where)
+            frame = frame[frame[column] == self.schema.key(column, key)]
+            return frame if columns is None else frame[list(columns)]
+        frames = [self._labelled(part, table.lookup(column, key, columns)) for part, table in self.partitions(where)]
+        return self._combine(frames, columns)
+
+    def contains(self, column, key, where=None):
+        if column in self.partition_columns:
+            where = dict(where or {}, **{column: key})
+        return any(table.contains(column, key) for _, table in self.partitions(where))
+
+    def index(self, column):
+        return PartitionedIndex(self, column)
+
+    def indexes(self):
+        for _, table in self.partitions():
+            table.indexes()
+        return {column: self.index(column) for column in self.index_columns}
+
+    def key_set(self, column):
+        return KeySet.build(column, self.frame([column])[column])
+
+    def _ranged(self, column, low, high, inclusive, where):
+        # A range on a partition column skips the partitions outside it
+        parts = self.partitions(where)
+        if column not in self.partition_columns:
+            return parts
+        position = self.partition_columns.index(column)
+        low, high = self._value(column, low), self._value(column, high)
+        return [(key, table) for key, table in parts if key[position] is not None and _within(key[position], low, high, inclusive)]
+
+    def _ordered_rows(self, frames, column, columns, ascending=True):
+        # Every partition answers in order, the merged rows are put in order once more
+        frame = self._combine(frames, None if columns is None else list(dict.fromkeys([*columns, column])))
+        frame = frame.sort_values(column, ascending=ascending, kind='stable')
+        return frame if columns is None else frame[list(columns)]
+
+    def range(self, column, low=None, high=None, columns=None, inclusive='both', where=None):
+        fetch = None if columns is None else list(dict.fromkeys([*columns, column]))
+        frames = [self._labelled(key, table.range(column, low, high, fetch, inclusive))
+                  for key, table in self._ranged(column, low, high, inclusive, where)]
+        return self._ordered_rows(frames, column, columns)
+
+    def top(self, column, n, largest=True, columns=None, where=None):
+        fetch = None if columns is None else list(dict.fromkeys([*columns, column]))
+        frames = [self._labelled(key, table.top(column, n, largest, fetch)) for key, table in self.partitions(where)]
+        return self._ordered_rows(frames, column, columns, not largest).head(max(int(n), 0))
+
+    def aggregate(self, name, where=None):
+        keys, column = self.aggregate_specs[name]
+        merged = GroupStats(keys, column)
+        for _, table in self.partitions(where):
+            merged.merge(table.aggregate(name))
+        return merged
+
+    def stats(self, name, *key):
+        # Only the partitions named by the key are asked
+        keys, _ = self.aggregate_specs[name]
+        key = tuple(self.schema.key(column, part) for column, part in zip(keys, key))
+        where = {column: part for column, part in zip(keys, key) if column in self.partition_columns}
+        slots = [slot for _, table in self.partitions(where) for slot in table.aggregate(name).slots(*key)]
+        return GroupStats.summary(slots)
+
+    # ------ Changes ------
+    def _rows_by_partition(self, rows):
+        grouped = {}
+        for row in rows:
+            key = self._key([row.get(column) for column in self.partition_columns])
+            grouped.setdefault(key, []).append(row)
+        return grouped
+
+    def insert(self, rows, joined=None):
+        # Rows reach a new partition's file at commit, reads inside the same transaction do not see them yet
+        with self.store.transaction():
+            for key, part in self._rows_by_partition(list(rows)).items():
+                self._writable(key).insert(part)
+
+    def update(self, labels, values):
+        self.update_rows({column: pd.Series([value] * len(labels), index=labels, dtype=object)
+                          for column, value in values.items()})
+
+    def update_rows(self, changes):
+        with self.store.transaction():
+            labels = pd.Index(list({label for values in changes.values() for label in values.index}))
+            for key in self._split(labels):
+                table = self._writable(key)
+                offset = self._number(key) * PARTITION_LABELS
+                part = {}
+                for column, values in changes.items():
+                    values = values[(values.index >= offset) & (values.index < offset + PARTITION_LABELS)]
+                    if len(values):
+                        part[column] = values.set_axis(values.index - offset)
+                moved = self._moved(key, table, part)
+                if moved:
+                    # Rows whose partition values change are deleted here and inserted into their new partition
+                    rows = table.frame().loc[moved].astype(object)
+                    for column, values in part.items():
+                        changed = values.index.intersection(moved)
+                        rows.loc[changed, column] = values.loc[changed].tolist()
+                    table.delete(moved)
+                    part = {column: values.drop(moved, errors='ignore') for column, values in part.items()}
+                    part = {column: values for column, values in part.items() if len(values)}
+                if part:
+                    table.update_rows(part)
+                if moved:
+                    self.insert(rows.to_dict('records'))
+
+    def _moved(self, key, table, changes):
+        columns = [column for column in self.partition_columns if column in changes]
+        if not columns:
+            return []
+        labels = pd.Index(list({label for column in columns for label in changes[column].index}))
+        current = table.frame().loc[labels, self.partition_columns].astype(object)
+        for column in columns:
+            current.loc[changes[column].index, column] = changes[column].tolist()
+        return [label for label, values in zip(current.index, current.itertuples(index=False)) if self._key(values) != key]
+
+    def delete(self, labels):
+        with self.store.transaction():
+            for key, local in self._split(labels).items():
+                self._writable(key).delete(local)
+
+    def save(self, df):
+        # Every partition is rewritten, partitions without rows are left empty
+        with self.store.transaction():
+            self._sync()
+            columns = [column for column in self.partition_columns if column in df]
+            positions = {}
+            for position, values in enumerate(zip(*(df[column].tolist() for column in columns))):
+                positions.setdefault(self._key(values), []).append(position)
+            for key in set(self._partitions) - set(positions):
+                positions[key] = []
+            for key, rows in positions.items():
+                self._writable(key).save(df.iloc[rows].reset_index(drop=True))
+
+    # ------ Archive ------
+    def _move(self, key, archived):
+        # The partition is written again with the other backend, the manifest then points at the new file
+        table = self._partitions[key]
+        entry = dict(self._entries[key], archived=archived)
+        moved = self._partition_table(entry)
+        if moved.path != table.path:
+            moved.save(table.frame().reset_index(drop=True))
+            self.store.stage_remove(table.path)
+            self.store.stage_remove(table.tombstone_path)
+        self._entries[key] = entry
+        self._partitions[key] = moved
+        self._stage_manifest()
+        return table
+
+    def archive(self, before_year, column='Year'):
+        # Partitions of years before before_year become read-only and compressed
+        position = self.partition_columns.index(column)
+        with self.store.transaction():
+            keys = [key for key, _ in self.partitions() if not self._entries[key]['archived']
+                    and key[position] is not None and key[position] < before_year]
+            replaced = [self._move(key, True) for key in sorted(keys, key=str)]
+        _remove_sidecars(replaced)
+        return keys
+
+    def restore(self, year, column='Year'):
+        position = self.partition_columns.index(column)
+        with self.store.transaction():
+            keys = [key for key, _ in self.partitions() if self._entries[key]['archived'] and key[position] == year]
+            replaced = [self._move(key, False) for key in sorted(keys, key=str)]
+        _remove_sidecars(replaced)
+        return keys
+
+    # ------ Sidecars ------
+    def flush_indexes(self):
+        for table in self._partitions.values():
+            table.flush_indexes()
+
+    def flush_aggregates(self):
+        for table in self._partitions.values():
+            table.flush_aggregates()
+
+    def flush_blooms(self):
+        for table in self._partitions.values():
+            table.flush_blooms()
+
+    def flush_names(self):
+        for table in self._partitions.values():
+            table.flush_names()
+
+    def warm(self):
+        self.frame()
+        for _, table in self.partitions():
+            table.warm()
+
+    def rebuild(self):
+        self.invalidate()
+        for _, table in self.partitions():
+            table.rebuild()
+
+    def compact(self):
+        with self.store.transaction():
+            return any([table.compact() for _, table in self.partitions()])
+
+class PartitionedIndex:
+    # The hash indexes of all partitions, answering in global row labels
+    def __init__(self, table, column):
+        self.table = table
+        self.column = column
+
+    def __contains__(self, key):
+        return any(key in table.index(self.column) for _, table in self.table.partitions())
+
+    def __len__(self):
+        # A key found in several partitions counts once, as in a HashIndex
+        return len(self.keys())
+
+    def keys(self):
+        return {key for _, table in self.table.partitions() for key in table.index(self.column).keys()}
+
+    def lookup(self, key):
+        return [label + self.table._number(part) * PARTITION_LABELS
+                for part, table in self.table.partitions() for label in table.index(self.column).lookup(key)]
+
+class PartitionSelection:
+    # A read-only view of the partitions matching filters on the partition columns
+    def __init__(self, table, where):
+        self.table = table
+        self.where = where
+        self.schema = table.schema
+        self.index_columns = table.index_columns
+
+    def frame(self, columns=None):
+        return self.table.frame(columns, self.where)
+
+    def labels(self, column, key):
+        return self.table.labels(column, key, self.where)
+
+    def lookup(self, column, key, columns=None):
+        return self.table.lookup(column, key, columns, self.where)
+
+    def contains(self, column, key):
+        return self.table.contains(column, key, self.where)
+
+    def range(self, column, low=None, high=None, columns=None, inclusive='both'):
+        return self.table.range(column, low, high, columns, inclusive, self.where)
+
+    def top(self, column, n, largest=True, columns=None):
+        return self.table.top(column, n, largest, columns, self.where)
+
+def _remove_sidecars(tables):
+    # Sidecars of a file that was replaced by another one are of no use any more
+    for table in tables:
+        for path in (table.index_path, table.aggregate_path, table.bloom_path, table.names_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+# ------ Table Store ------
+class TableStore:
+    def __init__(self, files=FILES, storage=None):
+        self.backend = get_backend(storage or STORAGE_FORMAT)
+        self.files = {name: self.backend.path_for(path) for name, path in files.items()}
+        self.tables = {name: self._table(name, path) for name, path in self.files.items()}
+        directory = os.path.dirname(next(iter(self.files.values())))
+        self.wal = WriteAheadLog(directory)
+        self.lock = FileLock(directory)
+        self._transaction = None
+        self._read_locked = False
+        self.changes = ChangeLog(directory) if CHANGE_LOG else None
+        # A held lock means a writer is alive and owns the log, a dead writer's lock is already gone
+        if self.lock.acquire(exclusive=True, blocking=False):
+            try:
+                self.wal.recover()
+            finally:
+                self.lock.release()
+
+    def _table(self, name, path, partitioned=None):
+        # A table is partitioned once its manifest exists
+        if partitioned is None:
+            partitioned = name in PARTITIONS and os.path.exists(
+                os.path.join(os.path.splitext(path)[0] + PARTITIONS_SUFFIX, MANIFEST_NAME))
+        if partitioned:
+            return PartitionedTable(name, path, self, self.backend, get_schema(name), PARTITIONS[name],
+                                    INDEXES.get(name, ()), AGGREGATES.get(name), KEY_SETS.get(name, ()), SORTED_INDEXES.get(name, ()))
+        return Table(name, path, self, self.backend, get_schema(name), INDEXES.get(name, ()), AGGREGATES.get(name),
+                     KEY_SETS.get(name, ()), SORTED_INDEXES.get(name, ()), NAME_INDEXES.get(name, ()))
+
+    # ------ Transactions ------
+    def in_transaction(self):
+        return self._transaction is not None
+
+    def locked(self):
+        return self._transaction is not None or self._read_locked
+
+    @contextmanager
+    def transaction(self):
+        # Nested blocks join the outer transaction, everything commits together
+        if self._transaction is not None:
+            yield self._transaction
+            return
+        if self._read_locked:
+            raise RuntimeError("Cannot write while holding the read lock")
+        # One writer at a time across processes, readers keep reading the last published files
+        self.lock.acquire(exclusive=True)
+        try:
+            self.wal.recover()
+            self._transaction = Transaction(self.wal)
+            try:
+                yield self._transaction
+            except BaseException:
+                transaction, self._transaction = self._transaction, None
+                transaction.rollback()
+                raise
+            transaction, self._transaction = self._transaction, None
+            transaction.commit()
+        finally:
+            self.lock.release()
+
+    @contextmanager
+    def read_lock(self):
+        # Keeps writers out while several tables are read as one consistent view
+        if self._transaction is not None or self._read_locked:
+            yield
+            return
+        self.lock.acquire(exclusive=False)
+        self._read_locked = True
+        try:
+            yield
+        finally:
+            self._read_locked = False
+            self.lock.release()
+
+    def stage_replace(self, table):
+        with self.transaction() as transaction:
+            transaction.stage_replace(table)
+
+    def stage_append(self, table, rows):
+        with self.transaction() as transaction:
+            transaction.stage_append(table, rows)
+
+    def stage_tombstones(self, table):
+        with self.transaction() as transaction:
+            transaction.stage_tombstones(table)
+
+    def stage_file(self, path, data):
+        with self.transaction() as transaction:
+            transaction.stage_file(path, data)
+
+    def stage_remove(self, path):
+        with self.transaction() as transaction:
+            transaction.stage_remove(path)
+
+    def table(self, name):
+        return self.tables[name]
+
+    def exists(self, name):
+        return self.tables[name].exists()
+
+    def frame(self, name, columns=None):
+        return self.tables[name].frame(columns)
+
+    def save(self, name, df):
+        with self.transaction():
+            self.tables[name].save(df)
+            self.log_changes(name, 'reset')
+
+    def labels(self, name, column, key):
+        return self.tables[name].labels(column, key)
+
+    def lookup(self, name, column, key, columns=None):
+        return self.tables[name].lookup(column, key, columns)
+
+    def has_key(self, name, column, key):
+        return self.tables[name].contains(column, key)
+
+    def stats(self, name, aggregate, *key):
+        return self.tables[name].stats(aggregate, *key)
+
+    def range(self, name, column, low=None, high=None, columns=None, inclusive='both'):
+        return self.tables[name].range(column, low, high, columns, inclusive)
+
+    def top(self, name, column, n, largest=True, columns=None):
+        return self.tables[name].top(column, n, largest, columns)
+
+    def search(self, name, text, limit=10, columns=None):
+        return self.tables[name].search(text, limit, columns)
+
+    # Writes through the store also go to the change log, in the same transaction
+    def insert(self, name, rows):
+        if self.changes is None:
+            self.tables[name].insert(rows)
+            return
+        rows = list(rows)
+        table = self.tables[name]
+        joined = self.in_transaction()
+        with self.transaction():
+            table.insert(rows, joined)
+            self.log_changes(name, 'insert', after=table.schema.apply(pd.DataFrame(rows)))
+
+    def update(self, name, labels, values):
+        self.update_rows(name, {column: pd.Series([value] * len(labels), index=labels, dtype=object)
+                                for column, value in values.items()})
+
+    def update_rows(self, name, changes):
+        if self.changes is None:
+            self.tables[name].update_rows(changes)
+            return
+        table = self.tables[name]
+        with self.transaction():
+            before = table.rows(list({label for values in changes.values() for label in values.index}))
+            table.update_rows(changes)
+            after = before.astype(object)
+            for column, values in changes.items():
+                after.loc[values.index, column] = table.schema.coerce(column, values).tolist()
+            self.log_changes(name, 'update', before, after)
+
+    def delete(self, name, labels):
+        if self.changes is None:
+            self.tables[name].delete(labels)
+            return
+        table = self.tables[name]
+        with self.transaction():
+            before = table.rows(labels)
+            table.delete(labels)
+            self.log_changes(name, 'delete', before)
+
+    def log_changes(self, name, op, before=None, after=None):
+        # op: insert, update, delete (rows of before/after) or reset (the whole table)
+        if self.changes is None:
+            return
+        events = [reset_event(name)] if op == 'reset' else row_events(name, op, PRIMARY_KEYS.get(name, ()), before, after)
+        with self.transaction() as transaction:
+            transaction.stage_changes(self.changes, events)
+
+    def read_changes(self, after=0, limit=None, tables=None):
+        if self.changes is None:
+            return iter(())
+        return self.changes.read(after, limit, tables)
+
+    def flush(self):
+        for table in self.tables.values():
+            table.flush_indexes()
+            table.flush_aggregates()
+            table.flush_blooms()
+            table.flush_names()
+
+    def rebuild(self):
+        for table in self.tables.values():
+            table.rebuild()
+
+    def compact(self, names=None):
+        return [name for name in (names or list(self.tables)) if self.tables[name].compact()]
+
+    # ------ Partitions ------
+    # Switching layouts rewrites the whole table, run it while no other process uses the tables
+    def partition(self, name):
+        table = self.tables[name]
+        if name not in PARTITIONS or isinstance(table, PartitionedTable) or not table.exists():
+            return False
+        partitioned = self._table(name, table.path, partitioned=True)
+        with self.transaction():
+            partitioned.save(table.frame())
+            self.stage_remove(table.path)
+            self.stage_remove(table.tombstone_path)
+        _remove_sidecars([table])
+        self.tables[name] = partitioned
+        return True
+
+    def unpartition(self, name):
+        table = self.tables[name]
+        if not isinstance(table, PartitionedTable):
+            return False
+        flat = self._table(name, table.path, partitioned=False)
+        partitions = [part for _, part in table.partitions()]
+        with self.transaction():
+            flat.save(table.frame().reset_index(drop=True))
+            for part in partitions:
+                self.stage_remove(part.path)
+                self.stage_remove(part.tombstone_path)
+            self.stage_remove(table.manifest_path)
+        _remove_sidecars(partitions)
+        if not os.listdir(table.directory):
+            os.rmdir(table.directory)
+        self.tables[name] = flat
+        return True
+
+    def archive(self, before_year):
+        # Partitions of older academic years are compressed and become read-only
+        return {name: table.archive(before_year) for name, table in self.tables.items() if isinstance(table, PartitionedTable)}
+
+    def restore(self, year):
+        return {name: table.restore(year) for name, table in self.tables.items() if isinstance(table, PartitionedTable)}
+
+    def invalidate(self, name=None):
+        names = [name] if name else list(self.tables)
+        for table_name in names:
+            self.tables[table_name].invalidate()
+
+# One store per set of data files, shared by every script in the process
+_STORES = {}
+
+def get_store(files=FILES, storage=None):
+    storage = storage or STORAGE_FORMAT
+    paths = tuple(sorted((name, os.path.abspath(path)) for name, path in files.items()))
+    key = (storage, paths)
+    if key not in _STORES:
+        _STORES[key] = TableStore(dict(paths), storage)
+    return _STORES[key]
+
+@atexit.register
+def _flush_stores():
+    for store in _STORES.values():
+        store.flush()
+
+# ------ Main Implementation ------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the index and aggregate sidecar files from the tables")
+    parser.add_argument('--storage', default=None, help="csv, parquet, feather or npz (default: UNIVERSITY_STORAGE)")
+    parser.add_argument('--compact', action='store_true', help="first rewrite the tables that have deleted rows")
+    parser.add_argument('--partition', action='store_true', help="split Enrollment into one file per Year and Semester")
+    parser.add_argument('--unpartition', action='store_true', help="merge the partitions back into one file")
+    parser.add_argument('--archive', type=int, metavar='YEAR', help="compress the partitions of the years before YEAR")
+    parser.add_argument('--restore', type=int, metavar='YEAR', help="make the archived partitions of YEAR writable again")
+    args = parser.parse_args(argv)
+    store = get_store(FILES, args.storage)
+    for name in list(store.tables):
+        if args.partition and store.partition(name):
+            print(f"Partitioned {store.table(name).path} into {store.table(name).directory} Successfully :)")
+        if args.unpartition and store.unpartition(name):
+            print(f"Merged the partitions into {store.table(name).path} Successfully :)")
+    if args.archive is not None:
+        for name, keys in store.archive(args.archive).items():
+            print(f"Archived {len(keys)} partitions of {name} :)")
+    if args.restore is not None:
+        for name, keys in store.restore(args.restore).items():
+            print(f"Restored {len(keys)} partitions of {name} :)")
+    if args.compact:
+        for name in store.compact():
+            print(f"Compacted {store.table(name).path} Successfully :)")
+    store.rebuild()
+    for table in store.tables.values():
+        if table.exists():
+            print(f"Rebuilt {getattr(table, 'directory', table.path)} Successfully :)")
+
+if __name__ == "__main__":
+    main()
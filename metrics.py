@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+
+# Set to a file path to collect metrics for the whole run and write them there at exit
+# (.prom or .txt for the Prometheus text format, JSON otherwise)
+METRICS_ENV = 'UNIVERSITY_METRICS'
+UNATTRIBUTED = 'other'
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_operations = {}
+_phases = {}
+_rows = {}
+_files = {}
+
+# ------ Switching On And Off ------
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _operations.clear()
+        _phases.clear()
+        _rows.clear()
+        _files.clear()
+
+# ------ Timers ------
+class _Disabled:
+    # Shared by every call while metrics are off, so a disabled timer costs one flag check
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_DISABLED = _Disabled()
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _current():
+    # Nested operations are counted under the outermost one
+    operations = getattr(_local, 'operations', None)
+    return operations[0] if operations else UNATTRIBUTED
+
+class _Operation:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        operations = getattr(_local, 'operations', None)
+        if operations is None:
+            operations = _local.operations = []
+        operations.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _local.operations.pop()
+        with _lock:
+            counters = _operations.setdefault(self.name, {'calls': 0, 'errors': 0, 'seconds': 0.0})
+            counters['calls'] += 1
+            counters['errors'] += exc_type is not None
+            counters['seconds'] += elapsed
+        return False
+
+class _Phase:
+    # Phase times are exclusive: time spent in a nested phase is only counted there
+    def __init__(self, name):
+        self.name = name
+        self.nested = 0.0
+
+    def __enter__(self):
+        _stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        with _lock:
+            counters = _phases.setdefault((_current(), self.name), {'calls': 0, 'seconds': 0.0})
+            counters['calls'] += 1
+            counters['seconds'] += elapsed - self.nested
+        return False
+
+def operation(name):
+    return _Operation(name) if _enabled else _DISABLED
+
+def phase(name):
+    return _Phase(name) if _enabled else _DISABLED
+
+def instrument(func):
+    # Counts calls and wall time of a public function under its own name
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with _Operation(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def timed(name):
+    # Runs every call of a helper function as one phase
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# ------ Counters ------
+def rows_scanned(count):
+    if _enabled:
+        with _lock:
+            counters = _rows.setdefault(_current(), {'scanned': 0, 'returned': 0})
+            counters['scanned'] += int(count)
+
+def rows_returned(count):
+    if _enabled:
+        with _lock:
+            counters = _rows.setdefault(_current(), {'scanned': 0, 'returned': 0})
+            counters['returned'] += int(count)
+
+def file_bytes(path, read=0, written=0):
+    if _enabled:
+        with _lock:
+            counters = _files.setdefault((_current(), os.path.basename(path)), {'read': 0, 'written': 0})
+            counters['read'] += int(read)
+            counters['written'] += int(written)
+
+def file_read(path):
+    # Whole-file reads are counted at the file size
+    if _enabled and os.path.exists(path):
+        file_bytes(path, read=os.path.getsize(path))
+
+def file_written(path, target=None):
+    # Temp files are counted under the file they replace
+    if _enabled and os.path.exists(path):
+        file_bytes(target or path, written=os.path.getsize(path))
+
+# ------ Export ------
+def snapshot():
+    with _lock:
+        return {
+            'operations': {name: dict(counters) for name, counters in sorted(_operations.items())},
+            'phases': [{'operation': operation, 'phase': name, **counters}
+                       for (operation, name), counters in sorted(_phases.items())],
+            'rows': {name: dict(counters) for name, counters in sorted(_rows.items())},
+            'files': [{'operation': operation, 'file': name, **counters}
+                      for (operation, name), counters in sorted(_files.items())],
+        }
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        text = ','.join(f'{key}="{_label(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{text}}} {value}")
+
+def prometheus(data=None):
+    data = data or snapshot()
+    operations, rows = data['operations'], data['rows']
+    lines = []
+    _metric(lines, 'university_operation_calls_total', 'counter', "Calls per operation",
+            [({'operation': name}, counters['calls']) for name, counters in operations.items()])
+    _metric(lines, 'university_operation_errors_total', 'counter', "Calls that raised",
+            [({'operation': name}, counters['errors']) for name, counters in operations.items()])
+    _metric(lines, 'university_operation_seconds_total', 'counter', "Wall time per operation",
+            [({'operation': name}, counters['seconds']) for name, counters in operations.items()])
+    _metric(lines, 'university_phase_seconds_total', 'counter', "Wall time per phase, nested phases excluded",
+            [({'operation': item['operation'], 'phase': item['phase']}, item['seconds']) for item in data['phases']])
+    _metric(lines, 'university_phase_calls_total', 'counter', "Calls per phase",
+            [({'operation': item['operation'], 'phase': item['phase']}, item['calls']) for item in data['phases']])
+    _metric(lines, 'university_rows_scanned_total', 'counter', "Rows examined by lookups and scans",
+            [({'operation': name}, counters['scanned']) for name, counters in rows.items()])
+    _metric(lines, 'university_rows_returned_total', 'counter', "Rows handed back to the caller",
+            [({'operation': name}, counters['returned']) for name, counters in rows.items()])
+    _metric(lines, 'university_file_read_bytes_total', 'counter', "Bytes read per file",
+            [({'operation': item['operation'], 'file': item['file']}, item['read']) for item in data['files']])
+    _metric(lines, 'university_file_written_bytes_total', 'counter', "Bytes written per file",
+            [({'operation': item['operation'], 'file': item['file']}, item['written']) for item in data['files']])
+    return '\n'.join(lines) + '\n'
+
+def dump(path, format=None):
+    if format is None:
+        format = 'prometheus' if os.path.splitext(path)[1] in ('.prom', '.txt') else 'json'
+    if format not in ('json', 'prometheus'):
+        raise ValueError(f"Unknown metrics format {format}")
+    text = prometheus() if format == 'prometheus' else json.dumps(snapshot(), indent=2, ensure_ascii=False) + '\n'
+    # Written aside and renamed, so a scraper never reads half a file
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+if os.environ.get(METRICS_ENV):
+    enable()
+    atexit.register(lambda: dump(os.environ[METRICS_ENV]))
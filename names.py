@@ -0,0 +1,174 @@
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+# Vocabulary names sharing at least this share of trigrams with a query name count as a match
+FUZZY_MIN = 0.4
+
+# ------ Arabic Normalization ------
+# Harakat, shadda, sukun, superscript alef, Quranic marks and tatweel
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+# Hamza forms, alef maqsura and taa marbuta are spelled either way
+_LETTERS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ؤ': 'و', 'ئ': 'ي', 'ء': None, 'ى': 'ي', 'ة': 'ه'})
+_SEPARATORS = re.compile(r'[\W_]+')
+
+def normalize_name(text):
+    text = _DIACRITICS.sub('', str(text)).translate(_LETTERS).casefold()
+    return ' '.join(_SEPARATORS.sub(' ', text).split())
+
+def name_tokens(text):
+    # 'آل مقطة', 'المقطة' and 'مقطه' are one token, 'عبد المجيد' and 'عبدالمجيد' are one token
+    words = normalize_name(text).split()
+    tokens = []
+    position = 0
+    while position < len(words):
+        word = words[position]
+        position += 1
+        if word == 'عبد' and position < len(words):
+            tokens.append(word + words[position])
+            position += 1
+            continue
+        if word == 'ال':
+            continue
+        if word.startswith('ال') and len(word) > 3:
+            word = word[2:]
+        tokens.append(word)
+    return tokens
+
+def name_grams(token):
+    padded = f" {token} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+# ------ Name Index ------
+class NameIndex:
+    # Inverted index over distinct name tokens: token -> row labels, trigram -> tokens.
+    # Fuzzy matching only walks the vocabulary of names, never the rows
+    def __init__(self, columns, postings=None, next_label=0):
+        self.columns = list(columns)
+        self.postings = postings if postings is not None else {}
+        self.next_label = next_label
+        self.vocabulary = sorted(self.postings)
+        # Posting lists as arrays for searching, dropped when the list changes
+        self.arrays = {}
+        self.grams = {}
+        for token in self.vocabulary:
+            for gram in name_grams(token):
+                self.grams.setdefault(gram, set()).add(token)
+
+    @classmethod
+    def build(cls, columns, frame, next_label):
+        # Every distinct name is tokenized once, its rows are taken together
+        labels = frame.index.to_numpy()
+        parts = {}
+        for column in columns:
+            if column not in frame:
+                continue
+            codes, values = pd.factorize(frame[column])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            for code, value in enumerate(values):
+                if not isinstance(value, str):
+                    continue
+                rows = labels[order[bounds[code]:bounds[code + 1]]]
+                for token in set(name_tokens(value)):
+                    parts.setdefault(token, []).append(rows)
+        postings = {token: np.unique(np.concatenate(rows)).tolist() for token, rows in parts.items()}
+        return cls(columns, postings, next_label)
+
+    def __len__(self):
+        return len(self.postings)
+
+    def _rows(self, frame):
+        columns = [column for column in self.columns if column in frame]
+        for label, *values in zip(frame.index.tolist(), *(frame[column].tolist() for column in columns)):
+            tokens = {token for value in values if isinstance(value, str) for token in name_tokens(value)}
+            yield label, tokens
+
+    def add_rows(self, frame):
+        for label, tokens in self._rows(frame):
+            for token in tokens:
+                labels = self.postings.get(token)
+                if labels is None:
+                    labels = self.postings[token] = []
+                    insort(self.vocabulary, token)
+                    for gram in name_grams(token):
+                        self.grams.setdefault(gram, set()).add(token)
+                labels.append(label)
+                self.arrays.pop(token, None)
+            self.next_label = max(self.next_label, int(label) + 1)
+
+    def remove_rows(self, frame):
+        for label, tokens in self._rows(frame):
+            for token in tokens:
+                labels = self.postings.get(token)
+                if labels is None or label not in labels:
+                    continue
+                labels.remove(label)
+                self.arrays.pop(token, None)
+                if labels:
+                    continue
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+                for gram in name_grams(token):
+                    self.grams[gram].discard(token)
+                    if not self.grams[gram]:
+                        del self.grams[gram]
+
+    def relabel(self, positions, next_label):
+        # Labels after a file rewrite, positions maps old label -> new label
+        self.postings = {token: positions[labels].tolist() for token, labels in self.postings.items()}
+        self.arrays = {}
+        self.next_label = next_label
+
+    # ------ Search ------
+    def similar(self, token):
+        # Vocabulary tokens close to one query token, with a similarity in (0, 1]
+        matches = {}
+        grams = name_grams(token)
+        shared = Counter(match for gram in grams for match in self.grams.get(gram, ()))
+        for match, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(name_grams(match)))
+            if similarity >= FUZZY_MIN:
+                matches[match] = similarity
+        # A query token that starts a name matches it too, as when the name is still being typed
+        position = bisect_left(self.vocabulary, token)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(token):
+            match = self.vocabulary[position]
+            matches[match] = max(matches.get(match, 0), 0.5 + 0.5 * len(token) / len(match))
+            position += 1
+        return matches
+
+    def _labels(self, token):
+        labels = self.arrays.get(token)
+        if labels is None:
+            labels = self.arrays[token] = np.array(self.postings[token], dtype=np.int64)
+        return labels
+
+    def search(self, text, limit=10):
+        # (label, score) of the best matching rows, the score is the mean of each query token's best similarity
+        query = list(dict.fromkeys(name_tokens(text)))
+        found_labels, found_scores = [], []
+        for token in query:
+            matches = sorted(self.similar(token).items(), key=lambda item: (-item[1], item[0]))
+            if not matches:
+                continue
+            labels = np.concatenate([self._labels(match) for match, _ in matches])
+            scores = np.repeat([similarity for _, similarity in matches], [len(self.postings[match]) for match, _ in matches])
+            # Closest matches come first, so the first time a row shows up is its best similarity
+            labels, first = np.unique(labels, return_index=True)
+            found_labels.append(labels)
+            found_scores.append(scores[first])
+        if not found_labels:
+            return []
+        labels, rows = np.unique(np.concatenate(found_labels), return_inverse=True)
+        totals = np.bincount(rows, weights=np.concatenate(found_scores))
+        if limit is not None and 0 < limit < len(labels):
+            # Only rows scoring at least the limit-th best total are put in order
+            threshold = np.partition(totals, len(totals) - limit)[len(totals) - limit]
+            keep = np.flatnonzero(totals >= threshold)
+        else:
+            keep = np.arange(len(labels))
+        keep = keep[np.lexsort((labels[keep], -totals[keep]))][:limit]
+        return [(int(label), float(total) / len(query)) for label, total in zip(labels[keep], totals[keep])]
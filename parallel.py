@@ -0,0 +1,16 @@
+from collections import deque
+
+# ------ Ordered Pool Results ------
+def ordered_results(func, tasks, pool, window):
+    # Results come back in task order; at most `window` tasks are in flight, so memory does not grow
+    # with the row count. Without a pool the tasks run one after the other in this process
+    if pool is None:
+        yield from map(func, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+import metrics
+from data_store import get_store
+
+# Key lists up to this size are probed through the hash index instead of a column scan
+INDEX_PROBE_LIMIT = 1000
+# Rows converted to dicts at a time by the row iterators
+ROW_CHUNK = 1000
+
+# ------ Scans With Pushed-Down Filters ------
+def _filter_values(value):
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else None
+
+def scan(table_name, columns=None, where=None, store=None):
+    # where: column -> value, or column -> list of values; applied before anything is joined
+    store = store or get_store()
+    where = dict(where or {})
+    # A partitioned table only reads the partitions matching the filter
+    table = store.table(table_name).select(where)
+    needed = None
+    if columns is not None:
+        needed = list(dict.fromkeys(list(columns) + list(where)))
+
+    # An equality or a short key list on an indexed column narrows the rows through the index
+    indexed = [column for column, value in where.items() if column in table.index_columns
+               and (_filter_values(value) is None or len(_filter_values(value)) <= INDEX_PROBE_LIMIT)]
+    if indexed:
+        column = indexed[0]
+        values = _filter_values(where[column])
+        if values is None:
+            df = table.lookup(column, where.pop(column), needed)
+        else:
+            del where[column]
+            frame = table.frame()
+            with metrics.phase('filter'):
+                labels = sorted({label for value in values for label in table.labels(column, value)})
+                df = frame.loc[labels]
+            metrics.rows_scanned(len(df))
+            df = df if needed is None else df[needed]
+    else:
+        df = table.frame(needed)
+        metrics.rows_scanned(len(df))
+
+    with metrics.phase('filter'):
+        for column, value in where.items():
+            values = _filter_values(value)
+            if values is not None:
+                df = df[df[column].isin(table.schema.keys(column, values))]
+            else:
+                df = df[df[column] == table.schema.key(column, value)]
+    return df if columns is None else df[list(columns)]
+
+# ------ Paged Reads ------
+def _value(value):
+    if value is None or value is pd.NA or value != value:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def _paginate(frame, labels, order_by=None, after=None, limit=None, offset=0, schema=None):
+    # labels: the matching rows in file order. Only the order_by columns of those rows are sorted,
+    # after is the order_by value (or tuple of values) of the last row already seen
+    if order_by is not None:
+        order_by = [order_by] if isinstance(order_by, str) else list(order_by)
+        keys = frame.loc[labels, order_by]
+        # Categories compare by their text, not by their position in the category list
+        keys = keys.astype({column: object for column in order_by if isinstance(keys[column].dtype, pd.CategoricalDtype)})
+        keys = keys.sort_values(order_by, kind='stable', na_position='last')
+        if after is not None:
+            after = [after] if len(order_by) == 1 and not isinstance(after, (list, tuple)) else list(after)
+            if len(after) != len(order_by):
+                raise ValueError(f"after needs one value for each of {', '.join(order_by)}")
+            keep = None
+            for column, value in reversed(list(zip(order_by, after))):
+                value = schema.key(column, value) if schema is not None else value
+                greater = (keys[column] > value).fillna(False).astype(bool)
+                keep = greater if keep is None else greater | ((keys[column] == value).fillna(False).astype(bool) & keep)
+            keys = keys[keep]
+        labels = keys.index.to_numpy()
+    elif after is not None:
+        raise ValueError("after needs order_by")
+    return labels[offset:None if limit is None else offset + limit]
+
+def _rows(frame, labels, columns=None):
+    # Converted ROW_CHUNK rows at a time, a caller that stops early never pays for the rest
+    columns = list(columns) if columns is not None else list(frame.columns)
+    for start in range(0, len(labels), ROW_CHUNK):
+        chunk = frame.loc[labels[start:start + ROW_CHUNK], columns]
+        for row in chunk.itertuples(index=False, name=None):
+            yield dict(zip(columns, map(_value, row)))
+
+def _matching(table, column, key):
+    frame = table.frame()
+    if column in table.index_columns:
+        labels = np.array(sorted(table.labels(column, key)), dtype=np.int64)
+    else:
+        labels = frame.index[frame[column] == table.schema.key(column, key)].to_numpy()
+    metrics.rows_scanned(len(labels))
+    return frame, labels
+
+def iter_rows(table_name, column, key, columns=None, order_by=None, after=None, limit=None, offset=0, store=None):
+    # Rows where column == key as dicts, found through the hash index when there is one
+    table = (store or get_store()).table(table_name)
+    frame, labels = _matching(table, column, key)
+    yield from _rows(frame, _paginate(frame, labels, order_by, after, limit, offset, table.schema), columns)
+
+def iter_frame(df, columns=None, order_by=None, after=None, limit=None, offset=0, schema=None):
+    # The same paging over a result that is already a frame (e.g. a join)
+    yield from _rows(df, _paginate(df, df.index.to_numpy(), order_by, after, limit, offset, schema), columns)
+
+def page_frame(table_name, column, key, columns=None, order_by=None, after=None, limit=None, offset=0, store=None):
+    # One page as a frame, for printing
+    table = (store or get_store()).table(table_name)
+    if order_by is None and limit is None and not offset:
+        return table.lookup(column, key, columns)
+    frame, labels = _matching(table, column, key)
+    page = frame.loc[_paginate(frame, labels, order_by, after, limit, offset, table.schema)]
+    return page if columns is None else page[list(columns)]
+
+# ------ Range Queries ------
+# Answered from the sorted indexes: a binary search for each bound, then only the rows in between
+def students_born_between(start=None, end=None, columns=None, store=None):
+    # Dates are YYYY-MM-DD text, so their text order is their date order
+    store = store or get_store()
+    return store.range('students', 'DateOfBirth', start, end, columns)
+
+def enrollments_by_grade(low=None, high=None, year=None, inclusive='both', columns=None, store=None):
+    store = store or get_store()
+    table = store.table('enrollments').select({'Year': year} if year is not None else None)
+    fetch = None if columns is None else list(dict.fromkeys([*columns, 'Year']))
+    rows = table.range('Grade', low, high, fetch, inclusive)
+    if year is not None:
+        rows = rows[rows['Year'] == table.schema.key('Year', year)]
+    return rows if columns is None else rows[list(columns)]
+
+def top_students(course_id=None, n=10, semester=None, year=None, store=None):
+    store = store or get_store()
+    columns = ['StudentID', 'CourseID', 'Semester', 'Year', 'Grade']
+    if course_id is None and semester is None and year is None:
+        enrollments = store.top('enrollments', 'Grade', n, columns=columns)
+    else:
+        # One course is found through its hash index, only its rows are ranked
+        where = {column: value for column, value in (('CourseID', course_id), ('Semester', semester), ('Year', year))
+                 if value is not None}
+        enrollments = scan('enrollments', columns, where, store).dropna(subset=['Grade'])
+        enrollments = enrollments.sort_values('Grade', ascending=False, kind='stable').head(max(int(n), 0))
+    students = scan('students', ['StudentID', 'FirstName', 'LastName'],
+                    {'StudentID': enrollments['StudentID'].unique().tolist()}, store)
+    joined = hash_join(enrollments, students, 'StudentID')
+    return joined[['StudentID', 'FirstName', 'LastName', 'CourseID', 'Semester', 'Year', 'Grade']]
+
+# ------ Hash Join ------
+@metrics.timed('join')
+def hash_join(left, right, left_on, right_on=None, suffixes=('', '_right')):
+    # Inner join: the smaller side is hashed, the larger side probes it
+    right_on = right_on or left_on
+    left_keys, right_keys = left[left_on], right[right_on]
+    build_left = len(left) <= len(right)
+    build_keys, probe_keys = (left_keys, right_keys) if build_left else (right_keys, left_keys)
+
+    codes, _ = pd.factorize(pd.concat([build_keys.astype(object), probe_keys.astype(object)], ignore_index=True))
+    build_codes, probe_codes = codes[:len(build_keys)], codes[len(build_keys):]
+    size = codes.max() + 2 if len(codes) else 1
+    # Missing keys (code -1) never match
+    build_codes = np.where(build_codes < 0, size - 1, build_codes)
+    counts = np.bincount(build_codes, minlength=size)
+    counts[size - 1] = 0
+    order = np.argsort(build_codes, kind='stable')
+    starts = np.cumsum(counts) - counts
+
+    probe_codes = np.where(probe_codes < 0, size - 1, probe_codes)
+    matches = counts[probe_codes]
+    probe_positions = np.repeat(np.arange(len(probe_codes)), matches)
+    offsets = np.arange(len(probe_positions)) - np.repeat(np.cumsum(matches) - matches, matches)
+    build_positions = order[np.repeat(starts[probe_codes], matches) + offsets]
+
+    left_positions, right_positions = (build_positions, probe_positions) if build_left else (probe_positions, build_positions)
+    ordered = np.lexsort((right_positions, left_positions))
+    left_positions, right_positions = left_positions[ordered], right_positions[ordered]
+
+    left_part = left.iloc[left_positions].reset_index(drop=True)
+    right_part = right.iloc[right_positions].reset_index(drop=True)
+    if right_on == left_on:
+        right_part = right_part.drop(columns=[right_on])
+    overlap = set(left_part.columns) & set(right_part.columns)
+    left_part = left_part.rename(columns={column: column + suffixes[0] for column in overlap})
+    right_part = right_part.rename(columns={column: column + suffixes[1] for column in overlap})
+    return pd.concat([left_part, right_part], axis=1)
+
+# ------ Queries ------
+def students_in_course(course_id, columns=('StudentID', 'FirstName', 'LastName', 'Major'), store=None):
+    enrollments = scan('enrollments', ['StudentID', 'Semester', 'Year', 'Grade'], {'CourseID': course_id}, store)
+    student_columns = list(dict.fromkeys(['StudentID', *columns]))
+    students = scan('students', student_columns,
+                    {'StudentID': enrollments['StudentID'].unique().tolist()}, store)
+    joined = hash_join(enrollments, students, 'StudentID')
+    return joined[list(dict.fromkeys([*columns, 'Semester', 'Year', 'Grade']))]
+
+def course_counts_by_department(department=None, store=None):
+    where = {'Department': department} if department is not None else None
+    courses = scan('courses', ['CourseID', 'Department'], where, store)
+    enrollments = scan('enrollments', ['CourseID'], {'CourseID': courses['CourseID'].tolist()} if where else None, store)
+    # Enrollments are counted per course before the join, so only one row per course is probed
+    counts = enrollments['CourseID'].value_counts().rename('Enrolled').rename_axis('CourseID').reset_index()
+    joined = hash_join(courses, counts, 'CourseID')
+    result = courses.groupby('Department', observed=True).size().rename('Courses').to_frame()
+    result['Enrolled'] = joined.groupby('Department', observed=True)['Enrolled'].sum()
+    return result.fillna({'Enrolled': 0}).astype('Int64').reset_index()
+
+def weighted_grades(student_id=None, store=None):
+    where = {'StudentID': student_id} if student_id is not None else None
+    enrollments = scan('enrollments', ['StudentID', 'CourseID', 'Grade'], where, store).dropna(subset=['Grade'])
+    # Narrow the other tables only for one student, a full run joins everything anyway
+    course_filter = {'CourseID': enrollments['CourseID'].unique().tolist()} if where else None
+    courses = scan('courses', ['CourseID', 'Credits'], course_filter, store)
+    joined = hash_join(enrollments, courses, 'CourseID').dropna(subset=['Credits'])
+    joined['Points'] = joined['Grade'].astype(float) * joined['Credits'].astype(float)
+    totals = joined.groupby('StudentID', sort=False)[['Credits', 'Points']].sum()
+    totals['WeightedGrade'] = totals['Points'] / totals['Credits'].astype(float)
+    totals = totals.drop(columns=['Points']).reset_index()
+    students = scan('students', ['StudentID', 'FirstName', 'LastName'],
+                    {'StudentID': totals['StudentID'].tolist()} if where else None, store)
+    return hash_join(students, totals, 'StudentID')
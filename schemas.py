@@ -0,0 +1,121 @@
+import pandas as pd
+
+KEY = 'str'
+TEXT = 'str'
+CATEGORY = 'category'
+INTEGER = 'Int64'
+
+# ------ Table Schema ------
+class TableSchema:
+    def __init__(self, dtypes):
+        self.dtypes = dict(dtypes)
+        self.categories = [column for column, dtype in self.dtypes.items() if dtype == CATEGORY]
+
+    def read_dtypes(self, columns=None):
+        return {column: dtype for column, dtype in self.dtypes.items() if columns is None or column in columns}
+
+    def coerce(self, column, values, errors='raise'):
+        # values: a Series for this column, returned with the schema dtype
+        dtype = self.dtypes.get(column)
+        if dtype is None or str(values.dtype) == dtype:
+            return values
+        if dtype == INTEGER:
+            values = pd.to_numeric(values, errors=errors)
+            if errors == 'raise' and (values.dropna() % 1 != 0).any():
+                raise ValueError(f"{column} must be a whole number")
+            return values.where(values % 1 == 0).astype(INTEGER)
+        if dtype == CATEGORY:
+            return values.astype(CATEGORY)
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            # Whole numbers that picked up a float dtype from missing values: 912.0 -> '912'
+            values = values.astype(INTEGER)
+        return values.where(values.isna(), values.astype(str)).astype(dtype)
+
+    def apply(self, df, errors='raise'):
+        columns = [column for column in df.columns if column in self.dtypes and str(df[column].dtype) != self.dtypes[column]]
+        if not columns:
+            return df
+        df = df.copy()
+        for column in columns:
+            df[column] = self.coerce(column, df[column], errors)
+        return df
+
+    def key(self, column, value):
+        # A lookup value in the column's type, e.g. 20250001 -> '20250001' for a text ID
+        dtype = self.dtypes.get(column)
+        if dtype is None or pd.isna(value):
+            return value
+        if dtype == INTEGER:
+            try:
+                return int(value) if float(value) % 1 == 0 else value
+            except (TypeError, ValueError):
+                return value
+        return str(value)
+
+    def keys(self, column, values):
+        return [self.key(column, value) for value in values]
+
+    def concat(self, frames):
+        # Categorical columns share one category list so the result stays categorical
+        frames = list(frames)
+        for column in self.categories:
+            parts = [frame[column] for frame in frames if column in frame]
+            if len(parts) < 2 or not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+                continue
+            categories = parts[0].cat.categories
+            for part in parts[1:]:
+                categories = categories.union(part.cat.categories, sort=False)
+            frames = [
+                frame.assign(**{column: frame[column].cat.set_categories(categories)}) if column in frame else frame
+                for frame in frames
+            ]
+        return pd.concat(frames)
+
+    def extend(self, frame, column, values):
+        # New category values must be registered before they can be assigned
+        if column not in self.categories or not isinstance(frame[column].dtype, pd.CategoricalDtype):
+            return
+        missing = pd.Index(values.dropna().unique()).difference(frame[column].cat.categories)
+        if len(missing):
+            frame[column] = frame[column].cat.add_categories(missing)
+
+# Fixed key types, dictionary-encoded repeated text, nullable integers
+SCHEMAS = {
+    'departments': TableSchema({
+        'DepartmentID': KEY,
+        'DepartmentName': CATEGORY,
+    }),
+    'students': TableSchema({
+        'StudentID': KEY,
+        'FirstName': TEXT,
+        'LastName': TEXT,
+        'DateOfBirth': TEXT,
+        'Major': CATEGORY,
+        'Address': CATEGORY,
+        'Phone': TEXT,
+    }),
+    'courses': TableSchema({
+        'CourseID': KEY,
+        'CourseName': CATEGORY,
+        'Credits': INTEGER,
+        'Department': CATEGORY,
+    }),
+    'instructors': TableSchema({
+        'InstructorID': KEY,
+        'FirstName': TEXT,
+        'LastName': TEXT,
+        'Department': CATEGORY,
+        'Rank': CATEGORY,
+        'Email': TEXT,
+    }),
+    'enrollments': TableSchema({
+        'StudentID': KEY,
+        'CourseID': KEY,
+        'Semester': CATEGORY,
+        'Year': INTEGER,
+        'Grade': INTEGER,
+    }),
+}
+
+def get_schema(name):
+    return SCHEMAS.get(name, TableSchema({}))
@@ -0,0 +1,235 @@
+import io
+import os
+import csv
+import gzip
+import argparse
+import numpy as np
+import pandas as pd
+
+# Define file names and column headers
+FILES = {
+    'departments': 'Department.csv',
+    'students': 'Student.csv',
+    'courses': 'Course.csv',
+    'instructors': 'Instructor.csv',
+    'enrollments': 'Enrollment.csv'
+}
+
+# ------ CSV Backend ------
+class CsvBackend:
+    name = 'csv'
+    extension = '.csv'
+    appendable = True
+
+    def __init__(self, compression=None):
+        # gzip is only used for archived files, which are never appended to
+        self.compression = compression
+        if compression == 'gzip':
+            self.extension = '.csv.gz'
+            self.appendable = False
+
+    def _open(self, path, mode):
+        opener = gzip.open if self.compression == 'gzip' else open
+        return opener(path, mode + 't', encoding='utf-8-sig', newline='')
+
+    def path_for(self, path):
+        return os.path.splitext(path)[0] + self.extension
+
+    def archive_backend(self):
+        # Columnar formats are compressed already, CSV is gzipped
+        return CsvBackend(compression='gzip') if type(self) is CsvBackend else self
+
+    def read(self, path, columns=None, schema=None, size=None):
+        # size: the file's size when the caller looked, rows appended since then are left out
+        dtypes = schema.read_dtypes(columns) if schema is not None else None
+        source = path
+        if size is not None and self.appendable and os.path.getsize(path) > size:
+            with open(path, 'rb') as f:
+                source = io.BytesIO(f.read(size))
+        return pd.read_csv(source, usecols=columns, dtype=dtypes)
+
+    def ends_line(self, path, size):
+        # Whether the file's first size bytes end with a whole row, an append in progress leaves half of one
+        if size == 0:
+            return True
+        with open(path, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+
+    def columns(self, path):
+        with self._open(path, 'r') as f:
+            return next(csv.reader(f), [])
+
+    def write(self, df, path):
+        with self._open(path, 'w') as f:
+            df.to_csv(f, index=False, lineterminator='\n')
+
+    def append_data(self, df, path):
+        # Rows for the end of an existing file, without BOM or header
+        text = df.to_csv(index=False, header=False, lineterminator='\n')
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                text = '\n' + text
+        return text
+
+# ------ Columnar Backends ------
+def _require_pyarrow(backend):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"The {backend} backend needs pyarrow (pip install pyarrow)")
+
+def _typed_columns(df):
+    # A column mixing ints and text IDs is stored as text, the same way it reads back from CSV
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and df[column].dropna().map(type).nunique() > 1]
+    if not mixed:
+        return df
+    df = df.copy()
+    for column in mixed:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+class ParquetBackend(CsvBackend):
+    name = 'parquet'
+    extension = '.parquet'
+    appendable = False
+
+    def __init__(self, compression='zstd'):
+        _require_pyarrow(self.name)
+        self.compression = compression
+
+    def read(self, path, columns=None, schema=None, size=None):
+        df = pd.read_parquet(path, columns=columns)
+        return schema.apply(df) if schema is not None else df
+
+    def columns(self, path):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+
+    def write(self, df, path):
+        _typed_columns(df).to_parquet(path, index=False, compression=self.compression)
+
+class FeatherBackend(CsvBackend):
+    name = 'feather'
+    extension = '.feather'
+    appendable = False
+
+    def __init__(self, compression='zstd'):
+        _require_pyarrow(self.name)
+        self.compression = compression
+
+    def read(self, path, columns=None, schema=None, size=None):
+        df = pd.read_feather(path, columns=columns)
+        return schema.apply(df) if schema is not None else df
+
+    def columns(self, path):
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        with pa.memory_map(path) as source:
+            return ipc.open_file(source).schema.names
+
+    def write(self, df, path):
+        _typed_columns(df).reset_index(drop=True).to_feather(path, compression=self.compression)
+
+class NpzBackend(CsvBackend):
+    # NumPy only: one array per column, text stored as fixed-width unicode with a missing-value mask
+    name = 'npz'
+    extension = '.npz'
+    appendable = False
+
+    def __init__(self, compression=True):
+        self.compression = compression
+
+    def read(self, path, columns=None, schema=None, size=None):
+        with np.load(path, allow_pickle=False) as data:
+            names = data['__columns__'].tolist()
+            arrays = {}
+            for column in columns or names:
+                values = data[column]
+                if f"__na__{column}" in data.files:
+                    values = values.astype(object)
+                    values[data[f"__na__{column}"]] = None
+                arrays[column] = values
+        df = pd.DataFrame(arrays, columns=columns or names)
+        return schema.apply(df) if schema is not None else df
+
+    def columns(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            return data['__columns__'].tolist()
+
+    def write(self, df, path):
+        df = _typed_columns(df)
+        arrays = {'__columns__': np.array([str(column) for column in df.columns])}
+        for column in df.columns:
+            values = df[column]
+            missing = values.isna().to_numpy()
+            if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+                if missing.any() and isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+                    # Nullable integers keep their type, the gaps go in the mask
+                    arrays[column] = values.fillna(0).to_numpy(dtype=values.dtype.numpy_dtype)
+                    arrays[f"__na__{column}"] = missing
+                else:
+                    arrays[column] = values.to_numpy()
+                continue
+            arrays[column] = values.astype(object).where(~missing, '').astype(str).to_numpy(dtype=str)
+            if missing.any():
+                arrays[f"__na__{column}"] = missing
+        save = np.savez_compressed if self.compression else np.savez
+        with open(path, 'wb') as f:
+            save(f, **arrays)
+
+BACKENDS = {
+    'csv': CsvBackend,
+    'parquet': ParquetBackend,
+    'feather': FeatherBackend,
+    'npz': NpzBackend,
+}
+
+def get_backend(name='csv', **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage format {name}, use one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
+
+# ------ Dataset Converter ------
+def convert_dataset(source_dir, target_dir, source_format='csv', target_format='parquet', files=FILES, **options):
+    # Read through the table store so rows deleted by tombstone are left behind
+    from data_store import TableStore
+    store = TableStore({name: os.path.join(source_dir, filename) for name, filename in files.items()}, source_format)
+    target = get_backend(target_format, **options)
+    os.makedirs(target_dir, exist_ok=True)
+    converted = []
+    for name, filename in files.items():
+        # A partitioned table is written out as one file
+        source_path = store.table(name).path
+        if not store.exists(name):
+            print(f"Skipped {source_path}, the file does not exist!")
+            continue
+        target_path = os.path.join(target_dir, target.path_for(filename))
+        target.write(store.frame(name), target_path)
+        converted.append(target_path)
+        print(f"Created {target_path} Successfully :)")
+    return converted
+
+# ------ Main Implementation ------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the university tables between storage formats")
+    parser.add_argument('source_dir')
+    parser.add_argument('target_dir')
+    parser.add_argument('--from', dest='source_format', default='csv', choices=list(BACKENDS))
+    parser.add_argument('--to', dest='target_format', default='parquet', choices=list(BACKENDS))
+    parser.add_argument('--compression', default=None,
+                        help="parquet/feather codec (zstd, snappy, lz4, none); npz: none disables compression")
+    args = parser.parse_args(argv)
+
+    options = {}
+    if args.compression is not None:
+        if args.target_format == 'npz':
+            options['compression'] = args.compression != 'none'
+        elif args.target_format != 'csv':
+            options['compression'] = None if args.compression == 'none' else args.compression
+    convert_dataset(args.source_dir, args.target_dir, args.source_format, args.target_format, **options)
+
+if __name__ == "__main__":
+    main()
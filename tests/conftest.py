@@ -0,0 +1,40 @@
+import os
+import sys
+import shutil
+import importlib.util
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_store
+
+SAMPLE_DIR = os.path.join(ROOT, 'Buckup files')
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    # A copy of the sample tables, the scripts find them in the working directory
+    for file_name in data_store.FILES.values():
+        shutil.copy(os.path.join(SAMPLE_DIR, file_name), tmp_path / file_name)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    # The next test opens stores of its own
+    data_store._STORES.clear()
+
+@pytest.fixture
+def store(data_dir):
+    return data_store.get_store(data_store.FILES)
+
+def load_script(file_name):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(file_name)[0].replace(' ', '_'), os.path.join(ROOT, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def querying(data_dir):
+    return load_script('Data Querying.py')
+
+@pytest.fixture
+def retrieval(data_dir):
+    return load_script('Data Retrieval.py')
@@ -0,0 +1,42 @@
+import os
+import data_store
+
+def _expected(frame, course_id, semester, year):
+    grades = frame.loc[(frame['CourseID'] == course_id) & (frame['Semester'] == semester) & (frame['Year'] == year), 'Grade']
+    grades = grades.dropna().astype(float)
+    return len(grades), grades.mean(), grades.min(), grades.max()
+
+def _check(store, course_id, semester, year):
+    stats = store.stats('enrollments', 'grades', course_id, semester, year)
+    count, mean, low, high = _expected(store.frame('enrollments'), course_id, semester, year)
+    if not count:
+        assert stats is None
+        return
+    assert stats['count'] == count
+    assert abs(stats['mean'] - mean) < 1e-9
+    assert (stats['min'], stats['max']) == (low, high)
+
+def test_aggregates_follow_writes(store):
+    row = store.frame('enrollments').iloc[0]
+    group = (row['CourseID'], row['Semester'], int(row['Year']))
+    _check(store, *group)
+    store.insert('enrollments', [{'StudentID': '20250001', 'CourseID': group[0], 'Semester': group[1],
+                                  'Year': group[2], 'Grade': 100}])
+    _check(store, *group)
+    labels = store.labels('enrollments', 'CourseID', group[0])
+    store.update('enrollments', labels[:1], {'Grade': 0})
+    _check(store, *group)
+    # Removing the group's extremes makes the next read recompute them
+    frame = store.frame('enrollments')
+    store.delete('enrollments', [label for label in labels if frame.loc[label, 'Grade'] in (0, 100)])
+    _check(store, *group)
+
+def test_sidecar_answers_without_reading_the_table(store):
+    row = store.frame('enrollments').iloc[0]
+    group = (row['CourseID'], row['Semester'], int(row['Year']))
+    expected = store.stats('enrollments', 'grades', *group)
+    store.flush()
+    assert os.path.exists('Enrollment.csv' + data_store.AGGREGATE_SUFFIX)
+    fresh = data_store.TableStore({name: os.path.abspath(path) for name, path in data_store.FILES.items()})
+    assert fresh.stats('enrollments', 'grades', *group) == expected
+    assert fresh.tables['enrollments']._frame is None
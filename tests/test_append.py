@@ -0,0 +1,71 @@
+import os
+import glob
+import threading
+import pytest
+import data_store
+from transactions import FileLock
+
+COURSE = {'CourseID': 'C90001', 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_insert_appends_to_the_end_of_the_file(store, cached):
+    before = _read('Course.csv')
+    if cached:
+        store.frame('courses')
+    store.insert('courses', [COURSE, dict(COURSE, CourseID='C90002')])
+    after = _read('Course.csv')
+    assert after.startswith(before)
+    assert after[len(before):].decode('utf-8').splitlines()[-2:] == ['C90001,فيزياء,2,كلية العلوم', 'C90002,فيزياء,2,كلية العلوم']
+    assert len(store.labels('courses', 'CourseID', 'C90002')) == 1
+    assert data_store.TableStore(data_store.FILES).has_key('courses', 'CourseID', 'C90001')
+
+def test_insert_writes_only_the_new_rows_in_place(store):
+    before = os.stat('Course.csv')
+    store.insert('courses', [COURSE])
+    after = os.stat('Course.csv')
+    assert after.st_ino == before.st_ino
+    assert after.st_size - before.st_size == len('C90001,فيزياء,2,كلية العلوم\n'.encode('utf-8'))
+    assert glob.glob('*.txn-tmp') == []
+
+def test_reads_stop_at_the_size_they_saw(data_dir):
+    backend = data_store.get_backend('csv')
+    count = len(backend.read('Course.csv'))
+    size = os.path.getsize('Course.csv')
+    with open('Course.csv', 'ab') as f:
+        f.write('C90001,فيز'.encode('utf-8'))
+    assert len(backend.read('Course.csv', size=size)) == count
+    assert not backend.ends_line('Course.csv', os.path.getsize('Course.csv'))
+
+def test_readers_wait_for_an_append_in_progress(data_dir):
+    # A writer holds the lock and has written half a row
+    lock = FileLock('.')
+    lock.acquire()
+    with open('Course.csv', 'ab') as f:
+        f.write('C90001,فيز'.encode('utf-8'))
+    frames = []
+    reader = threading.Thread(target=lambda: frames.append(data_store.TableStore(data_store.FILES).frame('courses')))
+    reader.start()
+    reader.join(0.5)
+    assert not frames
+    with open('Course.csv', 'ab') as f:
+        f.write('ياء,2,كلية العلوم\n'.encode('utf-8'))
+    lock.release()
+    reader.join()
+    assert frames[0]['CourseID'].eq('C90001').sum() == 1
+
+def test_appends_keep_the_tombstones_without_hashing(store, monkeypatch):
+    monkeypatch.setattr(data_store, 'TOMBSTONE_MIN_ROWS', 0)
+    store.delete('courses', store.labels('courses', 'CourseID', store.frame('courses')['CourseID'].iloc[0]))
+    deleted = set(store.table('courses').tombstones())
+    hashed = []
+    content_hash = data_store._content_hash
+    monkeypatch.setattr(data_store, '_content_hash', lambda *args: hashed.append(args) or content_hash(*args))
+    store.insert('courses', [COURSE])
+    assert not hashed
+    fresh = data_store.TableStore(data_store.FILES)
+    assert fresh.table('courses').tombstones() == deleted
+    assert fresh.has_key('courses', 'CourseID', 'C90001')
@@ -0,0 +1,45 @@
+import os
+import pytest
+import backups
+
+def _frames(store, names=('courses', 'instructors', 'enrollments')):
+    return {name: store.frame(name).sort_values(list(store.frame(name).columns)).reset_index(drop=True) for name in names}
+
+def test_restore_brings_back_the_snapshot(store):
+    before = _frames(store)
+    snapshot = backups.backup(store=store)['id']
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    store.update('courses', store.labels('courses', 'CourseID', 'C0001'), {'Credits': 1})
+    store.delete('enrollments', list(store.frame('enrollments').index[:10]))
+    backups.restore(snapshot, store=store)
+    after = _frames(store)
+    for name, frame in before.items():
+        assert after[name].equals(frame), name
+
+def test_backups_only_read_changed_files(store):
+    assert backups.backup(store=store)['files_read'] == len(store.tables)
+    assert backups.backup(store=store)['files_read'] == 0
+    store.update('courses', store.labels('courses', 'CourseID', 'C0001'), {'Credits': 1})
+    totals = backups.backup(store=store)
+    assert totals['files_read'] == 1 and totals['bytes_written'] < os.path.getsize('Course.csv')
+
+def test_restore_of_one_table_leaves_the_others(store):
+    snapshot = backups.backup(store=store)['id']
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    store.delete('courses', store.labels('courses', 'CourseID', 'C0001'))
+    backups.restore(snapshot, ['courses'], store=store)
+    assert store.has_key('courses', 'CourseID', 'C0001')
+    assert not store.has_key('instructors', 'InstructorID', 'I0002')
+
+def test_restore_switches_the_layout_back(store):
+    before = _frames(store, ['enrollments'])['enrollments']
+    snapshot = backups.backup(store=store)['id']
+    store.partition('enrollments')
+    backups.restore(snapshot, store=store)
+    assert os.path.exists('Enrollment.csv') and not os.path.exists('Enrollment.partitions')
+    assert _frames(store, ['enrollments'])['enrollments'].equals(before)
+
+def test_unknown_snapshot_is_refused(store):
+    backups.backup(store=store)
+    with pytest.raises(ValueError):
+        backups.restore('19990101-000000', store=store)
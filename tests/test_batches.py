@@ -0,0 +1,53 @@
+def _course(course_id, credits=3):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': credits, 'Department': 'كلية العلوم'}
+
+def _failed(report):
+    return [error['key'] for error in report['errors']]
+
+def test_add_batch_inserts_the_valid_rows_and_reports_the_rest(querying, store):
+    report = querying.add_courses([_course('C90001'), _course('C90002', credits=9), _course('C0001'),
+                                   _course('C90003'), _course('C90003')])
+    assert report['done'] == 2
+    assert _failed(report) == ['C90002', 'C0001', 'C90003']
+    assert store.has_key('courses', 'CourseID', 'C90001')
+    assert not store.has_key('courses', 'CourseID', 'C90002')
+
+def test_update_batch_may_swap_ids(querying, store):
+    first = store.lookup('courses', 'CourseID', 'C0001').iloc[0]['CourseName']
+    report = querying.update_courses({'C0001': _course('C0002'), 'C0002': _course('C0001', credits=1), 'C99999': _course('C99999')})
+    assert report['done'] == 2 and _failed(report) == ['C99999']
+    assert store.lookup('courses', 'CourseID', 'C0001').iloc[0]['Credits'] == 1
+    assert len(store.labels('courses', 'CourseID', 'C0002')) == 1
+    assert first != 'فيزياء'
+
+def test_delete_batch_cascades_to_enrollments(querying, store):
+    course_id = store.frame('enrollments')['CourseID'].iloc[0]
+    report = querying.delete_courses([course_id, 'C99999'])
+    assert report['done'] == 1 and _failed(report) == ['C99999']
+    assert not store.has_key('courses', 'CourseID', course_id)
+    assert store.labels('enrollments', 'CourseID', course_id) == []
+
+def _student(student_id, dob='2000-01-01'):
+    return {'StudentID': student_id, 'FirstName': 'محمد', 'LastName': 'علي', 'DateOfBirth': dob, 'Major': 'كلية الهندسة'}
+
+def test_rejected_rows_do_not_free_their_ids(querying, store):
+    report = querying.update_students({20250001: _student(20250002), 20250002: _student(20250003, dob='2000-13-01')})
+    assert report['done'] == 0 and _failed(report) == [20250001, 20250002]
+    assert len(store.labels('students', 'StudentID', 20250002)) == 1
+    assert len(store.labels('students', 'StudentID', 20250001)) == 1
+
+def test_rejected_rows_do_not_count_as_repeated_ids(querying, store):
+    report = querying.update_courses({'C0001': _course('C90001', credits=9), 'C0002': _course('C90001')})
+    assert report['done'] == 1 and _failed(report) == ['C0001']
+    assert store.has_key('courses', 'CourseID', 'C90001')
+
+def _instructor(instructor_id, email):
+    return {'InstructorID': instructor_id, 'FirstName': 'أحمد', 'LastName': 'محمود', 'Department': 'كلية الهندسة', 'Email': email}
+
+def test_update_instructors_checks_emails(querying, store):
+    report = querying.update_instructors({'I0001': _instructor('I0001', 'nzyh63@example.net'),
+                                          'I0002': _instructor('I0002', 'nsht57@example.org'),
+                                          'I0003': _instructor('I0003', 'new@example.org')})
+    assert report['done'] == 2 and _failed(report) == ['I0002']
+    assert report['errors'][0]['error'] == "Already exists Email"
+    assert store.lookup('instructors', 'InstructorID', 'I0002').iloc[0]['Email'] == 'al-sfwnbnn@example.net'
@@ -0,0 +1,33 @@
+import pytest
+from conftest import load_script
+
+@pytest.fixture
+def benchmark():
+    return load_script('Data Benchmark.py')
+
+def _result(op, p50, p95, rss=None):
+    return {'op': op, 'size': 100, 'mode': 'warm', 'latency_ms': {'p50': p50, 'p95': p95}, 'peak_rss_mb': rss}
+
+def test_compare_flags_only_real_regressions(benchmark):
+    baseline = {'results': [_result('retrieve_student', 10.0, 12.0, 100.0), _result('add_courses', 0.2, 0.3)]}
+    current = {'results': [_result('retrieve_student', 15.0, 12.5, 100.0), _result('add_courses', 0.5, 0.6)]}
+    table = benchmark.compare(baseline, current)
+    flagged = table[table['regression']]
+    # add_courses grew by more than 20% but stays under the noise floor
+    assert flagged[['op', 'metric']].values.tolist() == [['retrieve_student', 'p50 ms']]
+
+def test_small_run_measures_every_operation(benchmark, tmp_path):
+    report = benchmark.run_benchmarks([200], ['retrieve_student', 'add_courses'], repeat=1, cold_runs=1,
+                                      fixtures=str(tmp_path), workers=2)
+    records = report['results']
+    assert records[0]['op'] == 'generate' and records[0]['errors'] == []
+    assert (tmp_path / '200' / 'generation.json').exists()
+    measured = [record for record in records[1:] if record['op'] in ('retrieve_student', 'add_courses')]
+    assert {record['op'] for record in measured} == {'retrieve_student', 'add_courses'}
+    assert all(record['errors'] == [] and record['latency_ms'] for record in measured)
+
+def test_failed_generation_is_not_kept(benchmark, tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, '_spawn', lambda spec, storage: {'samples': [], 'error': 'ValueError: failed'})
+    record = benchmark.build_fixture(str(tmp_path), 200, 1, 1, 'csv')
+    assert record['errors'] == ['ValueError: failed']
+    assert not (tmp_path / '200' / 'generation.json').exists()
@@ -0,0 +1,97 @@
+import os
+import pytest
+import data_store
+from changes import ChangeLog, ChangeConsumer
+from transactions import WriteAheadLog
+
+def _events(after=0):
+    return list(ChangeLog('.').read(after))
+
+def _student(querying, student_id):
+    return querying._store().lookup('students', 'StudentID', student_id).iloc[0].to_dict()
+
+def test_update_student_emits_one_student_event(querying):
+    data = _student(querying, '20250002')
+    data['Address'] = 'سبها'
+    querying.update_student('20250002', data)
+    events = [event for event in _events() if event['table'] == 'students']
+    assert [event['op'] for event in events] == ['update']
+    assert events[0]['key'] == {'StudentID': '20250002'}
+    assert events[0]['before']['Address'] == 'البيضاء'
+    assert events[0]['after']['Address'] == 'سبها'
+
+def test_batch_update_emits_parent_and_cascade_events(querying):
+    data = _student(querying, '20250001')
+    enrolled = len(querying._store().labels('enrollments', 'StudentID', '20250001'))
+    data['StudentID'] = '20299999'
+    querying.update_students({'20250001': data})
+    events = _events()
+    students = [event for event in events if event['table'] == 'students']
+    assert [(event['op'], event['after']['StudentID']) for event in students] == [('update', '20299999')]
+    cascaded = [event for event in events if event['table'] == 'enrollments']
+    assert len(cascaded) == enrolled > 0
+    assert all(event['before']['StudentID'] == '20250001' and event['after']['StudentID'] == '20299999' for event in cascaded)
+    # The cascade commits with the parent row
+    assert len({event['txn'] for event in events}) == 1
+
+def test_delete_cascade_and_sequence_numbers(querying):
+    enrolled = len(querying._store().labels('enrollments', 'StudentID', '20250001'))
+    querying.delete_student('20250001')
+    events = _events()
+    assert [event['seq'] for event in events] == list(range(1, len(events) + 1))
+    assert sorted(event['table'] for event in events) == ['enrollments'] * enrolled + ['students']
+    assert all(event['op'] == 'delete' and event['after'] is None for event in events)
+
+def test_consumer_resumes_from_its_checkpoint(querying):
+    for student_id in ('20250002', '20250003', '20250004'):
+        querying.delete_student(student_id)
+    consumer = ChangeConsumer('reports', tables=['students'])
+    first = consumer.poll(limit=1)
+    consumer.commit()
+    # A consumer that stops before committing reads the same events again
+    ChangeConsumer('reports', tables=['students']).poll()
+    resumed = ChangeConsumer('reports', tables=['students'])
+    assert resumed.position == first[0]['seq']
+    assert [event['key']['StudentID'] for event in first + resumed.poll()] == ['20250002', '20250003', '20250004']
+
+def test_rolled_back_changes_leave_no_events(querying, store):
+    try:
+        with store.transaction():
+            store.delete('students', store.labels('students', 'StudentID', '20250002'))
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert _events() == []
+    assert store.has_key('students', 'StudentID', '20250002')
+
+def _crash(*args, **kwargs):
+    raise KeyboardInterrupt
+
+def test_events_of_a_replayed_transaction_are_logged_once(store, monkeypatch):
+    with monkeypatch.context() as patched, pytest.raises(KeyboardInterrupt):
+        patched.setattr(WriteAheadLog, 'apply', _crash)
+        store.delete('students', store.labels('students', 'StudentID', '20250002'))
+    assert _events() == []
+    data_store.TableStore({name: os.path.abspath(path) for name, path in data_store.FILES.items()})
+    assert [event['key'] for event in _events()] == [{'StudentID': '20250002'}]
+
+def test_replaying_the_change_log_append_is_idempotent(store):
+    store.delete('students', store.labels('students', 'StudentID', '20250002'))
+    log = ChangeLog('.')
+    size = os.path.getsize(log.path)
+    op = log.append_op('replayed', [{'table': 'students', 'op': 'reset', 'key': None, 'before': None, 'after': None}])
+    store.wal.apply([op])
+    store.wal.apply([op])
+    assert os.path.getsize(log.path) == size + len(op['data'].encode('utf-8'))
+    assert [event['seq'] for event in log.read()] == [1, 2]
+
+def test_partition_move_logs_one_update(store):
+    store.partition('enrollments')
+    after = ChangeLog('.').last_sequence()
+    enrollments = store.frame('enrollments')
+    label = enrollments.index[0]
+    year = enrollments.loc[label, 'Year']
+    store.update('enrollments', [label], {'Year': 2031})
+    # One logical update, not a delete and an insert
+    events = _events(after)
+    assert [(event['op'], event['before']['Year'], event['after']['Year']) for event in events] == [('update', year, 2031)]
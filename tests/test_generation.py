@@ -0,0 +1,85 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import load_script
+
+ARGS = ['--vectorized', '--students', '300', '--courses', '40', '--instructors', '60', '--seed', '7']
+
+@pytest.fixture
+def generated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generation = load_script('Data generation.py')
+    generation.main(ARGS)
+    return {name: pd.read_csv(tmp_path / file_name, encoding='utf-8-sig', dtype=str)
+            for name, file_name in generation.FILES.items()}
+
+def test_vectorized_tables_are_valid(generated):
+    students, courses = generated['students'], generated['courses']
+    instructors, enrollments = generated['instructors'], generated['enrollments']
+    assert len(courses) == 40 and len(instructors) == 60
+    assert 0 < len(students) <= 300
+    for table, key in [(students, 'StudentID'), (courses, 'CourseID'), (instructors, 'InstructorID')]:
+        assert table[key].is_unique
+    assert instructors['Email'].is_unique
+    assert enrollments['StudentID'].isin(students['StudentID']).all()
+    assert enrollments['CourseID'].isin(courses['CourseID']).all()
+    assert courses['Credits'].astype(int).between(1, 4).all()
+    grades = pd.to_numeric(enrollments['Grade'])
+    assert grades.between(0, 100).all()
+
+def test_vectorized_students_are_of_age(generated):
+    dob = pd.to_datetime(generated['students']['DateOfBirth'])
+    today = pd.Timestamp(load_script('Data generation.py').REFERENCE_DATE)
+    assert (dob <= today - pd.DateOffset(years=17)).all()
+    assert (dob > today - pd.DateOffset(years=26)).all()
+
+def test_ages_follow_the_reference_date(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    load_script('Data generation.py').main(ARGS + ['--reference-date', '2040-01-01'])
+    dob = pd.to_datetime(pd.read_csv('Student.csv', encoding='utf-8-sig', dtype=str)['DateOfBirth'])
+    assert (dob <= pd.Timestamp('2023-01-01')).all()
+    assert (dob > pd.Timestamp('2014-01-01')).all()
+
+def test_emails_are_unique_across_shards():
+    generation = load_script('Data generation.py')
+    # 'a' with ordinal 11 and 'a1' with ordinal 1 used to make the same address
+    pools = {'first_names': np.array(['x']), 'last_names': np.array(['y']),
+             'user_names': np.array(['a', 'a1']), 'domains': np.array(['example.org'])}
+    emails = pd.concat([generation.generate_instructors_vectorized(100, np.array(['d']), pools, np.random.default_rng(shard), start)['Email']
+                        for shard, start in enumerate(range(0, 300, 100))])
+    assert emails.is_unique
+
+def test_same_seed_gives_the_same_files(generated, tmp_path, monkeypatch):
+    other = tmp_path / 'other'
+    other.mkdir()
+    monkeypatch.chdir(other)
+    load_script('Data generation.py').main(ARGS)
+    for file_name in ['Student.csv', 'Course.csv', 'Instructor.csv', 'Enrollment.csv']:
+        assert (other / file_name).read_bytes() == (tmp_path / file_name).read_bytes()
+
+def test_shards_do_not_depend_on_the_worker_count(tmp_path, monkeypatch):
+    generation = load_script('Data generation.py')
+    # The pool pickles the shard functions by module name
+    monkeypatch.setitem(sys.modules, generation.__name__, generation)
+    monkeypatch.setattr(generation, 'SHARD_ROWS', 25)
+    files = {}
+    for workers in ['1', '2']:
+        directory = tmp_path / workers
+        directory.mkdir()
+        monkeypatch.chdir(directory)
+        generation.main(ARGS[1:] + ['--workers', workers])
+        files[workers] = {file_name: (directory / file_name).read_bytes() for file_name in generation.FILES.values()}
+    assert files['1'] == files['2']
+
+def test_streamed_file_holds_the_parts_in_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for extra in [[], ['--keep-parts']]:
+        generation = load_script('Data generation.py')
+        monkeypatch.setattr(generation, 'SHARD_ROWS', 25)
+        generation.main(ARGS + extra)
+    streamed = pd.read_csv('Student.csv', encoding='utf-8-sig', dtype=str)
+    parts = sorted((tmp_path / 'Student.parts').iterdir())
+    assert len(parts) == 12
+    kept = pd.concat([pd.read_csv(part, encoding='utf-8-sig', dtype=str) for part in parts], ignore_index=True)
+    pd.testing.assert_frame_equal(streamed, kept)
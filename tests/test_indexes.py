@@ -0,0 +1,35 @@
+import os
+import pandas as pd
+import data_store
+
+def _entries(index):
+    return {key: sorted(labels) for key, labels in index.entries.items() if labels}
+
+def test_lookups_match_a_scan(store):
+    frame = store.frame('courses')
+    department = frame['Department'].iloc[0]
+    assert sorted(store.labels('courses', 'Department', department)) == sorted(frame.index[frame['Department'] == department])
+    assert store.has_key('courses', 'CourseID', 'C0001')
+    assert not store.has_key('courses', 'CourseID', 'C99999')
+
+def test_indexes_follow_changes(store):
+    store.update('courses', store.labels('courses', 'CourseID', 'C0002'), {'Department': 'كلية العلوم'})
+    store.delete('courses', store.labels('courses', 'CourseID', 'C0003'))
+    store.insert('courses', [{'CourseID': 'C90001', 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}])
+    frame = store.frame('courses')
+    for column in ('CourseID', 'Department'):
+        assert _entries(store.table('courses').index(column)) == _entries(data_store.HashIndex.build(column, frame))
+    assert store.labels('courses', 'CourseID', 'C0003') == []
+    assert len(store.labels('courses', 'CourseID', 'C90001')) == 1
+
+def test_sidecar_is_only_used_for_the_file_it_was_built_from(store):
+    store.table('instructors').indexes()
+    store.flush()
+    assert os.path.exists('Instructor.csv' + data_store.INDEX_SUFFIX)
+    table = data_store.TableStore(data_store.FILES).table('instructors')
+    table.frame()
+    assert table._load_indexes() is not None
+    pd.read_csv('Instructor.csv').head(5).to_csv('Instructor.csv', index=False, encoding='utf-8-sig')
+    table.frame()
+    assert table._load_indexes() is None
+    assert len(table.index('InstructorID')) == 5
@@ -0,0 +1,19 @@
+def _enrollment(student_id, course_id):
+    return {'StudentID': student_id, 'CourseID': course_id, 'Semester': 'الفصل الأول', 'Year': 2023, 'Grade': 80}
+
+def test_enrollments_need_existing_keys(querying, store):
+    count = len(store.frame('enrollments'))
+    querying.add_enrollment(_enrollment('20299999', 'C0001'))
+    report = querying.add_enrollments([_enrollment('20250001', 'C99999'), _enrollment('20250001', 'C0001')])
+    assert report['done'] == 1 and [error['key'] for error in report['errors']] == [0]
+    assert len(store.frame('enrollments')) == count + 1
+
+def test_key_sets_follow_writes(querying, store):
+    table = store.table('courses')
+    assert 'C90001' not in table.key_set('CourseID')
+    querying.add_courses([{'CourseID': 'C90001', 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}])
+    assert 'C90001' in table.key_set('CourseID')
+    querying.add_enrollment(_enrollment('20250001', 'C90001'))
+    assert store.has_key('enrollments', 'CourseID', 'C90001')
+    querying.delete_courses(['C90001'])
+    assert 'C90001' not in table.key_set('CourseID')
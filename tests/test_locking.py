@@ -0,0 +1,56 @@
+import os
+import threading
+import pytest
+import data_store
+from transactions import FileLock
+
+def _fresh():
+    # Another process opening the same files
+    return data_store.TableStore({name: os.path.abspath(file_name) for name, file_name in data_store.FILES.items()})
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def _free(exclusive):
+    lock = FileLock('.')
+    if not lock.acquire(exclusive=exclusive, blocking=False):
+        return False
+    lock.release()
+    return True
+
+def test_writer_lock_keeps_everyone_else_out(store):
+    with store.transaction():
+        assert not _free(exclusive=True)
+        assert not _free(exclusive=False)
+    assert _free(exclusive=True)
+
+def test_read_lock_keeps_writers_out(store):
+    with store.read_lock():
+        assert _free(exclusive=False)
+        assert not _free(exclusive=True)
+        with pytest.raises(RuntimeError):
+            store.insert('courses', [_course('C90001')])
+    assert not store.has_key('courses', 'CourseID', 'C90001')
+
+def test_stores_of_other_processes_do_not_lose_writes(store):
+    count = len(store.frame('courses'))
+    other = _fresh()
+    other.insert('courses', [_course('C90001')])
+    store.insert('courses', [_course('C90002')])
+    fresh = _fresh()
+    assert len(fresh.frame('courses')) == count + 2
+    assert fresh.has_key('courses', 'CourseID', 'C90001') and fresh.has_key('courses', 'CourseID', 'C90002')
+
+def test_concurrent_writers_are_serialized(data_dir):
+    count = len(_fresh().frame('courses'))
+    def write(worker):
+        writer = _fresh()
+        for number in range(5):
+            writer.insert('courses', [_course(f"C9{worker}00{number}")])
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    frame = _fresh().frame('courses')
+    assert len(frame) == count + 20 and frame['CourseID'].is_unique
@@ -0,0 +1,40 @@
+import json
+import pytest
+import metrics
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def test_disabled_metrics_count_nothing(querying):
+    metrics.reset()
+    querying.add_course(_course('C90001'))
+    assert metrics.snapshot()['operations'] == {}
+
+def test_operations_phases_and_files_are_counted(querying, retrieval, enabled):
+    querying.add_course(_course('C90001'))
+    querying.add_course(_course('C90001'))
+    retrieval.retrieve_instructor('I0002')
+    data = metrics.snapshot()
+    assert data['operations']['add_course']['calls'] == 2
+    assert data['operations']['retrieve_instructor']['calls'] == 1
+    assert data['rows']['retrieve_instructor']['returned'] == 1
+    assert {'operation': 'add_course', 'phase': 'validate'} in [{k: item[k] for k in ('operation', 'phase')} for item in data['phases']]
+    written = [item for item in data['files'] if item['operation'] == 'add_course' and item['file'] == 'Course.csv']
+    assert written and written[0]['written'] > 0
+
+def test_dump_writes_json_and_prometheus(querying, enabled, tmp_path):
+    querying.add_course(_course('C90001'))
+    metrics.dump(str(tmp_path / 'metrics.json'))
+    metrics.dump(str(tmp_path / 'metrics.prom'))
+    with open(tmp_path / 'metrics.json', encoding='utf-8') as f:
+        assert json.load(f)['operations']['add_course']['calls'] == 1
+    with open(tmp_path / 'metrics.prom', encoding='utf-8') as f:
+        assert 'university_operation_calls_total{operation="add_course"} 1' in f.read()
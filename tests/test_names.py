@@ -0,0 +1,30 @@
+import os
+import data_store
+from names import normalize_name, name_tokens
+
+def _instructor(instructor_id, first, last):
+    return {'InstructorID': instructor_id, 'FirstName': first, 'LastName': last, 'Department': 'كلية العلوم',
+            'Rank': 'محاضر', 'Email': f"{instructor_id.lower()}@example.net"}
+
+def test_spelling_variants_normalize_the_same():
+    assert normalize_name('أحمد') == normalize_name('احمد') == normalize_name('إحمد')
+    assert normalize_name('فاطمة') == normalize_name('فاطمه')
+    assert normalize_name('مُحَمَّد') == normalize_name('محمد')
+    assert name_tokens('آل الشيخ') == name_tokens('الشيخ')
+
+def test_search_finds_variants_and_follows_writes(store):
+    store.insert('instructors', [_instructor('I90001', 'أسامة', 'آل زيدان')])
+    found = store.search('instructors', 'اسامه زيدان', limit=3)
+    assert found['InstructorID'].iloc[0] == 'I90001'
+    assert found['Score'].is_monotonic_decreasing
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I90001'))
+    found = store.search('instructors', 'اسامه زيدان', limit=3)
+    assert 'I90001' not in found['InstructorID'].tolist()
+
+def test_sidecar_is_reused_by_a_fresh_store(store):
+    name = store.frame('students')['FirstName'].iloc[0]
+    expected = store.search('students', name, limit=5)
+    store.flush()
+    assert os.path.exists(store.table('students').names_path)
+    fresh = data_store.TableStore({table: os.path.abspath(path) for table, path in data_store.FILES.items()})
+    assert fresh.search('students', name, limit=5)['StudentID'].tolist() == expected['StudentID'].tolist()
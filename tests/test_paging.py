@@ -0,0 +1,31 @@
+import pytest
+import queries
+
+def _course_id(store):
+    counts = store.frame('enrollments')['CourseID'].value_counts()
+    return counts.index[0]
+
+def test_keyset_pages_cover_every_row_once(store):
+    course_id = _course_id(store)
+    order = ['Year', 'StudentID']
+    everything = list(queries.iter_rows('enrollments', 'CourseID', course_id, order_by=order, store=store))
+    pages, after = [], None
+    while True:
+        page = list(queries.iter_rows('enrollments', 'CourseID', course_id, order_by=order, after=after, limit=2, store=store))
+        if not page:
+            break
+        pages.extend(page)
+        after = [page[-1]['Year'], page[-1]['StudentID']]
+    assert pages == everything
+    assert [(row['Year'], row['StudentID']) for row in everything] == sorted((row['Year'], row['StudentID']) for row in everything)
+
+def test_limit_and_offset_slice_the_rows(store):
+    course_id = _course_id(store)
+    rows = list(queries.iter_rows('enrollments', 'CourseID', course_id, store=store))
+    assert list(queries.iter_rows('enrollments', 'CourseID', course_id, limit=2, offset=1, store=store)) == rows[1:3]
+    page = queries.page_frame('enrollments', 'CourseID', course_id, ['StudentID'], limit=1, store=store)
+    assert page['StudentID'].tolist() == [rows[0]['StudentID']]
+
+def test_after_needs_order_by(store):
+    with pytest.raises(ValueError):
+        list(queries.iter_rows('enrollments', 'CourseID', _course_id(store), after=2020, store=store))
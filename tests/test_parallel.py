@@ -0,0 +1,8 @@
+from multiprocessing import Pool
+from parallel import ordered_results
+
+def test_results_keep_the_task_order():
+    tasks = [5, -3, 8, -1, 0, 7, -9]
+    assert list(ordered_results(abs, tasks, None, 2)) == [5, 3, 8, 1, 0, 7, 9]
+    with Pool(2) as pool:
+        assert list(ordered_results(abs, tasks, pool, 2)) == [5, 3, 8, 1, 0, 7, 9]
@@ -0,0 +1,56 @@
+import os
+import pytest
+import data_store
+
+def _sorted(frame):
+    return frame.sort_values(['StudentID', 'CourseID', 'Semester', 'Year']).reset_index(drop=True)
+
+def test_partitioned_layout_holds_the_same_rows(store):
+    flat = store.frame('enrollments').copy()
+    assert store.partition('enrollments')
+    assert os.path.exists(store.table('enrollments').manifest_path) and not os.path.exists('Enrollment.csv')
+    assert _sorted(store.frame('enrollments')).equals(_sorted(flat))
+    year = int(flat['Year'].iloc[0])
+    expected = flat[flat['Year'] == year]
+    assert len(store.table('enrollments').select({'Year': year}).frame()) == len(expected)
+    assert store.unpartition('enrollments')
+    assert _sorted(store.frame('enrollments')).equals(_sorted(flat))
+
+def test_archived_partitions_are_read_only(store):
+    store.partition('enrollments')
+    archived = store.archive(2022)['enrollments']
+    assert archived and all(key[0] < 2022 for key in archived)
+    labels = store.frame('enrollments').query('Year < 2022').index[:1]
+    with pytest.raises(ValueError):
+        store.update('enrollments', labels, {'Grade': 50})
+    store.restore(2020)
+    store.restore(2021)
+    store.update('enrollments', labels, {'Grade': 50})
+    assert store.frame('enrollments').loc[labels[0], 'Grade'] == 50
+
+def test_cascade_into_an_archived_partition_is_reported(querying, store, capsys):
+    store.partition('enrollments')
+    store.archive(2100)
+    querying.delete_student('20250001')
+    assert capsys.readouterr().out.startswith("Error : The partition")
+    # Nothing was deleted, the student and the enrollments stay together
+    assert store.has_key('students', 'StudentID', '20250001')
+    assert store.labels('enrollments', 'StudentID', '20250001')
+
+def test_partitioned_index_counts_distinct_keys(store):
+    flat = len(store.table('enrollments').index('StudentID'))
+    store.partition('enrollments')
+    assert len(store.table('enrollments').index('StudentID')) == flat
+
+def test_update_moves_a_row_to_its_new_partition(store):
+    store.partition('enrollments')
+    enrollments = store.frame('enrollments')
+    label = enrollments.index[0]
+    key = enrollments.loc[label, ['StudentID', 'CourseID', 'Semester', 'Year']].tolist()
+    store.update('enrollments', [label], {'Year': 2031, 'Grade': 64})
+    table = store.table('enrollments')
+    moved = table.select({'Year': 2031}).lookup('StudentID', key[0])
+    assert moved[['CourseID', 'Semester', 'Grade']].values.tolist() == [[key[1], key[2], 64]]
+    assert table.select({'Year': key[3]}).lookup('StudentID', key[0]).query('CourseID == @key[1]').empty
+    reopened = data_store.TableStore({name: store.table(name).path for name in store.tables})
+    assert len(reopened.frame('enrollments')) == len(enrollments)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import queries
+
+def _sorted(df):
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+def test_hash_join_matches_merge():
+    left = pd.DataFrame({'Key': ['a', 'b', 'b', None, 'c'], 'Left': range(5)})
+    right = pd.DataFrame({'Key': ['b', 'a', 'b', None, 'd'], 'Right': range(5)})
+    joined = queries.hash_join(left, right, 'Key')
+    expected = left.dropna().merge(right.dropna(), on='Key')
+    pd.testing.assert_frame_equal(_sorted(joined), _sorted(expected))
+
+def test_scan_pushes_filters_down(store):
+    courses = store.frame('courses')
+    department = courses['Department'].iloc[0]
+    scanned = queries.scan('courses', ['CourseID'], {'Department': department}, store)
+    assert sorted(scanned['CourseID']) == sorted(courses.loc[courses['Department'] == department, 'CourseID'])
+    keys = courses['CourseID'].iloc[:3].tolist()
+    assert sorted(queries.scan('courses', ['CourseID'], {'CourseID': keys}, store)['CourseID']) == sorted(keys)
+
+def test_roster_matches_merge(store):
+    enrollments = store.frame('enrollments')
+    course_id = enrollments['CourseID'].iloc[0]
+    roster = queries.students_in_course(course_id, store=store)
+    expected = enrollments[enrollments['CourseID'] == course_id].merge(store.frame('students'), on='StudentID')
+    assert len(roster) == len(expected)
+    assert sorted(roster['StudentID']) == sorted(expected['StudentID'])
+
+def test_weighted_grades_match_merge(store):
+    student_id = store.frame('enrollments')['StudentID'].iloc[0]
+    result = queries.weighted_grades(student_id, store=store)
+    joined = store.frame('enrollments').merge(store.frame('courses'), on='CourseID')
+    joined = joined[joined['StudentID'] == student_id].dropna(subset=['Grade', 'Credits'])
+    credits = joined['Credits'].astype(float)
+    expected = (joined['Grade'].astype(float) * credits).sum() / credits.sum()
+    assert np.isclose(result['WeightedGrade'].iloc[0], expected)
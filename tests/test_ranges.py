@@ -0,0 +1,35 @@
+import pytest
+import queries
+
+def _grades(store, low, high):
+    frame = store.frame('enrollments')
+    return sorted(frame.index[(frame['Grade'] >= low) & (frame['Grade'] <= high)])
+
+def test_ranges_match_a_scan(store):
+    born = queries.students_born_between('2003-01-01', '2003-12-31', ['StudentID'], store)
+    frame = store.frame('students')
+    expected = frame.loc[(frame['DateOfBirth'] >= '2003-01-01') & (frame['DateOfBirth'] <= '2003-12-31'), 'StudentID']
+    assert sorted(born['StudentID']) == sorted(expected)
+    assert sorted(queries.enrollments_by_grade(95, 100, store=store).index) == _grades(store, 95, 100)
+
+def test_ranges_follow_writes(store):
+    store.delete('enrollments', store.frame('enrollments').index[store.frame('enrollments')['Grade'] == 100][:3].tolist())
+    labels = store.frame('enrollments').index[:2].tolist()
+    store.update('enrollments', labels, {'Grade': 100})
+    assert sorted(queries.enrollments_by_grade(100, 100, store=store).index) == _grades(store, 100, 100)
+
+def test_ranges_skip_other_partitions(store):
+    store.partition('enrollments')
+    rows = queries.enrollments_by_grade(90, 100, year=2021, store=store)
+    frame = store.frame('enrollments')
+    expected = frame[(frame['Year'] == 2021) & (frame['Grade'] >= 90)]
+    assert len(rows) == len(expected) and (rows['Year'] == 2021).all()
+
+def test_top_students_are_in_grade_order(store):
+    top = queries.top_students(n=5, store=store)
+    assert len(top) == 5
+    assert top['Grade'].tolist() == sorted(store.frame('enrollments')['Grade'].dropna(), reverse=True)[:5]
+
+def test_unknown_inclusive_is_refused(store):
+    with pytest.raises(ValueError):
+        queries.enrollments_by_grade(90, 100, inclusive='some', store=store)
@@ -0,0 +1,25 @@
+import pandas as pd
+from schemas import SCHEMAS
+
+def test_frames_follow_the_schema(store):
+    for name, schema in SCHEMAS.items():
+        frame = store.frame(name)
+        for column in frame.columns:
+            assert str(frame[column].dtype) == schema.dtypes[column], (name, column)
+
+def test_keys_match_in_any_type(store):
+    assert store.has_key('students', 'StudentID', 20250001)
+    assert store.has_key('students', 'StudentID', '20250001')
+    assert len(store.lookup('enrollments', 'StudentID', 20250001)) == len(store.lookup('enrollments', 'StudentID', '20250001'))
+
+def test_new_category_values_are_kept(store):
+    store.insert('courses', [{'CourseID': 'C90001', 'CourseName': 'فلك', 'Credits': '3', 'Department': 'كلية الفنون'}])
+    row = store.lookup('courses', 'CourseID', 'C90001').iloc[0]
+    assert row['CourseName'] == 'فلك' and row['Department'] == 'كلية الفنون'
+    assert row['Credits'] == 3
+    assert isinstance(store.frame('courses')['Department'].dtype, pd.CategoricalDtype)
+
+def test_coerce_reports_bad_values():
+    schema = SCHEMAS['courses']
+    credits = schema.coerce('Credits', pd.Series(['2', 'x', 3.0]), errors='coerce')
+    assert credits.tolist()[0] == 2 and pd.isna(credits.tolist()[1]) and credits.tolist()[2] == 3
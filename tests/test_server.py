@@ -0,0 +1,64 @@
+import threading
+import pytest
+import data_store
+from conftest import load_script
+
+@pytest.fixture
+def server(data_dir):
+    module = load_script('Data Server.py')
+    server = module.QueryServer(str(data_dir / 'university.sock'), workers=2)
+    yield server
+    server.server_close()
+
+@pytest.fixture
+def client(server, data_dir):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with load_script('Data Client.py').QueryClient(str(data_dir / 'university.sock')) as client:
+        yield client
+    server.shutdown()
+    thread.join()
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def test_reads_and_writes_round_trip(client):
+    assert client.request('retrieve_instructor', 'I0002')[0]['InstructorID'] == 'I0002'
+    assert client.request('add_course', _course('C90001'))['done'] == 1
+    assert client.request('retrieve_courses_by_department', 'كلية العلوم')
+    report = client.request('add_course', _course('C90001'))
+    assert report['done'] == 0 and report['errors'][0]['key'] == 'C90001'
+
+def test_errors_are_sent_back(client):
+    with pytest.raises(RuntimeError):
+        client.request('drop_everything')
+    assert client.request('retrieve_instructor', 'I0002')
+
+def test_files_changed_by_another_process_are_reloaded(client):
+    other = data_store.TableStore(data_store.FILES)
+    other.delete('instructors', other.labels('instructors', 'InstructorID', 'I0002'))
+    assert client.request('retrieve_instructor', 'I0002') == []
+
+def _tables(store):
+    # Flat tables and the partitions of partitioned ones
+    for table in store.tables.values():
+        yield from (part for _, part in table.partitions()) if hasattr(table, 'partitions') else [table]
+
+def test_warm_builds_the_sorted_indexes(server, store):
+    for table in _tables(store):
+        assert set(table._sorted) == set(table.sorted_columns)
+
+def test_warm_covers_partitions(store, server):
+    store.partition('enrollments')
+    server.warm()
+    parts = [part for _, part in store.table('enrollments').partitions()]
+    assert parts and all(set(part._sorted) == {'Year', 'Grade'} for part in parts)
+
+def test_warm_loads_the_name_indexes(server, store):
+    for name in ('students', 'instructors'):
+        table = store.table(name)
+        assert table._names is not None and table._names_signature == table._state()
+
+def test_warm_builds_the_key_sets(server, store):
+    for table in _tables(store):
+        assert set(table._key_sets) >= set(table.key_columns)
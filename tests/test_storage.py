@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+import data_store
+import storage_backends
+
+@pytest.fixture(params=['npz', 'parquet', 'feather'])
+def converted(request, data_dir):
+    if request.param != 'npz':
+        pytest.importorskip('pyarrow')
+    storage_backends.convert_dataset('.', 'converted', 'csv', request.param)
+    files = {name: str(data_dir / 'converted' / file_name) for name, file_name in data_store.FILES.items()}
+    return data_store.TableStore(files, request.param)
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def test_converted_tables_read_back_the_same(converted, store):
+    for name in ['courses', 'instructors']:
+        pd.testing.assert_frame_equal(converted.frame(name), store.frame(name), check_dtype=False)
+
+def test_projection_reads_only_the_asked_columns(converted):
+    courses = converted.frame('courses', ['CourseID', 'Credits'])
+    assert list(courses.columns) == ['CourseID', 'Credits']
+    assert converted.tables['courses']._frame is None
+    rows = converted.lookup('courses', 'CourseID', 'C0001', ['Credits'])
+    assert list(rows.columns) == ['Credits'] and len(rows) == 1
+
+def test_inserts_rewrite_columnar_files(converted):
+    count = len(converted.frame('courses'))
+    converted.insert('courses', [_course('C90001')])
+    fresh = data_store.TableStore({name: table.path for name, table in converted.tables.items()},
+                                  converted.backend.name)
+    assert len(fresh.frame('courses')) == count + 1
+    assert fresh.has_key('courses', 'CourseID', 'C90001')
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        storage_backends.get_backend('xlsx')
@@ -0,0 +1,20 @@
+import pandas as pd
+import data_store
+
+def test_reads_are_served_from_the_cache(store):
+    assert store.frame('students') is store.frame('students')
+
+def test_a_file_changed_on_disk_is_read_again(store):
+    store.frame('courses')
+    pd.read_csv('Course.csv').head(3).to_csv('Course.csv', index=False, encoding='utf-8-sig')
+    assert len(store.frame('courses')) == 3
+
+def test_scripts_share_one_store(querying, retrieval):
+    assert querying._store() is retrieval._store()
+
+def test_writes_are_seen_by_the_next_read(querying, store):
+    rows = len(store.frame('instructors'))
+    querying.delete_instructor('I0002')
+    assert 'I0002' not in store.frame('instructors')['InstructorID'].values
+    reopened = data_store.TableStore(data_store.FILES)
+    assert len(reopened.frame('instructors')) == rows - 1
@@ -0,0 +1,79 @@
+import os
+import shutil
+import pytest
+import data_store
+
+def _fresh(directory):
+    return data_store.TableStore({name: os.path.join(directory, file_name) for name, file_name in data_store.FILES.items()})
+
+@pytest.fixture
+def tombstoned(monkeypatch):
+    # The sample tables are small, tombstones are used for them too
+    monkeypatch.setattr(data_store, 'TOMBSTONE_MIN_ROWS', 0)
+
+def test_deletes_leave_the_file_and_record_tombstones(store, tombstoned):
+    size = os.path.getsize('Instructor.csv')
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    assert os.path.getsize('Instructor.csv') == size
+    assert os.path.exists(store.table('instructors').tombstone_path)
+    assert not _fresh(os.getcwd()).has_key('instructors', 'InstructorID', 'I0001')
+
+def test_small_tables_are_rewritten_on_delete(store):
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    assert not os.path.exists(store.table('instructors').tombstone_path)
+    with open('Instructor.csv', encoding='utf-8-sig') as f:
+        assert 'I0001,' not in f.read()
+
+def test_tombstones_survive_a_copy(store, tombstoned, data_dir, tmp_path_factory):
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    store.delete('enrollments', store.labels('enrollments', 'StudentID', '20250001'))
+    assert os.path.exists(store.table('instructors').tombstone_path)
+    copy = tmp_path_factory.mktemp('copy') / 'data'
+    shutil.copytree(data_dir, copy, ignore=shutil.ignore_patterns('university.lock'))
+    copied = _fresh(copy)
+    assert not copied.has_key('instructors', 'InstructorID', 'I0001')
+    assert copied.lookup('enrollments', 'StudentID', '20250001').empty
+    assert len(copied.frame('instructors')) == len(store.frame('instructors'))
+
+def test_tombstones_of_another_file_are_refused(store, tombstoned, data_dir):
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    with open('Instructor.csv', 'a', encoding='utf-8') as f:
+        f.write('I9999,a,b,c,d,e@example.net\n')
+    with pytest.raises(ValueError):
+        _fresh(data_dir).frame('instructors')
+
+def test_compact_rewrites_the_file_without_deleted_rows(store, tombstoned):
+    table = store.table('instructors')
+    rows = len(store.frame('instructors'))
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    assert table.tombstones()
+    assert store.compact(['instructors']) == ['instructors']
+    assert not os.path.exists(table.tombstone_path)
+    assert len(_fresh(os.getcwd()).frame('instructors')) == rows - 1
+
+def test_many_deletes_rewrite_the_file_once(store, tombstoned):
+    table = store.table('courses')
+    labels = list(store.frame('courses').index)
+    store.delete('courses', labels[:int(len(labels) * data_store.COMPACT_RATIO) + 1])
+    assert not os.path.exists(table.tombstone_path)
+    assert len(_fresh(os.getcwd()).frame('courses')) == len(labels) - int(len(labels) * data_store.COMPACT_RATIO) - 1
+
+def test_tombstones_survive_a_copy_with_a_new_mtime(store, tombstoned, tmp_path_factory):
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    copy = tmp_path_factory.mktemp('plain')
+    for name in ('Instructor.csv', 'Instructor.csv' + data_store.TOMBSTONE_SUFFIX):
+        shutil.copyfile(name, copy / name)
+    os.utime(copy / 'Instructor.csv', ns=(0, 0))
+    copied = data_store.TableStore({'instructors': os.path.join(copy, 'Instructor.csv')})
+    assert not copied.has_key('instructors', 'InstructorID', 'I0001')
+
+def test_later_deletes_do_not_hash_the_data_file(store, tombstoned, monkeypatch):
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0001'))
+    hashed = []
+    content_hash = data_store._content_hash
+    monkeypatch.setattr(data_store, '_content_hash', lambda *args: hashed.append(args) or content_hash(*args))
+    store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    assert not hashed
+    fresh = _fresh(os.getcwd())
+    assert not fresh.has_key('instructors', 'InstructorID', 'I0001')
+    assert not fresh.has_key('instructors', 'InstructorID', 'I0002')
@@ -0,0 +1,65 @@
+import os
+import glob
+import pytest
+import data_store
+from transactions import WriteAheadLog, WAL_NAME
+
+def _fresh():
+    # Another process opening the same files, it recovers the write-ahead log first
+    return data_store.TableStore({name: os.path.abspath(file_name) for name, file_name in data_store.FILES.items()})
+
+def _crash(*args, **kwargs):
+    raise KeyboardInterrupt
+
+def _course(course_id):
+    return {'CourseID': course_id, 'CourseName': 'فيزياء', 'Credits': 2, 'Department': 'كلية العلوم'}
+
+def test_committed_transaction_is_replayed(store, monkeypatch):
+    with monkeypatch.context() as patched, pytest.raises(KeyboardInterrupt):
+        patched.setattr(WriteAheadLog, 'apply', _crash)
+        store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    assert os.path.getsize(WAL_NAME) > 0
+    recovered = _fresh()
+    assert not recovered.has_key('instructors', 'InstructorID', 'I0002')
+    assert os.path.getsize(WAL_NAME) == 0
+
+def test_uncommitted_transaction_leaves_nothing(store, monkeypatch):
+    with monkeypatch.context() as patched, pytest.raises(KeyboardInterrupt):
+        patched.setattr(WriteAheadLog, 'write_commit', _crash)
+        store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    assert _fresh().has_key('instructors', 'InstructorID', 'I0002')
+    assert glob.glob('*.txn-tmp') == []
+
+def test_transaction_commits_all_tables_together(store, monkeypatch):
+    with monkeypatch.context() as patched, pytest.raises(KeyboardInterrupt):
+        patched.setattr(WriteAheadLog, 'write_commit', _crash)
+        with store.transaction():
+            store.insert('courses', [_course('C90001')])
+            store.delete('instructors', store.labels('instructors', 'InstructorID', 'I0002'))
+    recovered = _fresh()
+    assert not recovered.has_key('courses', 'CourseID', 'C90001')
+    assert recovered.has_key('instructors', 'InstructorID', 'I0002')
+
+def test_leftover_temp_files_and_torn_records_are_dropped(data_dir):
+    with open('Instructor.csv.dead.txn-tmp', 'w') as f:
+        f.write('half written')
+    with open(WAL_NAME, 'w') as f:
+        f.write('{"txn": "dead", "ops": [')
+    store = _fresh()
+    assert glob.glob('*.txn-tmp') == []
+    assert store.has_key('instructors', 'InstructorID', 'I0002')
+
+def test_replaying_an_append_is_idempotent(store, monkeypatch):
+    apply = WriteAheadLog.apply
+    def _apply_and_crash(log, ops):
+        # Stops after the rows are written but before the log is cleared
+        apply(log, ops)
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patched, pytest.raises(KeyboardInterrupt):
+        patched.setattr(WriteAheadLog, 'apply', _apply_and_crash)
+        store.insert('courses', [_course('C90001')])
+    assert os.path.getsize(WAL_NAME) > 0
+    size = os.path.getsize('Course.csv')
+    recovered = _fresh()
+    assert os.path.getsize('Course.csv') == size
+    assert len(recovered.labels('courses', 'CourseID', 'C90001')) == 1
@@ -0,0 +1,30 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import queries
+from conftest import load_script
+
+@pytest.fixture
+def transcripts(data_dir, monkeypatch):
+    module = load_script('Data Transcripts.py')
+    # The pool pickles build_transcripts by module name
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    return module
+
+def test_partitions_and_workers_give_the_same_files(transcripts, store):
+    transcripts.run_transcripts('one.csv', 'one_avg.csv', workers=1, store=store)
+    transcripts.run_transcripts('two.csv', 'two_avg.csv', workers=2, partition_students=2000, store=store)
+    with open('one.csv', 'rb') as one, open('two.csv', 'rb') as two:
+        assert one.read() == two.read()
+    with open('one_avg.csv', 'rb') as one, open('two_avg.csv', 'rb') as two:
+        assert one.read() == two.read()
+
+def test_overall_average_matches_the_weighted_grade(transcripts, store):
+    transcripts.run_transcripts('t.csv', 'avg.csv', workers=1, partition_students=2000, store=store)
+    averages = pd.read_csv('avg.csv', encoding='utf-8-sig', dtype={'StudentID': str})
+    overall = averages[averages['Year'].isna()]
+    student_id = overall['StudentID'].iloc[0]
+    expected = queries.weighted_grades(student_id, store=store)['WeightedGrade'].iloc[0]
+    assert np.isclose(overall['WeightedAverage'].iloc[0], round(expected, 2))
+    assert overall['StudentID'].is_unique
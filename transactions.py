@@ -0,0 +1,296 @@
+import os
+import json
+import glob
+import time
+import uuid
+import pandas as pd
+import metrics
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+WAL_NAME = 'university.wal'
+LOCK_NAME = 'university.lock'
+TEMP_SUFFIX = '.txn-tmp'
+# Partitioned tables keep their files one level down, in <table>.partitions
+PARTITIONS_SUFFIX = '.partitions'
+
+# ------ Durable File Helpers ------
+def _fsync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+def _fsync_dir(path):
+    # Makes renames and new directory entries durable (not supported on Windows)
+    try:
+        fd = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_temp(table, df, temp_path):
+    table.backend.write(df, temp_path)
+    with open(temp_path, 'rb+') as f:
+        _fsync_file(f)
+
+def _write_file_temp(data, temp_path):
+    if callable(data):
+        # Larger files are written by the caller straight to the temp path (e.g. a restored backup)
+        data(temp_path)
+        with open(temp_path, 'rb+') as f:
+            _fsync_file(f)
+        return
+    with open(temp_path, 'wb') as f:
+        f.write(data.encode('utf-8'))
+        _fsync_file(f)
+
+def _write_tombstones_temp(table, data_path, temp_path, signature=None):
+    table.write_tombstones(temp_path, data_path, signature)
+    with open(temp_path, 'rb+') as f:
+        _fsync_file(f)
+
+# ------ Cross-Process Lock ------
+class FileLock:
+    # Shared or exclusive lock on one file per data directory, released by the OS if the process dies
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_NAME)
+        self._file = None
+
+    def acquire(self, exclusive=True, blocking=True):
+        f = open(self.path, 'a+b')
+        try:
+            if fcntl is not None:
+                mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+                fcntl.flock(f.fileno(), mode | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                # Windows has no shared mode, every holder is exclusive
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            if blocking:
+                raise
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+# ------ Write-Ahead Log ------
+class WriteAheadLog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, WAL_NAME)
+
+    def temp_path(self, path, txn_id):
+        return f"{path}.{txn_id}{TEMP_SUFFIX}"
+
+    def write_commit(self, txn_id, ops):
+        # The transaction is committed once this record is on disk
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'txn': txn_id, 'ops': ops}, ensure_ascii=False) + '\n')
+            _fsync_file(f)
+        metrics.file_written(self.path)
+        _fsync_dir(self.directory)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.truncate(self.path, 0)
+
+    def apply(self, ops):
+        # Every step is idempotent so a crashed apply can simply be replayed
+        # ('append' truncates to the old end first, so replaying it writes the same bytes again)
+        for op in ops:
+            if op['kind'] == 'replace':
+                if os.path.exists(op['temp']):
+                    os.replace(op['temp'], op['path'])
+            elif op['kind'] == 'remove':
+                if os.path.exists(op['path']):
+                    os.remove(op['path'])
+            elif op['kind'] == 'append':
+                data = op['data'].encode('utf-8')
+                with open(op['path'], 'r+b') as f:
+                    f.truncate(op['offset'])
+                    f.seek(op['offset'])
+                    f.write(data)
+                    _fsync_file(f)
+                if 'mtime_ns' in op:
+                    # The tombstones written before the commit name the file by this mtime
+                    os.utime(op['path'], ns=(op['mtime_ns'], op['mtime_ns']))
+        _fsync_dir(self.directory)
+
+    def recover(self):
+        # Replay a committed transaction, roll back anything that never committed
+        record = None
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                line = f.readline()
+            if line.endswith('\n'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+        if record is not None:
+            self.apply(record['ops'])
+        directory = glob.escape(self.directory)
+        for pattern in ('*' + TEMP_SUFFIX, os.path.join('*' + PARTITIONS_SUFFIX, '*' + TEMP_SUFFIX)):
+            for temp_path in glob.glob(os.path.join(directory, pattern)):
+                os.remove(temp_path)
+        self.clear()
+        return record['txn'] if record else None
+
+# ------ Transaction ------
+class Transaction:
+    def __init__(self, log):
+        self.log = log
+        self.id = uuid.uuid4().hex
+        self.replaces = {}
+        self.appends = {}
+        self.tombstones = {}
+        self.files = {}
+        self.removes = []
+        # Change log path -> (log, events), appended once the changes are published
+        self.changes = {}
+
+    def _touched(self):
+        tables = dict(self.tombstones)
+        tables.update(self.replaces)
+        tables.update((path, table) for path, (table, _) in self.appends.items())
+        return tables
+
+    def tables(self):
+        return list(self._touched().values())
+
+    def stage_replace(self, table):
+        # The table's current frame is written at commit, it already holds any appended rows
+        self.replaces[table.path] = table
+        self.appends.pop(table.path, None)
+
+    def stage_append(self, table, rows):
+        if table.path in self.replaces:
+            return
+        self.appends.setdefault(table.path, (table, []))[1].append(rows)
+
+    def stage_tombstones(self, table):
+        self.tombstones[table.path] = table
+
+    def stage_file(self, path, data):
+        # Small text files (e.g. a partition manifest) published after the tables they describe,
+        # or a function that writes the file to the temp path it is given
+        self.files[path] = data
+
+    def stage_remove(self, path):
+        # Removed last, once nothing published in this transaction points at the file
+        if path not in self.removes:
+            self.removes.append(path)
+
+    def stage_changes(self, log, events):
+        self.changes.setdefault(log.path, (log, []))[1].extend(events)
+
+    def _prepare(self):
+        ops = []
+        for path, table in self.replaces.items():
+            temp_path = self.log.temp_path(path, self.id)
+            _write_temp(table, table.frame(), temp_path)
+            ops.append({'kind': 'replace', 'path': path, 'temp': temp_path})
+        for path, (table, frames) in self.appends.items():
+            rows = pd.concat(frames)
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                # A new file gets the BOM and the header once
+                temp_path = self.log.temp_path(path, self.id)
+                _write_temp(table, rows, temp_path)
+                ops.append({'kind': 'replace', 'path': path, 'temp': temp_path})
+                continue
+            # Written at the end of the file in place while the writer lock is held, readers stop at the
+            # size they saw; apply stamps the mtime chosen here so the tombstones can name the new version
+            ops.append({'kind': 'append', 'path': path, 'offset': os.path.getsize(path),
+                        'data': table.backend.append_data(rows, path), 'mtime_ns': time.time_ns()})
+
+        # Tombstones name the data file they belong to, so they follow every new version of it;
+        # a rewritten file has none left
+        published = {op['path']: op for op in ops}
+        for path, table in self._touched().items():
+            if path not in self.replaces and table.tombstones():
+                temp_path = self.log.temp_path(table.tombstone_path, self.id)
+                op = published.get(path)
+                if op is None:
+                    _write_tombstones_temp(table, path, temp_path)
+                elif op['kind'] == 'append':
+                    size = op['offset'] + len(op['data'].encode('utf-8'))
+                    _write_tombstones_temp(table, path, temp_path, (os.stat(path).st_ino, op['mtime_ns'], size))
+                else:
+                    _write_tombstones_temp(table, op['temp'], temp_path)
+                ops.append({'kind': 'replace', 'path': table.tombstone_path, 'temp': temp_path})
+            elif os.path.exists(table.tombstone_path):
+                ops.append({'kind': 'remove', 'path': table.tombstone_path})
+        for path, data in self.files.items():
+            temp_path = self.log.temp_path(path, self.id)
+            _write_file_temp(data, temp_path)
+            ops.append({'kind': 'replace', 'path': path, 'temp': temp_path})
+        ops.extend({'kind': 'remove', 'path': path} for path in self.removes if os.path.exists(path))
+        # Consumers that see the events find the data files already in place
+        ops.extend(log.append_op(self.id, events) for log, events in self.changes.values() if events)
+        for op in ops:
+            if op['kind'] == 'replace':
+                metrics.file_written(op['temp'], op['path'])
+            elif op['kind'] == 'append':
+                metrics.file_bytes(op['path'], written=len(op['data'].encode('utf-8')))
+        return ops
+
+    def commit(self):
+        if not self.replaces and not self.appends and not self.tombstones and not self.files and not self.removes and not self.changes:
+            return
+        with metrics.phase('write'):
+            try:
+                ops = self._prepare()
+                self.log.write_commit(self.id, ops)
+            except BaseException:
+                self.rollback()
+                raise
+            try:
+                self.log.apply(ops)
+                self.log.clear()
+            except BaseException:
+                # Committed but not fully applied: the next recovery replays the log
+                for table in self.tables():
+                    table.invalidate()
+                raise
+        for path, table in self._touched().items():
+            table.committed(path in self.replaces)
+
+    def rollback(self):
+        for path, table in self._touched().items():
+            for temp_path in (self.log.temp_path(path, self.id), self.log.temp_path(table.tombstone_path, self.id)):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        for path in self.files:
+            temp_path = self.log.temp_path(path, self.id)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        for table in self.tables():
+            table.invalidate()
+        self.replaces.clear()
+        self.appends.clear()
+        self.tombstones.clear()
+        self.files.clear()
+        self.removes.clear()
+        self.changes.clear()